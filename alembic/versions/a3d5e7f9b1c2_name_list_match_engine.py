@@ -0,0 +1,29 @@
+"""name_list_match_engine
+
+Revision ID: a3d5e7f9b1c2
+Revises: 9d2e0f2c1a0b
+Create Date: 2026-10-18 10:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "a3d5e7f9b1c2"
+down_revision = "9d2e0f2c1a0b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 已有名单保持子串匹配，标识类名单需要精确匹配时逐个改为 exact
+    op.add_column(
+        "name_list",
+        sa.Column("match_engine", sa.String(length=20), nullable=False, server_default="substring"),
+    )
+    op.alter_column("name_list", "match_engine", server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column("name_list", "match_engine")
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from fastapi import Depends, Request
 
-from app.core.exceptions import Unauthorized
+from app.core.exceptions import Forbidden, Unauthorized
 from app.models.user import User
 from app.services import auth_service
 
@@ -11,6 +11,27 @@ def get_ctx(request: Request):
     return request.app.state.ctx
 
 
+def get_client_ip(request: Request, trusted_proxies=None) -> str:
+    """调用方 IP。
+
+    Yz-Client-Ip 由前置网关按 X-Forwarded-For 的方式追加，只有最右侧一项是直连网关的代理写入的，
+    左侧各项可由调用方任意伪造，因此只取最右侧一项。配置了 trusted_proxies（TRUSTED_PROXIES）时，
+    只在直连对端属于其中时才信任该请求头，否则使用直连对端地址；未配置时假定服务只能经网关访问。
+    """
+    peer = request.client.host if request.client else ""
+    request_ip = request.headers.get("Yz-Client-Ip")
+    if request_ip and (not trusted_proxies or peer in trusted_proxies):
+        return request_ip.split(",")[-1].strip()
+    return peer
+
+
+def check_client_ip(request: Request, ctx=Depends(get_ctx)):
+    """调用方 IP 命中黑名单时直接拒绝，不进入后续的解析与匹配。"""
+    blocklist = ctx.config.get("IP_BLOCKLIST")
+    if blocklist and get_client_ip(request, ctx.config.get("TRUSTED_PROXY_NETS")) in blocklist:
+        raise Forbidden(message="ip已被禁止访问")
+
+
 def get_db(request: Request):
     db = request.app.state.SessionLocal()
     try:
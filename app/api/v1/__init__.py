@@ -10,6 +10,7 @@ from .auth import router as auth_router
 from .image import router as image_router
 from .language import router as language_router
 from .list_detail import router as list_detail_router
+from .metrics import router as metrics_router
 from .model_threshold import router as model_threshold_router
 from .name_list import router as name_list_router
 from .risk_type import router as risk_type_router
@@ -30,3 +31,4 @@ router.include_router(ac_switch_router)
 router.include_router(model_threshold_router)
 router.include_router(black_ip_router)
 router.include_router(base_router)
+router.include_router(metrics_router)
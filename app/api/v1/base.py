@@ -1,13 +1,29 @@
 import json
-import pickle
 import time
 
 from fastapi import APIRouter, Depends, Request
 
 from app.api.deps import get_ctx, get_db, get_current_user
 from app.core.exceptions import NotFound
-from app.utils.cache_sql_data import sql_data_to_redis
-from app.services.cache import bump_list_detail_version, load_cache_from_redis, load_chat_sentinel, update_cache_data
+from app.utils.cache_sql_data import SqlImportJob, sql_data_to_redis
+from app.utils.list_delta import LIST_DELTA_PREFIX
+from app.utils.list_meta import META_KEY
+from app.utils.list_stats import list_stats
+from app.utils.match_data_utils import refresh_channel_policies, refresh_scope_indexes
+from app.services.cache import (
+    LIST_DELTA_COMPACT_LOCK,
+    LIST_DELTA_PENDING_KEY,
+    SQL_IMPORT_LOCK,
+    SQL_IMPORT_PROGRESS_KEY,
+    bump_list_detail_version,
+    cache_update_lock,
+    load_cache_from_redis,
+    reset_chat_sentinel_rule,
+    mark_app_channel_updated,
+    rebuild_key_index,
+    sync_shared_cache,
+    update_cache_data,
+)
 from app.services.response import success_response
 
 router = APIRouter(prefix="/cache", dependencies=[Depends(get_current_user)])
@@ -30,11 +46,23 @@ def local_cache_data(ctx=Depends(get_ctx)):
     for k, v in cache_data.items():
         data = v.get("data", "")
         v_copy = dict(v)
+        v_copy.pop(META_KEY, None)
         v_copy["data"] = "ACTree" if data else ""
         safe_data[k] = v_copy
     return safe_data
 
 
+@router.get("/list-stats")
+def local_cache_list_stats(ctx=Depends(get_ctx)):
+    return list_stats.snapshot(ctx.config.get("CACHE_DATA", {}))
+
+
+@router.post("/list-stats/reset")
+def reset_local_cache_list_stats():
+    list_stats.reset()
+    return success_response(msg="重置成功")
+
+
 @router.post("/refresh")
 def update_cache(ctx=Depends(get_ctx)):
     update_cache_data(ctx)
@@ -45,8 +73,16 @@ def update_cache(ctx=Depends(get_ctx)):
 def sql2redis(ctx=Depends(get_ctx)):
     redis_url = ctx.config.get("REDIS_URL")
     mysql_url = ctx.config.get("SQLALCHEMY_DATABASE_URI")
-    sql_data_to_redis(redis_url=redis_url, mysql_url=mysql_url)
-    return success_response(msg="ok")
+    workers = ctx.config.get("REDIS_IMPORT_WORKERS") or None
+    job = SqlImportJob(ctx.redis)
+    if not job.start(sql_data_to_redis, redis_url=redis_url, mysql_url=mysql_url, workers=workers):
+        return success_response(msg="导入任务正在运行", data=job.snapshot())
+    return success_response(msg="导入任务已开始", data=job.snapshot())
+
+
+@router.get("/redis/import")
+def sql2redis_progress(ctx=Depends(get_ctx)):
+    return SqlImportJob(ctx.redis).snapshot()
 
 
 @router.post("/apps/refresh-from-redis")
@@ -65,8 +101,11 @@ def get_apps_from_redis(ctx=Depends(get_ctx)):
 @router.post("/app-channels/refresh-from-redis")
 def update_local_app_channel_from_redis(ctx=Depends(get_ctx)):
     redis_client = ctx.redis
-    _, local_app_channel, _, _ = load_cache_from_redis(redis_client)
-    ctx.config["APP_CHANNEL"] = local_app_channel
+    _, local_app_channel, _, _ = load_cache_from_redis(redis_client, include_lists=False)
+    with cache_update_lock:
+        ctx.config["APP_CHANNEL"] = local_app_channel
+        refresh_channel_policies(ctx)
+        refresh_scope_indexes(ctx)
     return success_response(msg="更新本地内存成功")
 
 
@@ -107,35 +146,37 @@ def get_app_channel_from_redis(ctx=Depends(get_ctx)):
 
 @router.post("/list-data/refresh-from-redis")
 def update_local_detail_from_redis(ctx=Depends(get_ctx)):
-    redis_client = ctx.redis
-    local_list_data = {}
-    for i in redis_client.scan_iter():
-        if i in [
-            "waiting_update_list_detail",
-            "waiting_update_app_channel_list",
-            "all_apps",
-            "list_detail_version_seq",
-            "list_detail_version",
-            "list_detail_version_index",
-        ]:
-            continue
-        if i[:3] == "AC_" or i[:13] == "chat_sentinel":
-            continue
-        v = redis_client.hgetall(i)
-        raw = v.get("data")
-        if raw:
-            if isinstance(raw, str):
-                data = pickle.loads(raw.encode("latin1"))
-            else:
-                data = raw
-        else:
-            data = ""
-        v["data"] = data
-        local_list_data[i] = v
-    ctx.config["CACHE_DATA"] = local_list_data
+    store = ctx.config.get("SHARED_CACHE")
+    with cache_update_lock:
+        if store is not None:
+            sync_shared_cache(ctx, store, full=True)
+            return success_response(msg="更新本地内存成功")
+        stats = {}
+        ctx.config["CACHE_DATA"] = load_cache_from_redis(ctx.redis, stats=stats)[2]
+        ctx.config["CACHE_LOAD_STATS"] = stats
     return success_response(msg="更新本地内存成功")
 
 
+@router.get("/load-stats")
+def get_cache_load_stats(ctx=Depends(get_ctx)):
+    return ctx.config.get("CACHE_LOAD_STATS", {})
+
+
+@router.get("/log-stats")
+def get_log_stats(ctx=Depends(get_ctx)):
+    pipeline = ctx.config.get("LOG_PIPELINE")
+    return {
+        "pipeline": pipeline.stats() if pipeline is not None else {},
+        "file": ctx.kafka_logger.stats(),
+    }
+
+
+@router.post("/redis/key-index/rebuild")
+def rebuild_redis_key_index(ctx=Depends(get_ctx)):
+    list_keys, app_channel_keys = rebuild_key_index(ctx.redis)
+    return success_response(msg=f"重建成功：名单 {len(list_keys)} 个，作用域 {len(app_channel_keys)} 个")
+
+
 @router.get("/redis/list-data")
 def get_redis_list_detail(ctx=Depends(get_ctx)):
     redis_client = ctx.redis
@@ -148,9 +189,13 @@ def get_redis_list_detail(ctx=Depends(get_ctx)):
             "list_detail_version_seq",
             "list_detail_version",
             "list_detail_version_index",
+            LIST_DELTA_PENDING_KEY,
+            LIST_DELTA_COMPACT_LOCK,
+            SQL_IMPORT_LOCK,
+            SQL_IMPORT_PROGRESS_KEY,
         ]:
             continue
-        if i[:3] == "AC_" or i[:13] == "chat_sentinel":
+        if i[:3] == "AC_" or i[:13] == "chat_sentinel" or i.startswith(LIST_DELTA_PREFIX):
             continue
         v = redis_client.hgetall(i)
         v["data"] = "ACTree" if v.get("data") else ""
@@ -174,7 +219,7 @@ def reset_waiting_update_app_channel_list(ctx=Depends(get_ctx)):
         if i[:3] == "AC_":
             v = redis_client.hgetall(i)
             for k in v.keys():
-                redis_client.zadd("waiting_update_app_channel_list", {f"{i}|{k}": int(time.time())})
+                mark_app_channel_updated(redis_client, i, k)
     return success_response(msg="重置成功")
 
 
@@ -189,9 +234,13 @@ def reset_waiting_update_list_detail(ctx=Depends(get_ctx)):
             "list_detail_version_seq",
             "list_detail_version",
             "list_detail_version_index",
+            LIST_DELTA_PENDING_KEY,
+            LIST_DELTA_COMPACT_LOCK,
+            SQL_IMPORT_LOCK,
+            SQL_IMPORT_PROGRESS_KEY,
         ]:
             continue
-        if i[:3] == "AC_" or i[:13] == "chat_sentinel":
+        if i[:3] == "AC_" or i[:13] == "chat_sentinel" or i.startswith(LIST_DELTA_PREFIX):
             continue
         bump_list_detail_version(redis_client, i)
     return success_response(msg="重置成功")
@@ -219,7 +268,7 @@ def reset_chat_sentinel_ip(request: Request, ctx=Depends(get_ctx)):
     if not data:
         raise NotFound(msg="未找到相关数据")
     redis_client.hset("chat_sentinel_ip", rule, json.dumps({}))
-    ctx.config["CHAT_SENTINEL"] = load_chat_sentinel(redis_client)
+    reset_chat_sentinel_rule(ctx, "ip", rule)
     return success_response(msg="重置成功")
 
 
@@ -233,5 +282,5 @@ def reset_chat_sentinel_account(request: Request, ctx=Depends(get_ctx)):
     if not data:
         raise NotFound(msg="未找到相关数据")
     redis_client.hset("chat_sentinel_account_id", rule, json.dumps({}))
-    ctx.config["CHAT_SENTINEL"] = load_chat_sentinel(redis_client)
+    reset_chat_sentinel_rule(ctx, "account_id", rule)
     return success_response(msg="重置成功")
@@ -1,54 +1,44 @@
-from pathlib import Path
-
 from fastapi import APIRouter, Depends
 
 from app.api.deps import get_ctx, get_current_user
 from app.core.exceptions import ParameterException
 from app.schemas.black_ip import BlackIP
+from app.services.cache import refresh_ip_blocklist, update_blocked_ip
 from app.services.response import success_response
 from app.services.validators import FormProxy
+from app.utils.ip_blocklist import normalize_ip_entry
 
 router = APIRouter(prefix="/blacklisted-ips", dependencies=[Depends(get_current_user)])
 
 
+def _normalize(ip: str) -> str:
+    try:
+        return normalize_ip_entry(ip)
+    except ValueError:
+        raise ParameterException(msg="ip格式不正确")
+
+
 @router.get("")
 def get_black_ips(ctx=Depends(get_ctx)):
-    return ctx.config.get("BLACK_CLIENT_IP", [])
+    blocklist = ctx.config.get("IP_BLOCKLIST")
+    return blocklist.entries() if blocklist is not None else []
 
 
 @router.post("")
-async def create_client_ip(payload: BlackIP, ctx=Depends(get_ctx)):
+def create_client_ip(payload: BlackIP, ctx=Depends(get_ctx)):
     form_data = payload
     form = FormProxy(**form_data.model_dump())
-    ip = form.ip.data
-    ip_file = ctx.config.get("BLACK_CLIENT_IP_FILE", "app/config/black_client_ip.txt")
-    if not Path(ip_file).exists():
-        Path(ip_file).parent.mkdir(parents=True, exist_ok=True)
-        Path(ip_file).write_text("", encoding="utf-8")
-    with open(ip_file, "r", encoding="utf-8") as f:
-        ips = [i.strip() for i in f.readlines()]
-        if ip in ips:
-            raise ParameterException(msg="ip已存在")
-
-    with open(ip_file, "a", encoding="utf-8") as f:
-        f.write(f"{ip}\n")
-    ctx.config["BLACK_CLIENT_IP"] = ips + [ip]
+    ip = _normalize(form.ip.data)
+    if not update_blocked_ip(ctx.redis, ip, True):
+        raise ParameterException(msg="ip已存在")
+    refresh_ip_blocklist(ctx)
     return success_response(msg="新增ip成功")
 
 
-@router.delete("/{ip}")
-async def delete_client_ip(ip: str, ctx=Depends(get_ctx)):
-    ip_file = ctx.config.get("BLACK_CLIENT_IP_FILE", "app/config/black_client_ip.txt")
-    if not Path(ip_file).exists():
-        Path(ip_file).parent.mkdir(parents=True, exist_ok=True)
-        Path(ip_file).write_text("", encoding="utf-8")
-    with open(ip_file, "r", encoding="utf-8") as f:
-        ips = [i.strip() for i in f.readlines()]
-        if ip not in ips:
-            raise ParameterException(msg="ip不存在")
-    ips.remove(ip)
-    with open(ip_file, "w", encoding="utf-8") as f:
-        for i in ips:
-            f.write(f"{i}\n")
-    ctx.config["BLACK_CLIENT_IP"] = ips
+# 网段条目带 "/"，路径参数需要按 path 匹配
+@router.delete("/{ip:path}")
+def delete_client_ip(ip: str, ctx=Depends(get_ctx)):
+    if not update_blocked_ip(ctx.redis, _normalize(ip), False):
+        raise ParameterException(msg="ip不存在")
+    refresh_ip_blocklist(ctx)
     return success_response(msg="删除ip成功")
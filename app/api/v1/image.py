@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends
 
-from app.api.deps import get_ctx
+from app.api.deps import check_client_ip, get_ctx
 from app.core.exceptions import ParameterException
 from app.schemas.image import ImageRequest
-from app.utils.kafka_utils import submit_img_kafka
+from app.utils.kafka_utils import submit_log
 from app.services.image_service import handle_image_filter
 from app.services.validators import (
     parse_json_string,
@@ -13,7 +13,7 @@ from app.services.validators import (
 router = APIRouter(prefix="/moderation")
 
 
-@router.post("/images")
+@router.post("/images", dependencies=[Depends(check_client_ip)])
 async def image_filter(payload: ImageRequest, ctx=Depends(get_ctx)):
     access_key = payload.access_key
 
@@ -26,9 +26,6 @@ async def image_filter(payload: ImageRequest, ctx=Depends(get_ctx)):
     validate_access_key(access_key, raw_data.get("app_id"), ctx)
     response, data_params = handle_image_filter(raw_data)
 
-    try:
-        submit_img_kafka(data_params, response, ctx)
-    except Exception as err:
-        ctx.logger.debug(f"submit img kafka error: {err}")
+    submit_log(ctx, "img", data_params, response)
 
     return response
@@ -81,8 +81,8 @@ async def create_batch_detail(payload: CreateBatchDetail, db: Session = Depends(
     data_list = normalize_text_list(form_data.data)
     form = FormProxy(list_no=form_data.list_no, data=data_list, username=form_data.username)
     name_list = name_list_service.get_name_list_by_no(db, form.list_no.data)
-    list_detail_service.add_batch_detail(db, ctx, name_list, form)
-    return success_response(msg="新增文本成功")
+    result = list_detail_service.add_batch_detail(db, ctx, name_list, form)
+    return success_response(msg="新增文本成功", data=result)
 
 
 @router.put("/{did}")
@@ -113,8 +113,8 @@ async def delete_batch_detail(payload: DeleteBatchDetail, db: Session = Depends(
     form = FormProxy(ids=ids, username=form_data.username)
     detail = list_detail_service.validate_ids(db, form.ids.data)
     name_list = name_list_service.get_name_list(db, detail.list_id)
-    list_detail_service.remove_batch_detail(db, ctx, name_list, form)
-    return success_response(msg="删除文本成功")
+    deleted = list_detail_service.remove_batch_detail(db, ctx, name_list, form)
+    return success_response(msg="删除文本成功", data={"deleted": deleted})
 
 
 @router.delete("/{did}")
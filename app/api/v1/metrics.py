@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.api.deps import get_ctx
+from app.core.metrics import render_samples
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics(ctx=Depends(get_ctx)):
+    """Prometheus 文本格式的进程内指标：文本检测分阶段耗时、日志管道与私聊记录缓存状态。"""
+    body = ""
+    stage_metrics = ctx.config.get("STAGE_METRICS")
+    if stage_metrics is not None:
+        body += stage_metrics.render()
+    pipeline = ctx.config.get("LOG_PIPELINE")
+    if pipeline is not None:
+        stats = pipeline.stats()
+        body += render_samples(
+            [
+                ("yuyan_log_pipeline_queue_depth", "gauge", "Records waiting in the log pipeline.", stats["queue_depth"]),
+                ("yuyan_log_pipeline_submitted_total", "counter", "Records accepted by the log pipeline.", stats["submitted"]),
+                ("yuyan_log_pipeline_dropped_total", "counter", "Records dropped because the queue was full.", stats["dropped"]),
+                ("yuyan_log_pipeline_errors_total", "counter", "Records that failed to serialize or write.", stats["errors"]),
+                ("yuyan_log_pipeline_write_seconds_total", "counter", "Time spent writing log batches.", stats["write_ms_total"] / 1000),
+            ]
+        )
+    history_cache = ctx.config.get("CHAT_HISTORY_CACHE")
+    if history_cache is not None:
+        stats = history_cache.stats()
+        body += render_samples(
+            [
+                ("yuyan_chat_history_cache_size", "gauge", "Entries in the local chat history cache.", stats["size"]),
+                ("yuyan_chat_history_cache_hits_total", "counter", "Chat history lookups served locally.", stats["hits"]),
+                ("yuyan_chat_history_cache_misses_total", "counter", "Chat history lookups that went to Redis.", stats["misses"]),
+                ("yuyan_chat_history_fetches_total", "counter", "Batched chat history reads sent to Redis.", stats["fetches"]),
+                ("yuyan_chat_history_timeouts_total", "counter", "Chat history reads that exceeded the budget.", stats["timeouts"]),
+                ("yuyan_chat_history_errors_total", "counter", "Chat history reads that failed.", stats["errors"]),
+            ]
+        )
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -12,7 +12,8 @@ from app.services import channel_service, app_service, name_list_service
 from app.services.response import success_response
 from app.services.serializer import to_dict
 from app.services.validators import FormProxy
-from app.utils.enums import ListLanguageScopeEnum, ListScopeEnum
+from app.utils.enums import ListLanguageScopeEnum, ListMatchEngineEnum, ListScopeEnum
+from app.utils.identifier_matcher import use_exact_match
 
 router = APIRouter(prefix="/name-lists", dependencies=[Depends(get_current_user)])
 
@@ -69,6 +70,18 @@ def normalize_language_codes(value) -> List[str]:
     return normalized
 
 
+def normalize_match_engine(match_engine, match_rule, default=None):
+    if match_engine is None or match_engine == "":
+        return default
+    try:
+        value = ListMatchEngineEnum(str(match_engine).strip().lower()).value
+    except Exception:
+        raise ParameterException(message="match_engine 不合法")
+    if value == ListMatchEngineEnum.EXACT.value and not use_exact_match(match_rule, value):
+        raise ParameterException(message="match_engine=exact 仅适用于标识类名单")
+    return value
+
+
 def process_language(language_scope_raw, language_codes_raw, legacy_language_raw=None) -> Tuple[str, List[str]]:
     if language_scope_raw is not None:
         scope_value = normalize_language_scope(language_scope_raw)
@@ -170,6 +183,9 @@ async def create_name_list(payload: CreateOrUpdateNameList, db: Session = Depend
     form.scope.data = scope
     form.language_scope.data = language_scope
     form.language_codes.data = language_codes
+    form.match_engine.data = normalize_match_engine(
+        form.match_engine.data, form.match_rule.data, ListMatchEngineEnum.SUBSTRING.value
+    )
     name_list_service.create_name_list(db, ctx, form, app_ids, channel_ids)
     return success_response(msg="新建名单成功")
 
@@ -190,6 +206,7 @@ async def update_name_list(
     form.scope.data = scope
     form.language_scope.data = language_scope
     form.language_codes.data = language_codes
+    form.match_engine.data = normalize_match_engine(form.match_engine.data, form.match_rule.data)
     name_list_service.update_name_list(db, ctx, lid, form, app_ids, channel_ids)
     return success_response(msg="更新名单成功")
 
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, Request
 
-from app.api.deps import get_ctx
+from app.api.deps import check_client_ip, get_ctx
 from app.core.exceptions import ParameterException
-from app.schemas.text import TextRequest
-from app.utils.kafka_utils import submit_kafka
-from app.services.text_service import handle_text_filter
+from app.schemas.text import TextBatchRequest, TextRequest
+from app.utils.kafka_utils import submit_log
+from app.services.text_service import handle_text_batch, handle_text_filter
 from app.services.validators import (
     parse_json_string,
     validate_access_key,
@@ -13,7 +13,7 @@ from app.services.validators import (
 router = APIRouter(prefix="/moderation")
 
 
-@router.post("/text")
+@router.post("/text", dependencies=[Depends(check_client_ip)])
 async def text_filter(payload: TextRequest, request: Request, ctx=Depends(get_ctx)):
     access_key = payload.access_key
     ugc_source = payload.ugc_source
@@ -27,15 +27,36 @@ async def text_filter(payload: TextRequest, request: Request, ctx=Depends(get_ct
         raw_data = parse_json_string(raw_data)
 
     validate_access_key(access_key, raw_data.get("app_id"), ctx)
-    response, data_params = handle_text_filter(raw_data, ctx)
+    response, data_params = await handle_text_filter(raw_data, ctx)
 
     request_ip = request.client.host if request.client else ""
 
     response["extra"]["client_ip"] = request_ip
 
-    try:
-        submit_kafka(data_params, response, ctx)
-    except Exception as err:
-        ctx.logger.debug(f"submit kafka error: {err}")
+    # 只入队，序列化与写入由后台日志管道完成
+    submit_log(ctx, "text", data_params, response)
 
     return response
+
+
+@router.post("/text/batch", dependencies=[Depends(check_client_ip)])
+async def text_filter_batch(payload: TextBatchRequest, request: Request, ctx=Depends(get_ctx)):
+    if not payload.ugc_source:
+        raise ParameterException(msg="参数不合法(ugc_source not exist)")
+    if not payload.data:
+        raise ParameterException(msg="参数不合法(data is empty)")
+    max_size = ctx.config.get("TEXT_BATCH_MAX_SIZE", 500)
+    if len(payload.data) > max_size:
+        raise ParameterException(msg=f"参数不合法(data size exceeds {max_size})")
+
+    results = await handle_text_batch(payload.data, payload.access_key, ctx)
+
+    request_ip = request.client.host if request.client else ""
+    responses = []
+    for response, data_params in results:
+        if data_params is not None:
+            response["extra"]["client_ip"] = request_ip
+            submit_log(ctx, "text", data_params, response)
+        responses.append(response)
+
+    return {"code": 1100, "message": "成功", "results": responses}
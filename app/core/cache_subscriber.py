@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import json
+import threading
+
+from app.services.cache import CACHE_EVENT_CHANNEL, apply_cache_events, update_cache_data
+
+
+class CacheSubscriber(object):
+    """订阅缓存变更事件并在后台线程中增量更新本地缓存。
+
+    同一批到达的事件会合并处理；每次（重新）订阅成功后先按版本号对账一次，补上订阅之前或断线期间的变更。
+    定时任务仍然保留，作为兜底同步。
+    """
+
+    def __init__(self, ctx, poll_timeout: float = 1.0, retry_interval: float = 3.0):
+        self.ctx = ctx
+        self.poll_timeout = poll_timeout
+        self.retry_interval = retry_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cache-subscriber", daemon=True)
+        self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.ctx.config["REDIS_CLIENT"].pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CACHE_EVENT_CHANNEL)
+                update_cache_data(self.ctx, jitter=False)
+                while not self._stop.is_set():
+                    events = self._drain(pubsub)
+                    if events:
+                        apply_cache_events(self.ctx, events)
+            except Exception as err:
+                self.ctx.logger.debug(f"cache subscriber err: {err}")
+                self._stop.wait(self.retry_interval)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def _drain(self, pubsub):
+        events = []
+        message = pubsub.get_message(timeout=self.poll_timeout)
+        while message is not None:
+            if message.get("type") == "message":
+                try:
+                    events.append(json.loads(message["data"]))
+                except (TypeError, ValueError):
+                    pass
+            message = pubsub.get_message(timeout=0)
+        return events
+
+
+def create_cache_subscriber(ctx) -> CacheSubscriber:
+    return CacheSubscriber(ctx)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -32,13 +32,53 @@ class Settings(BaseSettings):
     KAFKA_TOPIC_JSON: str = "plat_chatmsg_json"
     KAFKA_TOPIC_IMG: str = "plat_chatmsg_img"
     KAFKA_LOG_DIR: str = "logs/kafka"
+    # 日志后台批量落盘：队列长度、每批行数、最长刷盘间隔（秒）、队列满时的等待时间（秒，0 表示直接丢弃）
+    KAFKA_LOG_QUEUE_SIZE: int = 100000
+    KAFKA_LOG_BATCH_SIZE: int = 512
+    KAFKA_LOG_FLUSH_INTERVAL: float = 1.0
+    KAFKA_LOG_BLOCK_TIMEOUT: float = 0
+    # 接口日志后台管道：请求只入队，序列化与写入由后台线程批量完成；配置 KAFKA_BROKERS 时直接写 Kafka
+    LOG_PIPELINE_QUEUE_SIZE: int = 100000
+    LOG_PIPELINE_BATCH_SIZE: int = 512
+    LOG_PIPELINE_FLUSH_INTERVAL: float = 0.5
+    LOG_PIPELINE_WORKERS: int = 1
+    # 请求日志的 JSON 编码器：json（默认）或 orjson（需安装，输出为紧凑格式）
+    LOG_JSON_ENCODER: str = "json"
 
     LANGUAGE_CLS_URL: str = ""
     LANGUAGE_SWITCH: bool = False
+    # 批量语种识别接口，为空时批量检测按去重后的文本并发调用单条接口
+    LANGUAGE_CLS_BATCH_URL: str = ""
+    TEXT_BATCH_MAX_SIZE: int = 500
+    # 在 extra.response_time 中返回各阶段耗时（毫秒）
+    RESPONSE_STAGE_TIMINGS: bool = False
     AD_DETECT_URL: str = ""
+    # 外部接口（语种识别、广告模型、LLM）共用的异步 HTTP 连接池大小
+    HTTP_POOL_SIZE: int = 100
+    # 近期私聊记录：本地缓存条数、缓存有效期（秒）、读取 Redis 的超时（秒，超时则不带上下文继续检测）
+    CHAT_HISTORY_CACHE_SIZE: int = 10000
+    CHAT_HISTORY_CACHE_TTL: float = 2.0
+    CHAT_HISTORY_TIMEOUT: float = 0.05
+
+    # (app_id, channel) 合并后的名单与开关策略的本地缓存条数，channel 来自请求，超出时淘汰最早加入的条目
+    CHANNEL_POLICY_CACHE_SIZE: int = 10000
 
     TIME_SEED: int = 5
+    # 订阅 Redis 缓存变更事件，关闭后仅依赖 5 分钟一次的定时同步
+    CACHE_EVENTS: bool = True
+    # 多 worker 共享名单缓存的目录（建议放在 /dev/shm），为空时每个 worker 各自加载
+    SHARED_CACHE_DIR: Optional[str] = None
+    SHARED_CACHE_WAIT: int = 30
+    # 名单词条增量日志：未合并记录达到该条数时写入方顺带压缩；定时压缩间隔（分钟）
+    LIST_DELTA_COMPACT_SIZE: int = 500
+    LIST_DELTA_COMPACT_INTERVAL: int = 10
+    # worker 本地两级匹配器的增量层（新增词 + 墓碑）达到该大小时在后台合并进基础自动机
+    LIST_DELTA_MERGE_SIZE: int = 2000
+    # MySQL 全量导入 Redis 时分词与快照生成的进程数，0 表示 CPU 核数，1 表示在导入线程内完成
+    REDIS_IMPORT_WORKERS: int = 0
     BLACK_CLIENT_IP_FILE: str = "app/config/black_client_ip.txt"
+    # 允许写入 Yz-Client-Ip 的前置代理（IP 或 CIDR），为空时信任所有直连对端的该请求头（服务只能经网关访问）
+    TRUSTED_PROXIES: List[str] = Field(default_factory=list)
 
     LOG: Dict[str, Any] = Field(
         default_factory=lambda: {
@@ -54,3 +54,9 @@ class Unauthorized(APIException):
     status_code = 401
     error_code = 40100
     message = "未授权"
+
+
+class Forbidden(APIException):
+    status_code = 403
+    error_code = 40300
+    message = "禁止访问"
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from typing import Optional
+
+from app.utils.kafka_utils import img_log_records, text_log_records
+
+try:
+    from kafka import KafkaProducer
+except ImportError:  # pragma: no cover - 可选依赖
+    KafkaProducer = None
+
+
+_SERIALIZERS = {"text": text_log_records, "img": img_log_records}
+
+
+class KafkaProducerSink(object):
+    """直接写 Kafka 的日志出口，替代“落盘 + 采集”的链路；日志流按 KAFKA_TOPIC_* 映射到 topic。"""
+
+    def __init__(self, producer, topics: dict):
+        self.producer = producer
+        self.topics = topics
+
+    def write_batch(self, records):
+        for stream, line in records:
+            self.producer.send(self.topics[stream], line.encode("utf-8"))
+        self.producer.flush()
+
+    def close(self, timeout: Optional[float] = 10):
+        self.producer.close(timeout)
+
+
+class LogPipeline(object):
+    """请求日志后台管道。
+
+    接口只把 (类型, 请求数据, 响应) 放入有界队列，后台线程批量完成序列化与写入，
+    队列满时直接丢弃并计数，请求链路上不做任何序列化和 I/O。
+    """
+
+    def __init__(
+        self,
+        sink,
+        logger=None,
+        encoder: str = "json",
+        queue_size: int = 100000,
+        batch_size: int = 512,
+        flush_interval: float = 0.5,
+        workers: int = 1,
+    ):
+        self.sink = sink
+        self.logger = logger
+        self.encoder = encoder
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(int(queue_size), 1))
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {
+            "submitted": 0,
+            "dropped": 0,
+            "written": 0,
+            "errors": 0,
+            "batches": 0,
+            "write_ms_total": 0.0,
+            "write_ms_max": 0.0,
+        }
+        self._threads = [
+            threading.Thread(target=self._run, name=f"log-pipeline-{i}", daemon=True)
+            for i in range(max(int(workers), 1))
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, kind: str, data_params, response) -> bool:
+        if self._closed:
+            self._incr("dropped")
+            return False
+        try:
+            self._queue.put_nowait((kind, data_params, response))
+        except queue.Full:
+            self._incr("dropped")
+            return False
+        self._incr("submitted")
+        return True
+
+    def _incr(self, key: str, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        stop = False
+        while not stop:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            if stop or len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._write(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, batch):
+        records = []
+        for kind, data_params, response in batch:
+            try:
+                records.extend(_SERIALIZERS[kind](data_params, response, self.encoder))
+            except Exception as err:
+                self._incr("errors")
+                if self.logger is not None:
+                    self.logger.debug(f"serialize request log err: {err}")
+        start = time.perf_counter()
+        try:
+            self.sink.write_batch(records)
+        except Exception as err:
+            self._incr("errors", len(batch))
+            if self.logger is not None:
+                self.logger.warning(f"write request log err: {err}")
+            return
+        cost = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats["written"] += len(records)
+            self._stats["batches"] += 1
+            self._stats["write_ms_total"] += cost
+            self._stats["write_ms_max"] = max(self._stats["write_ms_max"], cost)
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+        data["queue_depth"] = self._queue.qsize()
+        data["write_ms_avg"] = data["write_ms_total"] / data["batches"] if data["batches"] else 0.0
+        return data
+
+    def close(self, timeout: Optional[float] = 10):
+        """停止接收新日志，写完队列中剩余的记录。"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout)
+
+
+def create_log_pipeline(ctx) -> LogPipeline:
+    """配置了 KAFKA_BROKERS 且安装了 kafka-python 时直接写 Kafka，否则写 KafkaLog 文件。
+
+    写文件时调用 KafkaLog.write_batch 同步落盘，缓冲只在管道的队列中发生一次。
+    """
+    config = ctx.config
+    sink = ctx.kafka_logger
+    brokers = config.get("KAFKA_BROKERS")
+    if brokers:
+        if KafkaProducer is None:
+            ctx.logger.warning("KAFKA_BROKERS is set but kafka-python is not installed, fallback to log files")
+        else:
+            producer = KafkaProducer(bootstrap_servers=brokers.split(","), linger_ms=50)
+            sink = KafkaProducerSink(
+                producer,
+                {
+                    "msg": config.get("KAFKA_TOPIC", "plat_chatmsg"),
+                    "query": config.get("KAFKA_TOPIC_QUERY", "plat_chatmsg_query"),
+                    "json": config.get("KAFKA_TOPIC_JSON", "plat_chatmsg_json"),
+                    "img": config.get("KAFKA_TOPIC_IMG", "plat_chatmsg_img"),
+                },
+            )
+    return LogPipeline(
+        sink,
+        logger=ctx.logger,
+        encoder=config.get("LOG_JSON_ENCODER", "json"),
+        queue_size=config.get("LOG_PIPELINE_QUEUE_SIZE", 100000),
+        batch_size=config.get("LOG_PIPELINE_BATCH_SIZE", 512),
+        flush_interval=config.get("LOG_PIPELINE_FLUSH_INTERVAL", 0.5),
+        workers=config.get("LOG_PIPELINE_WORKERS", 1),
+    )
@@ -3,6 +3,9 @@ from __future__ import annotations
 import datetime
 import logging
 import os
+import queue
+import threading
+import time
 from logging.handlers import TimedRotatingFileHandler
 from typing import Optional
 
@@ -37,15 +40,45 @@ def setup_logging(log_config: dict) -> logging.Logger:
 
 
 class KafkaLog:
-    def __init__(self, log_dir: str = "logs/kafka", mode: str = "a", encoding: str = "utf-8"):
+    """按天滚动的日志落盘，由后台线程批量写入。
+
+    write_* 只把日志行放入有界队列，写线程在积累 batch_size 行或距上次刷盘超过 flush_interval 秒时统一写入并 flush。
+    队列满时最多等待 block_timeout 秒（为 0 时直接丢弃），丢弃与等待次数记录在 stats() 中。
+    写线程在第一次调用 write_* 时才启动：作为日志管道的出口时只走同步的 write_batch，不再经过这里的队列二次缓冲。
+    """
+
+    _STREAMS = ("msg", "query", "json", "img")
+
+    def __init__(
+        self,
+        log_dir: str = "logs/kafka",
+        mode: str = "a",
+        encoding: str = "utf-8",
+        queue_size: int = 100000,
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+        block_timeout: float = 0,
+    ):
         self.mode = mode
         self.log_dir = log_dir
         self.encoding = encoding
         self._suffix = ".log"
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
         os.makedirs(self.log_dir, exist_ok=True)
         self._base_filename = datetime.datetime.now().strftime("%Y-%m-%d")
+        self._rollover_at = self._next_rollover()
         self._open_files()
 
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(int(queue_size), 1))
+        self._closed = False
+        self._lock = threading.Lock()
+        # 后台写线程与日志管道的 write_batch 可能同时写文件
+        self._write_lock = threading.Lock()
+        self._stats = {"written": 0, "dropped": 0, "blocked": 0, "flushes": 0}
+        self._thread = None
+
     def _open_files(self):
         msg_filename = self._base_filename + "_msg"
         query_filename = self._base_filename + "_query"
@@ -60,7 +93,16 @@ class KafkaLog:
         self.json_f = open(self.json_filename, self.mode, encoding=self.encoding)
         self.img_f = open(self.img_filename, self.mode, encoding=self.encoding)
 
+    @staticmethod
+    def _next_rollover() -> float:
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        return datetime.datetime.combine(tomorrow, datetime.time()).timestamp()
+
     def _check_base_filename(self):
+        # 只在越过零点后才格式化日期，避免每批都做 strftime
+        if time.time() < self._rollover_at:
+            return
+        self._rollover_at = self._next_rollover()
         cur_base = datetime.datetime.now().strftime("%Y-%m-%d")
         if cur_base != self._base_filename:
             self.msg_f.close()
@@ -70,22 +112,126 @@ class KafkaLog:
             self._base_filename = cur_base
             self._open_files()
 
+    def _start_writer(self):
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="kafka-log-writer", daemon=True)
+                self._thread.start()
+
+    def _put(self, stream: str, msg: str):
+        if self._closed:
+            self._incr("dropped")
+            return
+        if self._thread is None:
+            self._start_writer()
+        item = (stream, msg + "\n")
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        if self.block_timeout > 0:
+            self._incr("blocked")
+            try:
+                self._queue.put(item, timeout=self.block_timeout)
+                return
+            except queue.Full:
+                pass
+        self._incr("dropped")
+
+    def _incr(self, key: str, value: int = 1):
+        with self._lock:
+            self._stats[key] += value
+
     def write_msg(self, msg: str):
-        self._check_base_filename()
-        self.msg_f.write(msg + "\n")
-        self.msg_f.flush()
+        self._put("msg", msg)
 
     def write_query(self, msg: str):
-        self._check_base_filename()
-        self.query_f.write(msg + "\n")
-        self.query_f.flush()
+        self._put("query", msg)
 
     def write_json(self, msg: str):
-        self._check_base_filename()
-        self.json_f.write(msg + "\n")
-        self.json_f.flush()
+        self._put("json", msg)
 
     def write_img(self, msg: str):
-        self._check_base_filename()
-        self.img_f.write(msg + "\n")
-        self.img_f.flush()
+        self._put("img", msg)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        stop = False
+        while not stop:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            if stop or len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._write_batch(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write_batch(self, batch):
+        try:
+            self.write_batch(batch, newline=False)
+        except Exception:
+            self._incr("dropped", len(batch))
+
+    def write_batch(self, records, newline: bool = True):
+        """同步写入一批 (日志流, 日志行)，每个文件只 write + flush 一次。"""
+        lines = {stream: [] for stream in self._STREAMS}
+        for stream, line in records:
+            lines[stream].append(line + "\n" if newline else line)
+        with self._write_lock:
+            self._check_base_filename()
+            for stream, stream_lines in lines.items():
+                if stream_lines:
+                    f = getattr(self, f"{stream}_f")
+                    f.write("".join(stream_lines))
+                    f.flush()
+        self._incr("written", len(records))
+        self._incr("flushes")
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                batch.append(item)
+        if batch:
+            self._write_batch(batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+        data["queued"] = self._queue.qsize()
+        return data
+
+    def close(self, timeout: Optional[float] = 10):
+        """停止接收日志，写完队列中剩余的行后关闭文件；最多等待 timeout 秒，写线程卡住时不阻塞退出。"""
+        if self._closed:
+            return
+        with self._lock:
+            self._closed = True
+        if self._thread is not None:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+            if not self._thread.is_alive():
+                # 与 _closed 检查并发、排在结束标记之后的行同步写完
+                self._drain()
+        with self._write_lock:
+            for f in (self.msg_f, self.query_f, self.json_f, self.img_f):
+                try:
+                    f.close()
+                except Exception:
+                    pass
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+# 文本检测链路的阶段，顺序即 /metrics 的输出顺序
+STAGES = (
+    "validate",
+    "process_msg_data",
+    "history",
+    "history_fetch",
+    "language",
+    "whitelist",
+    "ignorelist",
+    "blacklist",
+    "ad_detect",
+    "llm",
+    "kafka_submit",
+    "total",
+)
+
+# 秒，覆盖 0.5ms ~ 5s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram(object):
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        i = bisect_left(self.buckets, seconds)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class StageMetrics(object):
+    """进程内的分阶段耗时直方图，按 Prometheus 文本格式输出；多 worker 部署时每个 worker 各自统计。"""
+
+    name = "yuyan_moderation_stage_seconds"
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self._buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self._buckets)
+            histogram.observe(seconds)
+
+    def observe_timings(self, timings: Dict[str, float]):
+        """timings 为 {阶段: 毫秒}。"""
+        for stage, ms in timings.items():
+            self.observe(stage, ms / 1000)
+
+    def snapshot(self) -> Dict[str, Histogram]:
+        with self._lock:
+            data = {}
+            for stage, histogram in self._histograms.items():
+                copy = Histogram(histogram.buckets)
+                copy.counts, copy.count, copy.sum = list(histogram.counts), histogram.count, histogram.sum
+                data[stage] = copy
+            return data
+
+    def render(self) -> str:
+        histograms = self.snapshot()
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        lines = [
+            f"# HELP {self.name} Latency of each moderation pipeline stage.",
+            f"# TYPE {self.name} histogram",
+        ]
+        for stage in sorted(histograms, key=lambda s: (order.get(s, len(order)), s)):
+            histogram = histograms[stage]
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{stage="{stage}",le="{_format_float(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{self.name}_sum{{stage="{stage}"}} {_format_float(histogram.sum)}')
+            lines.append(f'{self.name}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+def _format_float(value: float) -> str:
+    return repr(float(value))
+
+
+@contextmanager
+def stage_timer(timings: Optional[Dict[str, float]], stage: str):
+    """把代码块耗时（毫秒）累加到 timings[stage]；timings 为 None 时不计时。"""
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def record_stage(ctx, stage: str, seconds: float):
+    metrics = ctx.config.get("STAGE_METRICS")
+    if metrics is not None:
+        metrics.observe(stage, seconds)
+
+
+def render_samples(samples) -> str:
+    """samples 为 [(指标名, 类型, 说明, 值)]，输出无标签的 gauge / counter。"""
+    lines = []
+    for name, kind, help_text, value in samples:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {_format_float(value)}")
+    return "\n".join(lines) + "\n" if lines else ""
@@ -1,6 +1,6 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from app.services.cache import update_cache_data
+from app.services.cache import compact_list_deltas, update_cache_data
 
 
 def create_scheduler(ctx) -> BackgroundScheduler:
@@ -12,4 +12,11 @@ def create_scheduler(ctx) -> BackgroundScheduler:
         id="updateCache",
         replace_existing=True,
     )
+    scheduler.add_job(
+        func=lambda: compact_list_deltas(ctx.config["REDIS_CLIENT"]),
+        trigger="interval",
+        minutes=ctx.config.get("LIST_DELTA_COMPACT_INTERVAL", 10),
+        id="compactListDelta",
+        replace_existing=True,
+    )
     return scheduler
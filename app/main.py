@@ -13,20 +13,34 @@ _repo_parent = Path(__file__).resolve().parents[2]
 if _repo_parent.is_dir() and str(_repo_parent) not in sys.path:
     sys.path.insert(0, str(_repo_parent))
 
+import httpx
 import redis
+import redis.asyncio
 import requests
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
+from app.api.deps import get_client_ip
 from app.api.v1 import router as v1_router
 from app.core.config import load_settings
 from app.core.context import AppContext
 from app.core.db import Base, init_engine
 from app.core.exceptions import APIException, ServerError
+from app.core.log_pipeline import create_log_pipeline
+from app.core.metrics import StageMetrics
 from app.core.logging import KafkaLog, setup_logging
+from app.core.cache_subscriber import create_cache_subscriber
 from app.core.scheduler import create_scheduler
-from app.services.cache import load_cache_from_redis, load_chat_sentinel
+from app.services.cache import (
+    init_shared_cache,
+    load_cache_from_redis,
+    load_chat_sentinel,
+    refresh_ip_blocklist,
+    seed_ip_blocklist,
+)
+from app.utils.chat_history import ChatHistoryCache
+from app.utils.ip_blocklist import IPBlocklist
 from app.utils.send_feishu import send_feishu_message
 
 
@@ -41,7 +55,13 @@ async def lifespan(app: FastAPI):
     chat_redis_url = settings_dict.get("CHAT_LOG_REDIS_URL") or redis_url
     redis_client = redis.Redis.from_url(redis_url, decode_responses=True)
     chat_redis_client = redis.Redis.from_url(chat_redis_url, decode_responses=True)
-    kafka_logger = KafkaLog(settings_dict.get("KAFKA_LOG_DIR", "logs/kafka"))
+    kafka_logger = KafkaLog(
+        settings_dict.get("KAFKA_LOG_DIR", "logs/kafka"),
+        queue_size=settings_dict.get("KAFKA_LOG_QUEUE_SIZE", 100000),
+        batch_size=settings_dict.get("KAFKA_LOG_BATCH_SIZE", 512),
+        flush_interval=settings_dict.get("KAFKA_LOG_FLUSH_INTERVAL", 1.0),
+        block_timeout=settings_dict.get("KAFKA_LOG_BLOCK_TIMEOUT", 0),
+    )
     engine, SessionLocal = init_engine(settings_dict.get("SQLALCHEMY_DATABASE_URI"))
     # ensure models are registered
     from app import models  # noqa: F401
@@ -61,23 +81,49 @@ async def lifespan(app: FastAPI):
         config=settings_dict,
     )
     ctx.config["REQUESTS_SESSION"] = requests.Session()
+    pool_size = int(ctx.config.get("HTTP_POOL_SIZE", 100))
+    ctx.config["HTTP_CLIENT"] = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    )
+    ctx.config["CHAT_LOG_ASYNC_REDIS_CLIENT"] = redis.asyncio.Redis.from_url(chat_redis_url, decode_responses=True)
     ctx.config["REDIS_CLIENT"] = redis_client
     ctx.config["CHAT_LOG_REDIS_CLIENT"] = chat_redis_client
     ctx.config["kafka_logger"] = kafka_logger
+    ctx.config["STAGE_METRICS"] = StageMetrics()
+    ctx.config["CHAT_HISTORY_CACHE"] = ChatHistoryCache(
+        ctx.config.get("CHAT_HISTORY_CACHE_SIZE", 10000), ctx.config.get("CHAT_HISTORY_CACHE_TTL", 2.0)
+    )
+    log_pipeline = create_log_pipeline(ctx)
+    ctx.config["LOG_PIPELINE"] = log_pipeline
+    log_pipeline.start()
 
-    # 读取黑名单 IP
+    # 黑名单 IP 保存在 Redis 中由各 worker 共享，首次启动时导入旧的黑名单文件
     ip_file = Path(ctx.config.get("BLACK_CLIENT_IP_FILE", "app/config/black_client_ip.txt"))
     if ip_file.exists():
-        ctx.config["BLACK_CLIENT_IP"] = [i.strip() for i in ip_file.read_text(encoding="utf-8").splitlines() if i]
-    else:
-        ctx.config["BLACK_CLIENT_IP"] = []
-
-    # 初始化本地缓存
-    all_apps, app_channel, cache_data, access_key = load_cache_from_redis(redis_client)
+        seed_ip_blocklist(redis_client, ip_file.read_text(encoding="utf-8").splitlines())
+    refresh_ip_blocklist(ctx, force=True)
+    ctx.config["TRUSTED_PROXY_NETS"] = IPBlocklist(ctx.config.get("TRUSTED_PROXIES") or [])
+
+    # 初始化本地缓存；开启 SHARED_CACHE_DIR 时名单数据由共享缓存提供，挂载失败则回退到直接读取 Redis
+    shared = bool(ctx.config.get("SHARED_CACHE_DIR"))
+    list_detail_version = int(redis_client.get("list_detail_version_seq") or 0)
+    load_stats = {}
+    all_apps, app_channel, cache_data, access_key = load_cache_from_redis(
+        redis_client, include_lists=not shared, stats=load_stats
+    )
+    logger.info(f"load cache from redis: {load_stats}")
+    ctx.config["CACHE_LOAD_STATS"] = load_stats
     ctx.config["ALL_APPS"] = all_apps
     ctx.config["APP_CHANNEL"] = app_channel
-    ctx.config["CACHE_DATA"] = cache_data
     ctx.config["ACCESS_KEY"] = access_key
+    if not shared:
+        ctx.config["CACHE_DATA"] = cache_data
+        ctx.config["LIST_DETAIL_VERSION"] = list_detail_version
+    elif not init_shared_cache(ctx, redis_client, ctx.config.get("SHARED_CACHE_WAIT", 30)):
+        logger.warning("shared cache not ready, fallback to local cache")
+        ctx.config.pop("SHARED_CACHE", None)
+        ctx.config["CACHE_DATA"] = load_cache_from_redis(redis_client)[2]
+        ctx.config["LIST_DETAIL_VERSION"] = list_detail_version
     ctx.config["CHAT_SENTINEL"] = load_chat_sentinel(redis_client)
 
     app.state.ctx = ctx
@@ -87,14 +133,33 @@ async def lifespan(app: FastAPI):
     scheduler = create_scheduler(ctx)
     app.state.scheduler = scheduler
     scheduler.start()
+    # 管理端写入后通过 pub/sub 通知各 worker，定时任务仅作兜底
+    subscriber = None
+    if ctx.config.get("CACHE_EVENTS"):
+        subscriber = create_cache_subscriber(ctx)
+        subscriber.start()
     try:
         yield
     finally:
+        if subscriber is not None:
+            subscriber.shutdown()
         scheduler.shutdown()
+        if "SHARED_CACHE" in ctx.config:
+            ctx.config["SHARED_CACHE"].release()
         try:
             ctx.config["REQUESTS_SESSION"].close()
         except Exception:
             pass
+        for client in (ctx.config["HTTP_CLIENT"], ctx.config["CHAT_LOG_ASYNC_REDIS_CLIENT"]):
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+        # 写完队列中剩余的日志
+        log_pipeline.close()
+        if log_pipeline.sink is not kafka_logger:
+            log_pipeline.sink.close()
+        kafka_logger.close()
         engine.dispose()
 
 
@@ -126,11 +191,7 @@ def create_app() -> FastAPI:
         ctx = request.app.state.ctx
         log_config = ctx.config.get("LOG", {})
         if log_config.get("REQUEST_LOG"):
-            request_ip = request.headers.get("Yz-Client-Ip")
-            if request_ip:
-                request_ip = request_ip.split(",")[0]
-            else:
-                request_ip = request.client.host if request.client else ""
+            request_ip = get_client_ip(request, ctx.config.get("TRUSTED_PROXY_NETS"))
             message = "[%s] -> [%s] from:%s content-type:%s costs:%.3f ms" % (
                 request.method,
                 request.url.path,
@@ -48,8 +48,43 @@ class ChatMsg(object):
         self.sdk_id = sdk_id
         self.timestamp = timestamp
         self.chat_history = chat_history
+        # 分词缓存：(text, language, match_type) -> 分词结果，仅在本次请求内有效
+        self._token_cache = {}
+        # 异步链路中 AI 检测（广告模型 / LLM）由调用方在事件循环上完成，all_filter 只记录待检测的黑名单结果
+        self._defer_ai = False
+        self._ai_pending = None
+        # 分阶段耗时（毫秒），由文本检测链路记录
+        self._stage_timings = {}
 
     def set_attrs(self, attrs_dict):
         for key, value in attrs_dict.items():
-            if hasattr(self, key) and key != "type":
+            # 跳过私有字段和类上定义的方法 / 属性，避免请求数据覆盖
+            if key == "type" or key.startswith("_") or hasattr(type(self), key):
+                continue
+            if hasattr(self, key):
                 setattr(self, key, value)
+
+    @property
+    def token_cache(self):
+        return self._token_cache
+
+    def reset_token_cache(self):
+        self._token_cache = {}
+
+    @property
+    def stage_timings(self):
+        return self._stage_timings
+
+    def defer_ai(self):
+        self._defer_ai = True
+
+    @property
+    def ai_deferred(self):
+        return self._defer_ai
+
+    @property
+    def ai_pending(self):
+        return self._ai_pending
+
+    def set_ai_pending(self, blacklist_res):
+        self._ai_pending = blacklist_res
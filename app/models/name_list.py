@@ -6,6 +6,7 @@ from app.utils.enums import (
     ListMatchTypeEnum,
     ListRiskTypeEnum,
     ListLanguageScopeEnum,
+    ListMatchEngineEnum,
     ListScopeEnum,
     ListStatusEnum,
     ListSuggestEnum,
@@ -26,6 +27,7 @@ class NameList(BaseModel):
     language = Column(String(50))
     scope = Column(String(20), nullable=False, default=ListScopeEnum.APP_CHANNEL.value)
     language_scope = Column(String(20), nullable=False, default=ListLanguageScopeEnum.ALL.value)
+    match_engine = Column(String(20), nullable=False, default=ListMatchEngineEnum.SUBSTRING.value)
 
     @property
     def type(self):
@@ -13,6 +13,7 @@ class CreateOrUpdateNameList(APIModel):
     status: Optional[int] = 1
     language_scope: str
     language_codes: Optional[List[str]] = None
+    match_engine: Optional[str] = None
     scope: str
     app_ids: Optional[List[str]] = None
     channel_ids: Optional[List[int]] = None
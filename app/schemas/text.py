@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, List
 
 from .common import APIModel
 
@@ -7,3 +7,9 @@ class TextRequest(APIModel):
     access_key: str
     ugc_source: str
     data: Any
+
+
+class TextBatchRequest(APIModel):
+    access_key: str
+    ugc_source: str
+    data: List[Any]
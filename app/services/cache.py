@@ -1,103 +1,486 @@
 from __future__ import annotations
 
 import json
-import pickle
 import random
+import threading
 import time
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Optional, Tuple
 
+from redis.exceptions import WatchError
 
-def _redis_type(redis_client, key: str) -> str:
-    raw = redis_client.type(key)
+from app.services.shared_cache import SharedCacheStore
+from app.utils.actree_snapshot import dump_snapshot, load_actree, load_words
+from app.utils.chat_sentinel import SENTINEL_KINDS, ChatSentinel
+from app.utils.ip_blocklist import IPBlocklist, normalize_ip_entry
+from app.utils.list_delta import (
+    LIST_DELTA_PREFIX,
+    decode_deltas,
+    delta_key,
+    encode_ops,
+    last_version,
+)
+from app.utils.list_meta import attach_list_meta
+from app.utils.match_data_utils import refresh_channel_policies, refresh_scope_indexes
+from app.utils.tiered_matcher import tiered
+
+# 名单 / 作用域配置变更的通知频道，见 app/core/cache_subscriber.py
+CACHE_EVENT_CHANNEL = "cache_update_events"
+
+# 调用方 IP 黑名单（set）及其版本号，各 worker 按版本号判断是否需要重建
+BLACK_CLIENT_IP_KEY = "black_client_ip"
+BLACK_CLIENT_IP_VERSION_KEY = "black_client_ip_version"
+
+# 有未合并增量日志的名单集合，以及定时压缩的互斥锁
+LIST_DELTA_PENDING_KEY = "list_delta_pending"
+LIST_DELTA_COMPACT_LOCK = "list_delta_compact_lock"
+# MySQL 全量导入的互斥锁与进度（hash），见 app/utils/cache_sql_data.py
+SQL_IMPORT_LOCK = "sql_import_lock"
+SQL_IMPORT_PROGRESS_KEY = "sql_import_progress"
+# 名单 hash 中除 data 外的字段，增量同步时只读取这些字段
+LIST_META_FIELDS = (
+    "name",
+    "type",
+    "match_rule",
+    "match_type",
+    "suggest",
+    "risk_type",
+    "status",
+    "language",
+    "language_scope",
+    "language_codes",
+    "match_engine",
+    "base_version",
+)
+
+_NON_LIST_KEYS = {
+    "waiting_update_list_detail",
+    "waiting_update_app_channel_list",
+    "ucache_check_alive_key",
+    "list_detail_version_seq",
+    "list_detail_version",
+    "list_detail_version_index",
+    "all_apps",
+    "access_key",
+    BLACK_CLIENT_IP_KEY,
+    BLACK_CLIENT_IP_VERSION_KEY,
+    LIST_DELTA_PENDING_KEY,
+    LIST_DELTA_COMPACT_LOCK,
+    SQL_IMPORT_LOCK,
+    SQL_IMPORT_PROGRESS_KEY,
+}
+
+# 名单 / 作用域 key 的索引集合，由写入路径维护；CACHE_KEY_INDEX_READY 表示索引已完整回填
+LIST_KEY_INDEX = "cache_list_keys"
+APP_CHANNEL_KEY_INDEX = "cache_app_channel_keys"
+CACHE_KEY_INDEX_READY = "cache_key_index_ready"
+_KEY_INDEXES = {LIST_KEY_INDEX, APP_CHANNEL_KEY_INDEX, CACHE_KEY_INDEX_READY}
+
+LOAD_CHUNK_SIZE = 500
+
+# 订阅线程、定时任务线程和管理接口都会修改本地缓存（CACHE_DATA / LIST_VERSIONS / APP_CHANNEL / SCOPE_INDEX 等），
+# 持有该锁串行执行，避免较慢的一次同步用旧数据覆盖已加载的新版本
+cache_update_lock = threading.RLock()
+
+# 名单版本号的分配与对应的写入在同一个 Lua 脚本中原子完成：并发写入时版本号的顺序即生效顺序，
+# 读取方看到某个版本时，更小版本的增量记录一定已经写入（否则 worker 与压缩都可能跳过该记录）。
+# KEYS 前四个固定为 _LIST_VERSION_KEYS，ARGV[1] 为 list_no
+_LIST_VERSION_KEYS = ("list_detail_version_seq", "list_detail_version", "list_detail_version_index", LIST_KEY_INDEX)
+_PUBLISH_LIST_VERSION_LUA = """
+local version = redis.call("INCR", KEYS[1])
+redis.call("HSET", KEYS[2], ARGV[1], version)
+redis.call("ZADD", KEYS[3], version, ARGV[1])
+redis.call("SADD", KEYS[4], ARGV[1])
+"""
+BUMP_LIST_VERSION_SCRIPT = _PUBLISH_LIST_VERSION_LUA + """
+return version
+"""
+# KEYS[5] 增量日志，KEYS[6] 待压缩集合；ARGV[2] 为 encode_ops 的结果，记录格式与 encode_delta 一致
+APPEND_LIST_DELTA_SCRIPT = _PUBLISH_LIST_VERSION_LUA + """
+redis.call("ZADD", KEYS[5], version, '{"v":' .. version .. ',"ops":' .. ARGV[2] .. '}')
+redis.call("SADD", KEYS[6], ARGV[1])
+return version
+"""
+# KEYS[5] 名单 hash，KEYS[6] 增量日志，KEYS[7] 待压缩集合；ARGV[2] 为新的基础快照，空串表示清空词表
+RESET_LIST_WORDS_SCRIPT = _PUBLISH_LIST_VERSION_LUA + """
+if ARGV[2] == "" then
+    redis.call("HDEL", KEYS[5], "data")
+else
+    redis.call("HSET", KEYS[5], "data", ARGV[2])
+end
+redis.call("HSET", KEYS[5], "base_version", version)
+redis.call("DEL", KEYS[6])
+redis.call("SREM", KEYS[7], ARGV[1])
+return version
+"""
+
+
+def _is_list_key(key: str) -> bool:
+    return (
+        key not in _NON_LIST_KEYS
+        and key not in _KEY_INDEXES
+        and not key.startswith("chat_sentinel")
+        and not key.startswith("AC_")
+        and not key.startswith(LIST_DELTA_PREFIX)
+    )
+
+
+def _chunks(items, size: int):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _pipelined(redis_client, command: str, keys, stats: Optional[Dict] = None):
+    """按块流水线执行同一条单 key 命令，返回与 keys 对应的结果列表；出错的 key 结果为 None。"""
+    results = []
+    for chunk in _chunks(keys, LOAD_CHUNK_SIZE):
+        pipe = redis_client.pipeline(transaction=False)
+        for key in chunk:
+            getattr(pipe, command)(key)
+        for item in pipe.execute(raise_on_error=False):
+            results.append(None if isinstance(item, Exception) else item)
+        if stats is not None:
+            stats["round_trips"] = stats.get("round_trips", 0) + 1
+    return results
+
+
+def _to_int(raw) -> int:
+    try:
+        return int(raw) if raw else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def _decode(raw) -> str:
     if isinstance(raw, bytes):
         return raw.decode("utf-8", errors="ignore")
     return str(raw)
 
 
-def load_cache_from_redis(redis_client) -> Tuple[list, Dict, Dict, Dict]:
-    local_all_apps = []
-    local_list_data = {}
-    local_app_channel_listname = {}
-    local_access_key = {}
-
+def _scan_key_index(redis_client, stats: Optional[Dict] = None) -> Tuple[list, list]:
+    """索引未就绪时扫描全部 key 并回填索引。"""
+    app_channel_keys = []
+    candidates = []
     for key in redis_client.scan_iter():
-        if key in {
-            "waiting_update_list_detail",
-            "waiting_update_app_channel_list",
-            "ucache_check_alive_key",
-            "list_detail_version_seq",
-            "list_detail_version",
-            "list_detail_version_index",
-        }:
-            continue
-        if key.startswith("chat_sentinel"):
-            continue
-        if key == "all_apps":
-            local_all_apps = list(redis_client.smembers(key))
-            continue
-        if key == "access_key":
-            local_access_key = redis_client.hgetall(key)
-            continue
         if key.startswith("AC_"):
-            v = redis_client.hgetall(key)
-            for k, ve in v.items():
-                if k == "swich_shumei":
-                    v[k] = ve
-                else:
-                    v[k] = json.loads(ve) if isinstance(ve, str) else ve
-            local_app_channel_listname[key] = v
-            continue
+            app_channel_keys.append(key)
+        elif _is_list_key(key):
+            candidates.append(key)
+    types = _pipelined(redis_client, "type", candidates, stats)
+    list_keys = [key for key, t in zip(candidates, types) if t is not None and _decode(t) == "hash"]
+    for chunk in _chunks(list_keys, LOAD_CHUNK_SIZE):
+        redis_client.sadd(LIST_KEY_INDEX, *chunk)
+    for chunk in _chunks(app_channel_keys, LOAD_CHUNK_SIZE):
+        redis_client.sadd(APP_CHANNEL_KEY_INDEX, *chunk)
+    redis_client.set(CACHE_KEY_INDEX_READY, int(time.time()))
+    if stats is not None:
+        stats["source"] = "scan"
+    return list_keys, app_channel_keys
 
-        if _redis_type(redis_client, key) != "hash":
+
+def rebuild_key_index(redis_client, stats: Optional[Dict] = None) -> Tuple[list, list]:
+    redis_client.delete(CACHE_KEY_INDEX_READY)
+    redis_client.delete(LIST_KEY_INDEX)
+    redis_client.delete(APP_CHANNEL_KEY_INDEX)
+    return _scan_key_index(redis_client, stats)
+
+
+def read_key_index(redis_client, stats: Optional[Dict] = None) -> Tuple[list, list]:
+    """返回 (名单 key, AC_* key)。"""
+    if not redis_client.get(CACHE_KEY_INDEX_READY):
+        return _scan_key_index(redis_client, stats)
+    if stats is not None:
+        stats["source"] = "index"
+    return list(redis_client.smembers(LIST_KEY_INDEX)), list(redis_client.smembers(APP_CHANNEL_KEY_INDEX))
+
+
+def load_cache_from_redis(
+    redis_client, include_lists: bool = True, stats: Optional[Dict] = None
+) -> Tuple[list, Dict, Dict, Dict]:
+    """stats 不为空时写入加载统计：耗时、key 数量、网络往返次数、key 来源（index / scan）。"""
+    start = time.time()
+    stats = {} if stats is None else stats
+    stats["round_trips"] = 0
+    list_keys, app_channel_keys = read_key_index(redis_client, stats)
+    local_all_apps = list(set(redis_client.smembers("all_apps")))
+    local_access_key = redis_client.hgetall("access_key")
+
+    local_app_channel_listname = {}
+    for key, v in zip(app_channel_keys, _pipelined(redis_client, "hgetall", app_channel_keys, stats)):
+        if not v:
             continue
-        v = redis_client.hgetall(key)
-        raw = v.get("data")
-        if raw:
-            if isinstance(raw, str):
-                data = pickle.loads(raw.encode("latin1"))
+        for k, ve in v.items():
+            if k == "swich_shumei":
+                v[k] = ve
             else:
-                data = raw
-        else:
-            data = ""
-        v["data"] = data
-        local_list_data[key] = v
+                v[k] = json.loads(ve) if isinstance(ve, str) else ve
+        local_app_channel_listname[key] = v
+
+    local_list_data = {}
+    if include_lists:
+        for key, v in read_raw_lists(redis_client, list_keys, stats).items():
+            local_list_data[key] = _load_list(v)
 
-    local_all_apps = list(set(local_all_apps))
+    stats.update(
+        lists=len(local_list_data),
+        app_channels=len(local_app_channel_listname),
+        keys=len(list_keys) + len(app_channel_keys),
+        seconds=round(time.time() - start, 3),
+    )
     return local_all_apps, local_app_channel_listname, local_list_data, local_access_key
 
 
-def process_redis_data(data: Dict) -> Dict:
-    result = {}
-    if not data:
-        return result
-    for rule, detail_str in data.items():
-        detail = json.loads(detail_str)
-        for app, ids in detail.items():
-            for item in ids:
-                key = f"{app}_{item}"
-                result.setdefault(key, []).append(rule)
-    return result
+def read_raw_lists(
+    redis_client, list_nos: Optional[Iterable[str]] = None, stats: Optional[Dict] = None
+) -> Dict[str, Dict]:
+    """读取名单 hash 的原始内容（data 保持 Redis 中的序列化格式），list_nos 为空时读取索引中的全部名单。
+
+    base_version 之后的增量日志解码后放在 deltas 中；hash 与增量日志在同一个事务中读取，不会与压缩交错。
+    """
+    if list_nos is None:
+        list_nos = read_key_index(redis_client, stats)[0]
+    raw_lists = {}
+    for chunk in _chunks(list_nos, LOAD_CHUNK_SIZE):
+        pipe = redis_client.pipeline(transaction=True)
+        for list_no in chunk:
+            pipe.hgetall(list_no)
+            pipe.zrangebyscore(delta_key(list_no), "-inf", "+inf")
+        results = pipe.execute(raise_on_error=False)
+        if stats is not None:
+            stats["round_trips"] = stats.get("round_trips", 0) + 1
+        for list_no, v, members in zip(chunk, results[0::2], results[1::2]):
+            # 不存在或类型不对的 key 结果为空
+            if not v or isinstance(v, Exception):
+                continue
+            if members and not isinstance(members, Exception):
+                deltas = decode_deltas(members, _to_int(v.get("base_version")))
+                if deltas:
+                    v["deltas"] = deltas
+            raw_lists[list_no] = v
+    return raw_lists
+
+
+def _load_list(v: Dict) -> Dict:
+    """把 read_raw_lists 的结果加载为本地名单；本地的 base_version 为已应用到的最大版本。"""
+    deltas = v.pop("deltas", None)
+    v["data"] = load_actree(v.get("data"), v.get("match_rule"), v.get("match_engine"), deltas)
+    if deltas:
+        v["base_version"] = str(last_version(deltas))
+    return attach_list_meta(v)
 
 
-def load_chat_sentinel(redis_client) -> Dict:
-    account_id_data = redis_client.hgetall("chat_sentinel_account_id")
-    ip_data = redis_client.hgetall("chat_sentinel_ip")
-    return {
-        "account_id": process_redis_data(account_id_data),
-        "ip": process_redis_data(ip_data),
-    }
+def _list_versions(redis_client, list_nos) -> Dict[str, int]:
+    versions = {}
+    for chunk in _chunks(list_nos, LOAD_CHUNK_SIZE):
+        for list_no, raw_version in zip(chunk, redis_client.hmget("list_detail_version", chunk)):
+            try:
+                versions[list_no] = int(raw_version) if raw_version else 0
+            except Exception:
+                versions[list_no] = 0
+    return versions
+
+
+def _max_list_version(redis_client, list_nos: Iterable[str], last_version: int) -> int:
+    return max([last_version] + list(_list_versions(redis_client, list_nos).values()))
+
+
+def _apply_list_deltas(cache_data: Dict, redis_client, list_nos, merge_size: int = 0) -> Tuple[list, list]:
+    """在本地名单上应用增量日志并刷新元数据，返回 (已更新的名单, 需要整体重新加载的名单)。
+
+    基础快照已被压缩或重置（远端 base_version 大于本地已应用的版本）或匹配器类型变化时整体重新加载。
+    """
+    updated, full = [], []
+    for chunk in _chunks(list_nos, LOAD_CHUNK_SIZE):
+        pipe = redis_client.pipeline(transaction=True)
+        for list_no in chunk:
+            pipe.hmget(list_no, LIST_META_FIELDS)
+            pipe.zrangebyscore(delta_key(list_no), _to_int(cache_data[list_no].get("base_version")) + 1, "+inf")
+        results = pipe.execute(raise_on_error=False)
+        for list_no, fields, members in zip(chunk, results[0::2], results[1::2]):
+            old = cache_data[list_no]
+            local_version = _to_int(old.get("base_version"))
+            if isinstance(fields, Exception) or isinstance(members, Exception) or not any(fields):
+                full.append(list_no)
+                continue
+            v = {k: ve for k, ve in zip(LIST_META_FIELDS, fields) if ve is not None}
+            if (
+                _to_int(v.get("base_version")) > local_version
+                or v.get("match_rule") != old.get("match_rule")
+                or v.get("match_engine") != old.get("match_engine")
+            ):
+                full.append(list_no)
+                continue
+            deltas = decode_deltas(members, local_version)
+            data = old.get("data")
+            if deltas:
+                # 只重建增量层，增量层过大时在后台合并进新的基础匹配器
+                data = tiered(data, v.get("match_rule"), v.get("match_engine")).apply(deltas)
+                if merge_size and data.pending >= merge_size:
+                    data.merge_async()
+            v["data"] = data
+            v["base_version"] = str(last_version(deltas, local_version))
+            cache_data[list_no] = attach_list_meta(v)
+            updated.append(list_no)
+    return updated, full
+
+
+def _reload_lists(ctx, redis_client, list_nos: Iterable[str]) -> bool:
+    """重新加载名单；LIST_VERSIONS 记录已加载的版本，订阅事件已处理过的名单在定时同步时跳过。
+
+    本地已有的名单只读取元数据和新增的增量日志，在两级匹配器上应用，不再传输整个词表、不再整体重建自动机。
+    """
+    applied = ctx.config.setdefault("LIST_VERSIONS", {})
+    cache_data = ctx.config.setdefault("CACHE_DATA", {})
+    versions = _list_versions(redis_client, list_nos)
+    stale = [
+        list_no for list_no, version in versions.items() if not version or applied.get(list_no, 0) < version
+    ]
+    updated, full = _apply_list_deltas(
+        cache_data,
+        redis_client,
+        [i for i in stale if i in cache_data],
+        ctx.config.get("LIST_DELTA_MERGE_SIZE", 2000),
+    )
+    full += [i for i in stale if i not in cache_data]
+    for list_no, v in read_raw_lists(redis_client, full).items():
+        cache_data[list_no] = _load_list(v)
+        updated.append(list_no)
+    for list_no in updated:
+        applied[list_no] = versions[list_no]
+    return bool(updated)
+
+
+def _apply_app_channel_field(ctx, redis_client, gc: str, key: str):
+    raw = redis_client.hget(gc, key)
+    if key == "swich_shumei":
+        new_data = raw
+    else:
+        new_data = json.loads(raw) if isinstance(raw, str) else raw
+    ctx.config.setdefault("APP_CHANNEL", {})
+    ctx.config["APP_CHANNEL"].setdefault(gc, {})[key] = new_data
+    refresh_channel_policies(ctx, [gc])
+
+
+def init_shared_cache(ctx, redis_client, timeout: float = 30) -> bool:
+    """共享缓存模式下的启动流程：抢到锁的进程负责发布 generation，其它进程等待并挂载。"""
+    store = SharedCacheStore(ctx.config["SHARED_CACHE_DIR"])
+    ctx.config["SHARED_CACHE"] = store
+    if store.try_become_leader():
+        version = int(redis_client.get("list_detail_version_seq") or 0)
+        store.publish(read_raw_lists(redis_client), version)
+    elif not store.wait_for_generation(timeout):
+        return False
+    return _attach_shared_cache(ctx, store)
 
 
-def update_cache_data(ctx) -> bool:
+def _attach_shared_cache(ctx, store: SharedCacheStore) -> bool:
+    cache_data = store.attach(ctx.config.get("CACHE_DATA"))
+    if cache_data is None:
+        return False
+    ctx.config["CACHE_DATA"] = cache_data
+    ctx.config["LIST_DETAIL_VERSION"] = store.list_detail_version
+    return True
+
+
+def sync_shared_cache(ctx, store: SharedCacheStore, full: bool = False) -> bool:
+    """leader 发布新的 generation（默认按版本号增量），所有 worker 挂载最新 generation。返回 CACHE_DATA 是否被替换。"""
+    redis_client = ctx.config["REDIS_CLIENT"]
+    if store.try_become_leader():
+        last_version = store.list_detail_version
+        generation = 0
+        if full or not store.generation:
+            # 全量发布；也用于上一任 leader 退出后由尚未挂载过 generation 的进程接手
+            version = int(redis_client.get("list_detail_version_seq") or 0)
+            generation = store.publish(read_raw_lists(redis_client), version)
+        else:
+            updated_list = redis_client.zrevrangebyscore(
+                "list_detail_version_index", min=last_version + 1, max=10**18
+            )
+            if updated_list:
+                generation = store.publish(
+                    read_raw_lists(redis_client, updated_list),
+                    _max_list_version(redis_client, updated_list, last_version),
+                    store.list_nos(),
+                )
+        if generation:
+            publish_cache_event(redis_client, "generation", generation=generation)
+    return _attach_shared_cache(ctx, store)
+
+
+def load_chat_sentinel(redis_client, sentinel: Optional[ChatSentinel] = None) -> ChatSentinel:
+    """同步策略模型封禁名单；传入已有索引时只解析内容有变化的规则并增量更新。"""
+    if not isinstance(sentinel, ChatSentinel):
+        sentinel = ChatSentinel()
+    for kind in SENTINEL_KINDS:
+        sentinel.index(kind).sync(redis_client.hgetall(f"chat_sentinel_{kind}"))
+    return sentinel
+
+
+def seed_ip_blocklist(redis_client, entries: Iterable[str]) -> bool:
+    """首次启动时把旧的 IP 黑名单文件导入 Redis；已初始化过（存在版本号）时不再导入。"""
+    if redis_client.get(BLACK_CLIENT_IP_VERSION_KEY) is not None:
+        return False
+    valid = []
+    for entry in entries:
+        try:
+            valid.append(normalize_ip_entry(entry))
+        except ValueError:
+            continue
+    if valid:
+        redis_client.sadd(BLACK_CLIENT_IP_KEY, *valid)
+    redis_client.incr(BLACK_CLIENT_IP_VERSION_KEY)
+    return True
+
+
+def refresh_ip_blocklist(ctx, force: bool = False) -> bool:
+    """版本号变化时重建本地 IP 黑名单，返回是否重建。"""
+    redis_client = ctx.config["REDIS_CLIENT"]
+    version = int(redis_client.get(BLACK_CLIENT_IP_VERSION_KEY) or 0)
+    if not force and "IP_BLOCKLIST" in ctx.config and ctx.config.get("IP_BLOCKLIST_VERSION") == version:
+        return False
+    ctx.config["IP_BLOCKLIST"] = IPBlocklist(redis_client.smembers(BLACK_CLIENT_IP_KEY))
+    ctx.config["IP_BLOCKLIST_VERSION"] = version
+    return True
+
+
+def update_blocked_ip(redis_client, entry: str, blocked: bool) -> bool:
+    """新增 / 删除一条 IP 黑名单（entry 需已规范化），返回是否有变化；有变化时递增版本号并通知各 worker。"""
+    if blocked:
+        changed = redis_client.sadd(BLACK_CLIENT_IP_KEY, entry)
+    else:
+        changed = redis_client.srem(BLACK_CLIENT_IP_KEY, entry)
+    if not changed:
+        return False
+    version = int(redis_client.incr(BLACK_CLIENT_IP_VERSION_KEY))
+    publish_cache_event(redis_client, "black_ip", version=version)
+    return True
+
+
+def reset_chat_sentinel_rule(ctx, kind: str, rule: str) -> None:
+    """规则被清空后只更新该规则对应的索引。"""
+    sentinel = ctx.config.get("CHAT_SENTINEL")
+    if not isinstance(sentinel, ChatSentinel):
+        ctx.config["CHAT_SENTINEL"] = load_chat_sentinel(ctx.config["REDIS_CLIENT"])
+        return
+    sentinel.index(kind).apply_rule(rule, ctx.config["REDIS_CLIENT"].hget(f"chat_sentinel_{kind}", rule))
+
+
+def update_cache_data(ctx, jitter: bool = True) -> bool:
+    time_seed = ctx.config.get("TIME_SEED", 0)
+    if jitter and time_seed:
+        time.sleep(random.randint(0, time_seed))
+    with cache_update_lock:
+        return _update_cache_data(ctx)
+
+
+def _update_cache_data(ctx) -> bool:
     try:
-        time_seed = ctx.config.get("TIME_SEED", 0)
-        if time_seed:
-            time.sleep(random.randint(0, time_seed))
         redis_client = ctx.config["REDIS_CLIENT"]
         # 更新缓存基础数据
         ctx.config["ALL_APPS"] = list(redis_client.smembers("all_apps"))
         ctx.config["ACCESS_KEY"] = redis_client.hgetall("access_key")
-        ctx.config["CHAT_SENTINEL"] = load_chat_sentinel(redis_client)
+        ctx.config["CHAT_SENTINEL"] = load_chat_sentinel(redis_client, ctx.config.get("CHAT_SENTINEL"))
+        refresh_ip_blocklist(ctx)
 
         # 更新 APP_CHANNEL
         t = int(time.time())
@@ -105,45 +488,23 @@ def update_cache_data(ctx) -> bool:
         if num_app_channel:
             for item in redis_client.zrevrangebyscore("waiting_update_app_channel_list", min=t - 500, max=t):
                 gc, key = item.split("|", 1)
-                raw = redis_client.hget(gc, key)
-                if key == "swich_shumei":
-                    new_data = raw
-                else:
-                    new_data = json.loads(raw) if isinstance(raw, str) else raw
-                ctx.config.setdefault("APP_CHANNEL", {})
-                ctx.config["APP_CHANNEL"].setdefault(gc, {})[key] = new_data
+                _apply_app_channel_field(ctx, redis_client, gc, key)
 
         # 更新 CACHE_DATA（基于版本号增量更新）
-        last_version = ctx.config.get("LIST_DETAIL_VERSION", 0)
-        updated_list = redis_client.zrevrangebyscore(
-            "list_detail_version_index", min=last_version + 1, max=10**18
-        )
-        if updated_list:
-            max_version = last_version
-            for list_no in updated_list:
-                if _redis_type(redis_client, list_no) != "hash":
-                    continue
-                v = redis_client.hgetall(list_no)
-                raw = v.get("data")
-                if raw:
-                    if isinstance(raw, str):
-                        data = pickle.loads(raw.encode("latin1"))
-                    else:
-                        data = raw
-                else:
-                    data = ""
-                v["data"] = data
-                ctx.config.setdefault("CACHE_DATA", {})
-                ctx.config["CACHE_DATA"][list_no] = v
-                raw_version = redis_client.hget("list_detail_version", list_no)
-                if raw_version:
-                    try:
-                        version = int(raw_version)
-                        if version > max_version:
-                            max_version = version
-                    except Exception:
-                        pass
-            ctx.config["LIST_DETAIL_VERSION"] = max_version
+        store = ctx.config.get("SHARED_CACHE")
+        if store is not None:
+            updated_list = sync_shared_cache(ctx, store)
+        else:
+            last_version = ctx.config.get("LIST_DETAIL_VERSION", 0)
+            updated_list = redis_client.zrevrangebyscore(
+                "list_detail_version_index", min=last_version + 1, max=10**18
+            )
+            if updated_list:
+                _reload_lists(ctx, redis_client, updated_list)
+                ctx.config["LIST_DETAIL_VERSION"] = _max_list_version(redis_client, updated_list, last_version)
+
+        if num_app_channel or updated_list:
+            refresh_scope_indexes(ctx)
 
         # 清理过期记录（仅保留 app_channel 队列清理）
         if redis_client.zcount("waiting_update_app_channel_list", min=0, max=t - 500):
@@ -154,8 +515,137 @@ def update_cache_data(ctx) -> bool:
         return False
 
 
+def apply_cache_events(ctx, events: Iterable[Dict]) -> bool:
+    """按订阅到的变更事件增量更新本地缓存，返回缓存是否有变化。"""
+    with cache_update_lock:
+        return _apply_cache_events(ctx, events)
+
+
+def _apply_cache_events(ctx, events: Iterable[Dict]) -> bool:
+    redis_client = ctx.config["REDIS_CLIENT"]
+    changed = False
+    list_nos = []
+    generation = False
+    for event in events:
+        event_type = event.get("type")
+        if event_type == "app_channel":
+            _apply_app_channel_field(ctx, redis_client, event["key"], event["field"])
+            changed = True
+        elif event_type == "list":
+            if event["list_no"] not in list_nos:
+                list_nos.append(event["list_no"])
+        elif event_type == "generation":
+            generation = True
+        elif event_type == "black_ip":
+            refresh_ip_blocklist(ctx)
+
+    store = ctx.config.get("SHARED_CACHE")
+    if store is not None:
+        if list_nos or generation:
+            changed = sync_shared_cache(ctx, store) or changed
+    elif list_nos:
+        changed = _reload_lists(ctx, redis_client, list_nos) or changed
+
+    if changed:
+        refresh_scope_indexes(ctx)
+    return changed
+
+
+def publish_cache_event(redis_client, event_type: str, **payload) -> None:
+    # 发布失败不影响写入，各 worker 由定时同步兜底
+    try:
+        redis_client.publish(CACHE_EVENT_CHANNEL, json.dumps(dict(payload, type=event_type)))
+    except Exception:
+        pass
+
+
+def mark_app_channel_updated(redis_client, key: str, field: str) -> None:
+    redis_client.sadd(APP_CHANNEL_KEY_INDEX, key)
+    redis_client.zadd("waiting_update_app_channel_list", {f"{key}|{field}": int(time.time())})
+    publish_cache_event(redis_client, "app_channel", key=key, field=field)
+
+
 def bump_list_detail_version(redis_client, list_no: str) -> int:
-    version = int(redis_client.incr("list_detail_version_seq"))
-    redis_client.hset("list_detail_version", list_no, version)
-    redis_client.zadd("list_detail_version_index", {list_no: version})
+    return _run_version_script(redis_client, BUMP_LIST_VERSION_SCRIPT, list_no)
+
+
+def _run_version_script(redis_client, script: str, list_no: str, keys=(), args=()) -> int:
+    version = int(
+        redis_client.register_script(script)(keys=list(_LIST_VERSION_KEYS) + list(keys), args=[list_no] + list(args))
+    )
+    publish_cache_event(redis_client, "list", list_no=list_no, version=version)
+    return version
+
+
+def append_list_delta(redis_client, list_no: str, ops: list, compact_size: int = 0) -> int:
+    """追加一条词条变更记录（ops 见 app/utils/list_delta.py）并递增名单版本，返回新版本号。
+
+    变更只追加不改写基础快照，并发写入不会互相覆盖；未合并的记录达到 compact_size 条时顺带压缩。
+    """
+    version = _run_version_script(
+        redis_client,
+        APPEND_LIST_DELTA_SCRIPT,
+        list_no,
+        (delta_key(list_no), LIST_DELTA_PENDING_KEY),
+        (encode_ops(ops),),
+    )
+    if compact_size and redis_client.zcard(delta_key(list_no)) >= compact_size:
+        compact_list_delta(redis_client, list_no)
     return version
+
+
+def reset_list_words(redis_client, list_no: str, words: Optional[Iterable[Tuple[str, str]]] = None) -> int:
+    """用 words 整体替换名单的基础快照（为空时清空词表）并丢弃增量日志，返回新版本号。"""
+    words = list(words or ())
+    return _run_version_script(
+        redis_client,
+        RESET_LIST_WORDS_SCRIPT,
+        list_no,
+        (list_no, delta_key(list_no), LIST_DELTA_PENDING_KEY),
+        (dump_snapshot(list_no, words) if words else "",),
+    )
+
+
+def compact_list_delta(redis_client, list_no: str) -> bool:
+    """把增量日志合并进新的基础快照，返回是否完成压缩。
+
+    WATCH 名单 hash：压缩期间基础快照被其它进程改写（另一次压缩、重置、全量导入）时放弃本次压缩；
+    新追加的记录版本更高，不会被删除。压缩不改变词表内容，因此不递增版本号。
+    """
+    key = delta_key(list_no)
+    pipe = redis_client.pipeline()
+    try:
+        pipe.watch(list_no)
+        raw = pipe.hgetall(list_no)
+        members = pipe.zrangebyscore(key, "-inf", "+inf")
+        if not raw or not members:
+            return False
+        base_version = _to_int(raw.get("base_version"))
+        deltas = decode_deltas(members, base_version)
+        version = last_version(deltas, base_version)
+        words = load_words(raw.get("data"), deltas)
+        pipe.multi()
+        if words:
+            pipe.hset(list_no, mapping={"data": dump_snapshot(list_no, words), "base_version": version})
+        else:
+            pipe.hdel(list_no, "data")
+            pipe.hset(list_no, "base_version", version)
+        pipe.zremrangebyscore(key, "-inf", version)
+        pipe.execute()
+        return True
+    except WatchError:
+        return False
+    finally:
+        pipe.reset()
+
+
+def compact_list_deltas(redis_client, lock_seconds: int = 60) -> int:
+    """定时压缩所有有增量日志的名单；多个进程同时触发时只有拿到锁的进程执行。返回压缩的名单数。"""
+    if not redis_client.set(LIST_DELTA_COMPACT_LOCK, int(time.time()), nx=True, ex=lock_seconds):
+        return 0
+    compacted = 0
+    for list_no in redis_client.smembers(LIST_DELTA_PENDING_KEY):
+        compacted += compact_list_delta(redis_client, list_no)
+        if not redis_client.zcard(delta_key(list_no)):
+            redis_client.srem(LIST_DELTA_PENDING_KEY, list_no)
+    return compacted
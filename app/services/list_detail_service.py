@@ -1,17 +1,22 @@
-import pickle
 from datetime import datetime
 
+from sqlalchemy import insert, text as sql_text
 from sqlalchemy.orm import Session
 
 from app.core.exceptions import NotFound, ParameterException
 from app.models.list_detail import ListDetail
-from app.utils.ahocorasick_utils import build_actree
 from app.utils.enums import ListMatchTypeEnum
-from app.services.cache import bump_list_detail_version
+from app.utils.list_delta import add_op, remove_op
+from app.services.cache import append_list_delta, reset_list_words
 from app.utils.tokenizer import AllTokenizer
 
 tokenizer = AllTokenizer()
 
+# 批量写入 / 查询时每条 SQL 的行数（IN 列表长度）
+BATCH_CHUNK_SIZE = 1000
+# 批量新增时暂存提交文本的临时表（连接级，用完即删）
+_BATCH_TEXT_TABLE = "tmp_batch_list_detail"
+
 
 def get_detail(db: Session, detail_id: int):
     detail = db.query(ListDetail).filter(ListDetail.id == detail_id, ListDetail.delete_time.is_(None)).first()
@@ -104,181 +109,164 @@ def remove_detail(db: Session, ctx, detail, name_list, form):
 
 
 def add_batch_detail(db: Session, ctx, name_list, form):
-    text_list = list(set(form.data.data))
-    new_text = []
-    for text in text_list:
-        exist = (
-            db.query(ListDetail)
-            .filter(ListDetail.list_no == name_list.no, ListDetail.text == text, ListDetail.delete_time.is_(None))
-            .first()
-        )
-        if exist:
-            continue
-        new_text.append(text)
-        detail = ListDetail(
-            list_id=name_list.id,
-            list_no=name_list.no,
-            text=text,
-            memo="",
-            create_by=form.username.data,
-            update_by=form.username.data,
-            create_time=datetime.now(),
-            update_time=datetime.now(),
-        )
-        db.add(detail)
+    """批量新增：由数据库一次筛出需要新增的文本，新文本批量插入，Redis 中只追加一条增量记录。
+
+    返回 {"inserted": 新增条数, "skipped": 重复或已存在的条数}。
+    """
+    submitted = form.data.data
+    new_text = _new_texts(db, name_list.no, submitted)
     if new_text:
+        now = datetime.now()
+        rows = [
+            {
+                "list_id": name_list.id,
+                "list_no": name_list.no,
+                "text": text,
+                "memo": "",
+                "create_by": form.username.data,
+                "update_by": form.username.data,
+                "create_time": now,
+                "update_time": now,
+            }
+            for text in new_text
+        ]
+        for chunk in _chunks(rows, BATCH_CHUNK_SIZE):
+            db.execute(insert(ListDetail), chunk)
         _add_batch_redis_data(ctx, name_list, new_text)
     db.commit()
-    return True
+    return {"inserted": len(new_text), "skipped": len(submitted) - len(new_text)}
 
 
 def remove_batch_detail(db: Session, ctx, name_list, form):
-    details = db.query(ListDetail).filter(ListDetail.id.in_(form.ids.data), ListDetail.delete_time.is_(None)).all()
-    if not details:
+    """批量删除：按块一条 UPDATE 软删除，Redis 中只追加一条增量记录、递增一次版本。返回删除条数。"""
+    ids = list(form.ids.data)
+    texts = []
+    for chunk in _chunks(ids, BATCH_CHUNK_SIZE):
+        rows = db.query(ListDetail.text).filter(ListDetail.id.in_(chunk), ListDetail.delete_time.is_(None))
+        texts.extend(row.text for row in rows)
+    if not texts:
         raise ParameterException(message="数据不存在")
-    for detail in details:
-        _remove_redis_word(ctx, name_list, detail.text)
-        detail.soft_delete(form.username.data)
-        db.add(detail)
+    values = {ListDetail.delete_time: datetime.now()}
+    if form.username.data:
+        values[ListDetail.delete_by] = form.username.data
+    for chunk in _chunks(ids, BATCH_CHUNK_SIZE):
+        db.query(ListDetail).filter(ListDetail.id.in_(chunk), ListDetail.delete_time.is_(None)).update(
+            values, synchronize_session=False
+        )
+    _remove_redis_words(ctx, name_list, texts)
     db.commit()
-    return True
+    return len(texts)
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _new_texts(db: Session, list_no, submitted):
+    """返回需要新增的文本（保持提交顺序）：名单中已存在的文本跳过，同一批内相等的文本只保留第一条。
+
+    “相等”由数据库按 text 列的排序规则判断（utf8mb4_general_ci 下大小写、重音、尾部空格不同的文本相等），
+    提交的文本先写入与 text 列类型、排序规则相同的临时表，再用一条 GROUP BY / NOT EXISTS 查询筛选。
+    MySQL 的同一条查询中临时表只能引用一次，因此批内去重用 GROUP BY 而不是自连接。
+    """
+    table = ListDetail.__tablename__
+    db.execute(
+        sql_text(f"CREATE TEMPORARY TABLE {_BATCH_TEXT_TABLE} AS SELECT id AS seq, text FROM {table} WHERE 1 = 0")
+    )
+    try:
+        rows = [{"seq": seq, "text": text} for seq, text in enumerate(submitted)]
+        for chunk in _chunks(rows, BATCH_CHUNK_SIZE):
+            db.execute(sql_text(f"INSERT INTO {_BATCH_TEXT_TABLE} (seq, text) VALUES (:seq, :text)"), chunk)
+        result = db.execute(
+            sql_text(
+                f"SELECT MIN(t.seq) AS seq FROM {_BATCH_TEXT_TABLE} t WHERE NOT EXISTS ("
+                f"SELECT 1 FROM {table} d WHERE d.list_no = :list_no AND d.text = t.text AND d.delete_time IS NULL"
+                f") GROUP BY t.text"
+            ),
+            {"list_no": list_no},
+        )
+        seqs = sorted(row.seq for row in result)
+    finally:
+        drop = "DROP TEMPORARY TABLE" if db.get_bind().dialect.name == "mysql" else "DROP TABLE"
+        db.execute(sql_text(f"{drop} {_BATCH_TEXT_TABLE}"))
+    return [submitted[seq] for seq in seqs]
 
 
 def validate_ids(db: Session, ids):
-    details = db.query(ListDetail).filter(ListDetail.id.in_(ids), ListDetail.delete_time.is_(None)).distinct().all()
-    if not details:
+    ids = list(ids)
+    first_id = None
+    list_set = set()
+    for chunk in _chunks(ids, BATCH_CHUNK_SIZE):
+        rows = db.query(ListDetail.id, ListDetail.list_no).filter(
+            ListDetail.id.in_(chunk), ListDetail.delete_time.is_(None)
+        )
+        for row in rows:
+            first_id = row.id if first_id is None else first_id
+            list_set.add(row.list_no)
+    if first_id is None:
         raise ParameterException(message="数据不存在")
-    list_set = list(set([i.list_no for i in details]))
     if len(list_set) != 1:
         raise ParameterException(message="数据存在异常, 删除失败")
-    return details[0]
+    return db.get(ListDetail, first_id)
 
 
-def _serialize_actree(actree):
-    try:
-        return pickle.dumps(actree).decode("latin1")
-    except Exception:
-        return actree
+def _filter_text(name_list, text):
+    match_type = ListMatchTypeEnum(name_list._match_type)
+    if match_type == ListMatchTypeEnum.SEMANTIC:
+        return tokenizer.tokenize(text, drop_prun=True, language=name_list.language)
+    return text
 
 
-def _load_actree(raw):
-    if isinstance(raw, str):
-        return pickle.loads(raw.encode("latin1"))
-    return raw
+def _new_list_mapping(name_list):
+    return {
+        "name": name_list.name,
+        "type": name_list._type,
+        "match_rule": name_list._match_rule,
+        "match_type": name_list._match_type,
+        "suggest": name_list._suggest,
+        "risk_type": name_list._risk_type,
+        "status": int(name_list._status),
+        "language": name_list.language,
+    }
 
 
-def _add_redis_data(ctx, name_list, raw_text):
+def _append_words(ctx, name_list, ops):
+    """词条变更追加到名单的增量日志，由各 worker 增量应用、定时压缩进基础快照。"""
     redis_client = ctx.redis
-    list_no = name_list.no
-    match_type = ListMatchTypeEnum(name_list._match_type)
-    if match_type == ListMatchTypeEnum.SEMANTIC:
-        filter_text = tokenizer.tokenize(raw_text, drop_prun=True, language=name_list.language)
-    else:
-        filter_text = raw_text
-    if redis_client.exists(list_no):
-        if redis_client.hexists(list_no, "data"):
-            data = redis_client.hget(list_no, "data")
-            ac_data = _load_actree(data)
-            ac_data.add_word(filter_text, (filter_text, raw_text))
-            ac_data.make_automaton()
-            redis_client.hset(list_no, "data", _serialize_actree(ac_data))
-        else:
-            redis_client.hset(list_no, "data", _serialize_actree(build_actree([(filter_text, raw_text)])))
-    else:
-        r = {
-            "name": name_list.name,
-            "type": name_list._type,
-            "match_rule": name_list._match_rule,
-            "match_type": name_list._match_type,
-            "suggest": name_list._suggest,
-            "risk_type": name_list._risk_type,
-            "status": int(name_list._status),
-            "language": name_list.language,
-            "data": _serialize_actree(build_actree([(filter_text, raw_text)])),
-        }
-        redis_client.hset(list_no, mapping=r)
-    bump_list_detail_version(redis_client, list_no)
+    append_list_delta(redis_client, name_list.no, ops, ctx.config.get("LIST_DELTA_COMPACT_SIZE", 500))
+
+
+def _add_redis_data(ctx, name_list, raw_text):
+    _add_batch_redis_data(ctx, name_list, [raw_text])
 
 
 def _add_batch_redis_data(ctx, name_list, text_list):
     redis_client = ctx.redis
     list_no = name_list.no
-    match_type = ListMatchTypeEnum(name_list._match_type)
-    if match_type == ListMatchTypeEnum.SEMANTIC:
-        language = name_list.language
-        filter_text_list = [(tokenizer.tokenize(i, drop_prun=True, language=language), i) for i in text_list]
-    else:
-        filter_text_list = [(i, i) for i in text_list]
-
-    if redis_client.exists(list_no):
-        if redis_client.hexists(list_no, "data"):
-            data = redis_client.hget(list_no, "data")
-            ac_data = _load_actree(data)
-            for i in filter_text_list:
-                ac_data.add_word(i[0], (i[0], i[1]))
-            ac_data.make_automaton()
-            redis_client.hset(list_no, "data", _serialize_actree(ac_data))
-        else:
-            ac_data = build_actree(filter_text_list)
-            redis_client.hset(list_no, "data", _serialize_actree(ac_data))
-    else:
-        ac_data = build_actree(filter_text_list)
-        r = {
-            "name": name_list.name,
-            "type": name_list._type,
-            "match_rule": name_list._match_rule,
-            "match_type": name_list._match_type,
-            "suggest": name_list._suggest,
-            "risk_type": name_list._risk_type,
-            "status": int(name_list._status),
-            "language": name_list.language,
-            "data": _serialize_actree(ac_data),
-        }
-        redis_client.hset(list_no, mapping=r)
-    bump_list_detail_version(redis_client, list_no)
+    if not redis_client.exists(list_no):
+        redis_client.hset(list_no, mapping=_new_list_mapping(name_list))
+        # 名单 hash 不存在时残留的增量日志已无效
+        reset_list_words(redis_client, list_no)
+    _append_words(ctx, name_list, [add_op(_filter_text(name_list, text), text) for text in text_list])
 
 
 def _remove_redis_word(ctx, name_list, text):
-    redis_client = ctx.redis
-    list_no = name_list.no
-    if not redis_client.exists(list_no):
-        return
-    data = redis_client.hget(list_no, "data")
-    if not data:
-        return
-    ac_data = _load_actree(data)
-    match_type = ListMatchTypeEnum(name_list._match_type)
-    if match_type == ListMatchTypeEnum.SEMANTIC:
-        filter_text = tokenizer.tokenize(text, drop_prun=True, language=name_list.language)
-    else:
-        filter_text = text
-    try:
-        ac_data.remove_word(filter_text)
-        ac_data.make_automaton()
-        redis_client.hset(list_no, "data", _serialize_actree(ac_data))
-        bump_list_detail_version(redis_client, list_no)
-    except Exception:
+    _remove_redis_words(ctx, name_list, [text])
+
+
+def _remove_redis_words(ctx, name_list, text_list):
+    if not ctx.redis.exists(name_list.no):
         return
+    filter_words = dict.fromkeys(_filter_text(name_list, text) for text in text_list)
+    _append_words(ctx, name_list, [remove_op(word) for word in filter_words])
 
 
 def _update_redis_word(ctx, name_list, old_text, new_text):
-    redis_client = ctx.redis
-    list_no = name_list.no
-    if not redis_client.exists(list_no):
-        return
-    data = redis_client.hget(list_no, "data")
-    if not data:
+    if not ctx.redis.exists(name_list.no):
         return
-    ac_data = _load_actree(data)
-    match_type = ListMatchTypeEnum(name_list._match_type)
-    if match_type == ListMatchTypeEnum.SEMANTIC:
-        old_filter_text = tokenizer.tokenize(old_text, drop_prun=True, language=name_list.language)
-        new_filter_text = tokenizer.tokenize(new_text, drop_prun=True, language=name_list.language)
-    else:
-        old_filter_text = old_text
-        new_filter_text = new_text
-    ac_data.remove_word(old_filter_text)
-    ac_data.add_word(new_filter_text, (new_filter_text, new_text))
-    ac_data.make_automaton()
-    redis_client.hset(list_no, "data", _serialize_actree(ac_data))
-    bump_list_detail_version(redis_client, list_no)
+    _append_words(
+        ctx,
+        name_list,
+        [remove_op(_filter_text(name_list, old_text)), add_op(_filter_text(name_list, new_text), new_text)],
+    )
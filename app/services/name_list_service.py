@@ -1,5 +1,4 @@
 import json
-import time
 import uuid
 
 from sqlalchemy.orm import Session
@@ -9,8 +8,8 @@ from app.models.list_detail import ListDetail
 from app.models.list_app_channel import ListAppChannel
 from app.models.name_list_language import NameListLanguage
 from app.models.name_list import NameList
-from app.utils.enums import ListLanguageScopeEnum, ListScopeEnum, ListStatusEnum
-from app.services.cache import bump_list_detail_version
+from app.utils.enums import ListLanguageScopeEnum, ListMatchEngineEnum, ListScopeEnum, ListStatusEnum
+from app.services.cache import bump_list_detail_version, mark_app_channel_updated, reset_list_words
 
 
 def get_name_list(db: Session, lid: str):
@@ -72,6 +71,7 @@ def create_name_list(db: Session, ctx, form, app_ids, channel_ids):
         language=tokenize_language,
         scope=scope_value,
         language_scope=language_scope,
+        match_engine=form.match_engine.data or ListMatchEngineEnum.SUBSTRING.value,
         create_by=form.username.data,
         update_by=form.username.data,
     )
@@ -104,6 +104,8 @@ def update_name_list(db: Session, ctx, lid, form, app_ids, channel_ids):
     name_list.language = tokenize_language
     name_list.scope = scope_value
     name_list.language_scope = language_scope
+    if form.match_engine.data:
+        name_list.match_engine = form.match_engine.data
     name_list.update_by = form.username.data
     db.add(name_list)
 
@@ -336,7 +338,7 @@ def _update_app_channel_redis(
         if name_list.no in app_channel_data:
             app_channel_data.remove(name_list.no)
     redis_client.hset(key, list_type, json.dumps(list(set(app_channel_data))))
-    redis_client.zadd("waiting_update_app_channel_list", {f"{key}|{list_type}": int(time.time())})
+    mark_app_channel_updated(redis_client, key, list_type)
 
 
 def _add_detail_redis(ctx, name_list, language_scope=None, language_codes=None):
@@ -354,6 +356,7 @@ def _add_detail_redis(ctx, name_list, language_scope=None, language_codes=None):
         "language": name_list.language,
         "language_scope": scope_value,
         "language_codes": json.dumps(codes),
+        "match_engine": name_list.match_engine or ListMatchEngineEnum.SUBSTRING.value,
     }
     redis_client.hset(name_list.no, mapping=r)
     bump_list_detail_version(redis_client, name_list.no)
@@ -375,6 +378,7 @@ def _update_detail_redis(ctx, name_list, update_data=False, language_scope=None,
             "language": name_list.language,
             "language_scope": scope_value,
             "language_codes": json.dumps(codes),
+            "match_engine": name_list.match_engine or ListMatchEngineEnum.SUBSTRING.value,
         }
         redis_client.hset(name_list.no, mapping=r)
         if update_data:
@@ -410,6 +414,4 @@ def _remove_list_detail(db: Session, ctx, name_list):
     for detail in details:
         detail.soft_delete()
         db.add(detail)
-    redis_client = ctx.redis
-    redis_client.hdel(name_list.no, "data")
-    bump_list_detail_version(redis_client, name_list.no)
+    reset_list_words(ctx.redis, name_list.no)
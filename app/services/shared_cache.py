@@ -0,0 +1,295 @@
+"""多 worker 共享的名单缓存。
+
+开启 ``SHARED_CACHE_DIR`` 后，由抢到文件锁的 loader 进程把所有名单的元数据和词表写入一个内存映射文件，
+其它 worker 只读挂载：词表字符串只在页缓存中保留一份，worker 内只构建值为整数下标的自动机（STORE_INTS），
+命中后再回到映射文件取词。文件按 generation 整体替换，worker 发现新 generation 时原子切换 CACHE_DATA，
+词表未变化的名单直接复用已有自动机。
+
+文件格式::
+
+    header  = magic(4s) version(B) generation(Q) index_len(I)
+    index   = json {"list_detail_version": int, "lists": {list_no: {meta, offset, size, length, checksum}}}
+    regions = 每个名单一段（8 字节对齐）：offsets(uint32 * (2n+1)) + utf-8 词表
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, Iterable, Optional, Tuple
+
+import ahocorasick
+
+from app.utils.actree_snapshot import load_words
+from app.utils.identifier_matcher import build_identifier_matcher, use_exact_match
+from app.utils.list_meta import attach_list_meta
+
+_FILE_MAGIC = b"YYSM"
+_FILE_VERSION = 1
+_FILE_HEADER = struct.Struct(">4sBQI")
+_CURRENT = "CURRENT"
+_LOCK = "loader.lock"
+_KEEP_GENERATIONS = 3
+_OPEN_RETRIES = 3
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def encode_region(words: Iterable[Tuple[str, str]]) -> Tuple[bytes, int]:
+    offsets = [0]
+    chunks = []
+    pos = 0
+    size = 0
+    for filter_word, raw_word in dict(words).items():
+        for w in (filter_word, raw_word):
+            b = w.encode("utf-8")
+            chunks.append(b)
+            pos += len(b)
+            offsets.append(pos)
+        size += 1
+    head = struct.pack(f"={len(offsets)}I", *offsets)
+    return head + b"".join(chunks), size
+
+
+class MappedWordTable(object):
+    __slots__ = ("_buf", "_offsets", "_base", "size")
+
+    def __init__(self, buf, offset: int, size: int):
+        head_len = 4 * (2 * size + 1)
+        self._buf = buf
+        self._offsets = buf[offset:offset + head_len].cast("I")
+        self._base = offset + head_len
+        self.size = size
+
+    def filter_word(self, i: int) -> str:
+        o = self._offsets
+        return str(self._buf[self._base + o[2 * i]:self._base + o[2 * i + 1]], "utf-8")
+
+    def word(self, i: int) -> Tuple[str, str]:
+        o = self._offsets
+        b = self._base
+        return (
+            str(self._buf[b + o[2 * i]:b + o[2 * i + 1]], "utf-8"),
+            str(self._buf[b + o[2 * i + 1]:b + o[2 * i + 2]], "utf-8"),
+        )
+
+
+class MappedMatcher(object):
+    """与 ahocorasick.Automaton 的 iter/items 接口一致，payload 从映射文件中按需读取。"""
+
+    __slots__ = ("automaton", "table")
+
+    def __init__(self, table: MappedWordTable, automaton=None):
+        self.table = table
+        if automaton is None:
+            automaton = ahocorasick.Automaton(ahocorasick.STORE_INTS)
+            for i in range(table.size):
+                automaton.add_word(table.filter_word(i), i)
+            automaton.make_automaton()
+        self.automaton = automaton
+
+    def __len__(self):
+        return self.table.size
+
+    def iter(self, text):
+        word = self.table.word
+        for end, i in self.automaton.iter(text):
+            yield end, word(i)
+
+    def items(self):
+        for i in range(self.table.size):
+            filter_word, raw_word = self.table.word(i)
+            yield filter_word, (filter_word, raw_word)
+
+
+class SharedCacheStore(object):
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.generation = 0
+        self.list_detail_version = 0
+        self._lock_fd = None
+        self._buf = None
+        self._index = {}
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_fd is not None
+
+    def try_become_leader(self) -> bool:
+        if self._lock_fd is not None:
+            return True
+        fd = os.open(os.path.join(self.directory, _LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def release(self):
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def list_nos(self):
+        return list(self._index.keys())
+
+    def current(self) -> Tuple[int, str]:
+        try:
+            with open(os.path.join(self.directory, _CURRENT), "r", encoding="utf-8") as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return 0, ""
+        if not name:
+            return 0, ""
+        return int(name.split("-", 1)[1].split(".", 1)[0]), name
+
+    def wait_for_generation(self, timeout: float) -> bool:
+        deadline = time.time() + timeout
+        while True:
+            if self.current()[0]:
+                return True
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.1)
+
+    def publish(self, raw_lists: Dict[str, Dict], list_detail_version: int, reuse: Iterable[str] = ()) -> int:
+        """写入新的 generation。raw_lists 为 Redis 中名单 hash 的原始内容；reuse 中的名单从当前映射复制。"""
+        entries = {}
+        regions = []
+        pos = 0
+        for list_no in reuse:
+            old = self._index.get(list_no)
+            if old is None or list_no in raw_lists:
+                continue
+            region = bytes(self._buf[old["offset"]:old["offset"] + old["length"]])
+            entries[list_no] = dict(old, offset=pos)
+            regions.append(region + b"\0" * (_align(len(region)) - len(region)))
+            pos += _align(len(region))
+        for list_no, v in raw_lists.items():
+            meta = {k: ve for k, ve in v.items() if k not in ("data", "deltas")}
+            raw = v.get("data") or ""
+            region, size = encode_region(load_words(raw, v.get("deltas")))
+            entries[list_no] = {
+                "meta": meta,
+                "offset": pos,
+                "size": size,
+                "length": len(region),
+                "checksum": zlib.crc32(region),
+            }
+            regions.append(region + b"\0" * (_align(len(region)) - len(region)))
+            pos += _align(len(region))
+
+        generation = max(self.current()[0], self.generation) + 1
+        index = json.dumps(
+            {"list_detail_version": list_detail_version, "lists": entries}, ensure_ascii=False
+        ).encode("utf-8")
+        header = _FILE_HEADER.pack(_FILE_MAGIC, _FILE_VERSION, generation, len(index))
+        head = header + index
+        head += b"\0" * (_align(len(head)) - len(head))
+
+        name = f"lists-{generation}.bin"
+        tmp = os.path.join(self.directory, f".{name}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(head)
+            for region in regions:
+                f.write(region)
+        os.replace(tmp, os.path.join(self.directory, name))
+        tmp = os.path.join(self.directory, f".{_CURRENT}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(tmp, os.path.join(self.directory, _CURRENT))
+        self._cleanup(generation)
+        return generation
+
+    def _cleanup(self, generation: int):
+        # 已挂载旧文件的 worker 不受 unlink 影响
+        for name in os.listdir(self.directory):
+            if not name.startswith("lists-") or not name.endswith(".bin"):
+                continue
+            try:
+                if int(name[6:-4]) <= generation - _KEEP_GENERATIONS:
+                    os.unlink(os.path.join(self.directory, name))
+            except (ValueError, OSError):
+                continue
+
+    def _open_current(self) -> Optional[Tuple[str, mmap.mmap]]:
+        # leader 的 _cleanup 可能在读取 CURRENT 与 open 之间删除文件，此时 CURRENT 已指向更新的 generation，重新读取
+        for _ in range(_OPEN_RETRIES):
+            generation, name = self.current()
+            if not generation or generation == self.generation:
+                return None
+            try:
+                with open(os.path.join(self.directory, name), "rb") as f:
+                    return name, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(f"shared cache file keeps disappearing: {name}")
+
+    def attach(self, previous: Optional[Dict] = None) -> Optional[Dict]:
+        """挂载最新 generation，返回新的 CACHE_DATA；没有新 generation 时返回 None。
+
+        词表与元数据都未变化的名单沿用 previous 中的对象，下游按对象复用的索引（如 get_scope_index）不会因切换
+        generation 而重建；其词表原地改为指向新映射中内容相同的区域，旧 generation 的映射不会因此一直保留。
+        """
+        opened = self._open_current()
+        if opened is None:
+            return None
+        name, mm = opened
+        buf = memoryview(mm)
+        magic, version, file_generation, index_len = _FILE_HEADER.unpack_from(buf)
+        if magic != _FILE_MAGIC or version != _FILE_VERSION:
+            buf.release()
+            mm.close()
+            raise ValueError(f"bad shared cache file: {name}")
+        head_len = _align(_FILE_HEADER.size + index_len)
+        index = json.loads(str(buf[_FILE_HEADER.size:_FILE_HEADER.size + index_len], "utf-8"))
+
+        previous = previous or {}
+        old_index = self._index
+        cache_data = {}
+        lists = {}
+        for list_no, entry in index["lists"].items():
+            entry = dict(entry, offset=entry["offset"] + head_len)
+            lists[list_no] = entry
+            old_entry = old_index.get(list_no)
+            old = previous.get(list_no)
+            if (
+                old is not None
+                and old_entry is not None
+                and old_entry["checksum"] == entry["checksum"]
+                and old_entry["size"] == entry["size"]
+                and old_entry["meta"] == entry["meta"]
+            ):
+                # 区域内容逐字节相同，STORE_INTS 自动机中的下标仍然有效，只需换到新映射
+                if isinstance(old.get("data"), MappedMatcher):
+                    old["data"].table = MappedWordTable(buf, entry["offset"], entry["size"])
+                cache_data[list_no] = old
+                continue
+            v = dict(entry["meta"])
+            if not entry["size"]:
+                v["data"] = ""
+                cache_data[list_no] = attach_list_meta(v)
+                continue
+            table = MappedWordTable(buf, entry["offset"], entry["size"])
+            if use_exact_match(v.get("match_rule"), v.get("match_engine")):
+                # 标识类名单的词条较短，直接在 worker 内建精确匹配表
+                v["data"] = build_identifier_matcher([table.word(i) for i in range(table.size)], v.get("match_rule"))
+            else:
+                v["data"] = MappedMatcher(table)
+            cache_data[list_no] = attach_list_meta(v)
+
+        self._buf = buf
+        self._index = lists
+        self.generation = file_generation
+        self.list_detail_version = int(index.get("list_detail_version", 0))
+        return cache_data
@@ -1,11 +1,10 @@
-import time
-
 from sqlalchemy.orm import Session
 
 from app.core.exceptions import NotFound, ParameterException
 from app.models.ac_switch import ACSwitch
 from app.models.ai_switch import AISwitch
 from app.models.model_threshold import ModelThreshold
+from app.services.cache import mark_app_channel_updated
 from app.utils.enums import SwichEnum
 
 
@@ -37,7 +36,7 @@ def create_ai_switch(db: Session, ctx, form):
     db.commit()
     k = f"AC_{form.app_id.data}_all"
     ctx.redis.hset(k, "ai_switch", SwichEnum[form.switch.data].value)
-    ctx.redis.zadd("waiting_update_app_channel_list", {f"{k}|ai_switch": int(time.time())})
+    mark_app_channel_updated(ctx.redis, k, "ai_switch")
     return True
 
 
@@ -48,7 +47,7 @@ def update_ai_switch(db: Session, ctx, item_id: int, form):
     db.commit()
     k = f"AC_{item.app_id}_all"
     ctx.redis.hset(k, "ai_switch", SwichEnum[form.switch.data].value)
-    ctx.redis.zadd("waiting_update_app_channel_list", {f"{k}|ai_switch": int(time.time())})
+    mark_app_channel_updated(ctx.redis, k, "ai_switch")
     return True
 
 
@@ -59,7 +58,7 @@ def delete_ai_switch(db: Session, ctx, item_id: int):
     db.commit()
     k = f"AC_{item.app_id}_all"
     ctx.redis.hdel(k, "ai_switch")
-    ctx.redis.zadd("waiting_update_app_channel_list", {f"{k}|ai_switch": int(time.time())})
+    mark_app_channel_updated(ctx.redis, k, "ai_switch")
     return True
 
 
@@ -92,7 +91,7 @@ def create_ac_switch(db: Session, ctx, form):
     db.commit()
     k = f"AC_{form.app_id.data}_{form.channel.data}"
     ctx.redis.hset(k, "ac_switch", SwichEnum[form.switch.data].value)
-    ctx.redis.zadd("waiting_update_app_channel_list", {f"{k}|ac_switch": int(time.time())})
+    mark_app_channel_updated(ctx.redis, k, "ac_switch")
     return True
 
 
@@ -103,7 +102,7 @@ def update_ac_switch(db: Session, ctx, item_id: int, form):
     db.commit()
     k = f"AC_{item.app_id}_{item.channel}"
     ctx.redis.hset(k, "ac_switch", SwichEnum[form.switch.data].value)
-    ctx.redis.zadd("waiting_update_app_channel_list", {f"{k}|ac_switch": int(time.time())})
+    mark_app_channel_updated(ctx.redis, k, "ac_switch")
     return True
 
 
@@ -114,7 +113,7 @@ def delete_ac_switch(db: Session, ctx, item_id: int):
     db.commit()
     k = f"AC_{item.app_id}_{item.channel}"
     ctx.redis.hdel(k, "ac_switch")
-    ctx.redis.zadd("waiting_update_app_channel_list", {f"{k}|ac_switch": int(time.time())})
+    mark_app_channel_updated(ctx.redis, k, "ac_switch")
     return True
 
 
@@ -148,7 +147,7 @@ def create_threshold(db: Session, ctx, form):
     db.commit()
     k = f"AC_{form.app_id.data}_all"
     ctx.redis.hset(k, "model_threshold", form.threshold.data)
-    ctx.redis.zadd("waiting_update_app_channel_list", {f"{k}|model_threshold": int(time.time())})
+    mark_app_channel_updated(ctx.redis, k, "model_threshold")
     return True
 
 
@@ -159,7 +158,7 @@ def update_threshold(db: Session, ctx, item_id: int, form):
     db.commit()
     k = f"AC_{item.app_id}_all"
     ctx.redis.hset(k, "model_threshold", form.threshold.data)
-    ctx.redis.zadd("waiting_update_app_channel_list", {f"{k}|model_threshold": int(time.time())})
+    mark_app_channel_updated(ctx.redis, k, "model_threshold")
     return True
 
 
@@ -170,5 +169,5 @@ def delete_threshold(db: Session, ctx, item_id: int):
     db.commit()
     k = f"AC_{item.app_id}_all"
     ctx.redis.hdel(k, "model_threshold")
-    ctx.redis.zadd("waiting_update_app_channel_list", {f"{k}|model_threshold": int(time.time())})
+    mark_app_channel_updated(ctx.redis, k, "model_threshold")
     return True
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import time
 import uuid
 from datetime import datetime
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-from app.core.exceptions import ParameterException
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.exceptions import APIException, ParameterException, ServerError
+from app.core.metrics import record_stage, stage_timer
 from app.models.chat_msg import ChatMsg
+from app.utils.chat_history import ChatHistoryCache, parse_private_history, recent_history
 from app.utils.enums import ListRiskTypeEnum
 from app.utils.language_classification import LanguageClassification
-from app.utils.match_data_utils import all_filter
+from app.utils.match_data_utils import ai_filter_async, all_filter, resolve_scope
 
-from .validators import TEXT_REQUIRED_FIELDS, ensure_required_fields
+from .validators import TEXT_REQUIRED_FIELDS, ensure_required_fields, parse_json_string, validate_access_key
 
 
 def build_base_response(ctx) -> Dict[str, Any]:
@@ -51,7 +56,7 @@ def build_pass_detail(chat_msg: ChatMsg) -> Dict[str, Any]:
     }
 
 
-def process_msg_data(raw_data: Dict[str, Any], ctx) -> Dict[str, Any]:
+def _normalize_msg_data(raw_data: Dict[str, Any]) -> Dict[str, Any]:
     if str(raw_data.get("app_id")) == "94" and "channel" not in raw_data:
         raw_data["channel"] = ""
     raw_data.setdefault("relationship", "")
@@ -65,85 +70,271 @@ def process_msg_data(raw_data: Dict[str, Any], ctx) -> Dict[str, Any]:
         raw_data["token_id"] = str(raw_data.get("account_id"))
 
     raw_data["channel"] = f"{raw_data.get('app_id')}_{raw_data.get('channel', '')}"
-    raw_data = get_history_chat(raw_data, ctx)
     return raw_data
 
 
-def get_history_chat(raw_data: Dict[str, Any], ctx) -> Dict[str, Any]:
-    if (
+async def process_msg_data(raw_data: Dict[str, Any], ctx, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    raw_data = _normalize_msg_data(raw_data)
+    with stage_timer(timings, "history"):
+        raw_data = await get_history_chat_async(raw_data, ctx)
+    return raw_data
+
+
+def _need_history(raw_data: Dict[str, Any]) -> bool:
+    return not (
         str(raw_data.get("app_id")) not in ["2013101", "2013001"]
         or "NICKNAME_CHECK" in str(raw_data.get("channel"))
         or raw_data.get("text") == ""
-    ):
+    )
+
+
+def _history_key(raw_data: Dict[str, Any]) -> str:
+    return f"roleChatContent:{raw_data.get('app_id')}:{raw_data.get('account_id')}:{raw_data.get('role_id')}"
+
+
+def _history_cache(ctx) -> ChatHistoryCache:
+    cache = ctx.config.get("CHAT_HISTORY_CACHE")
+    if cache is None:
+        cache = ctx.config["CHAT_HISTORY_CACHE"] = ChatHistoryCache(
+            ctx.config.get("CHAT_HISTORY_CACHE_SIZE", 10000), ctx.config.get("CHAT_HISTORY_CACHE_TTL", 2.0)
+        )
+    return cache
+
+
+def _apply_history(raw_data: Dict[str, Any], entry) -> None:
+    one_hour_ago = int(datetime.now().timestamp()) - 3600
+    chat_history = recent_history(entry, one_hour_ago)
+    if chat_history is not None:
+        raw_data["chat_history"] = chat_history
+
+
+def get_history_chat(raw_data: Dict[str, Any], ctx) -> Dict[str, Any]:
+    if not _need_history(raw_data):
         return raw_data
     redis_client = ctx.config.get("CHAT_LOG_REDIS_CLIENT")
     if not redis_client:
         return raw_data
     try:
-        key = f"roleChatContent:{raw_data.get('app_id')}:{raw_data.get('account_id')}:{raw_data.get('role_id')}"
-        res = redis_client.get(key)
-        if res:
-            data = json.loads(res)
-            chat_content = data.get("chat_content", {}).get("PRIVATE") or data.get("chat_content", {}).get("私聊频道")
-            role_level = data.get("role_level", 0)
-            if chat_content and role_level <= 40:
-                current_timestamp = int(datetime.now().timestamp())
-                one_hour_ago = current_timestamp - 3600
-                filtered = [item for item in chat_content if item["timeline"] >= one_hour_ago]
-                filtered = sorted(filtered, key=lambda x: x["timeline"])
-                raw_data["chat_history"] = [item["chat_content"] for item in filtered]
+        cache = _history_cache(ctx)
+        key = _history_key(raw_data)
+        entry = cache.get(key)
+        if entry is None:
+            start = time.perf_counter()
+            entry = parse_private_history(redis_client.get(key))
+            record_stage(ctx, "history_fetch", time.perf_counter() - start)
+            cache.put(key, entry)
+        _apply_history(raw_data, entry)
     except Exception as err:
         ctx.logger.debug(f"获取上下文出错: {err}")
     return raw_data
 
 
-def handle_text_filter(raw_data: Dict[str, Any], ctx) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-    start_time = time.time()
-    r = build_base_response(ctx)
+async def get_history_chat_async(raw_data: Dict[str, Any], ctx) -> Dict[str, Any]:
+    """近期私聊记录：先查本地短 TTL 缓存，未命中时合并读取 Redis，超过 CHAT_HISTORY_TIMEOUT 秒则不带上下文继续检测。"""
+    if not _need_history(raw_data):
+        return raw_data
+    redis_client = ctx.config.get("CHAT_LOG_ASYNC_REDIS_CLIENT")
+    if not redis_client:
+        return get_history_chat(raw_data, ctx)
+    cache = _history_cache(ctx)
+    key = _history_key(raw_data)
+    try:
+        entry = cache.get(key)
+        if entry is None:
+            start = time.perf_counter()
+            raw = await asyncio.wait_for(cache.fetch(redis_client, key), ctx.config.get("CHAT_HISTORY_TIMEOUT", 0.05))
+            entry = parse_private_history(raw)
+            record_stage(ctx, "history_fetch", time.perf_counter() - start)
+            cache.put(key, entry)
+        _apply_history(raw_data, entry)
+    except asyncio.TimeoutError:
+        cache.timeouts += 1
+        ctx.logger.debug(f"获取上下文超时: {key}")
+    except Exception as err:
+        ctx.logger.debug(f"获取上下文出错: {err}")
+    return raw_data
 
-    raw_data.setdefault("token_id", None)
-    if raw_data.get("app_id") and raw_data.get("token_id") is None:
-        raw_data["token_id"] = f"{raw_data.get('app_id')}_{raw_data.get('server_id')}_{raw_data.get('role_id')}"
 
-    ensure_required_fields(raw_data, TEXT_REQUIRED_FIELDS)
-    data_params = process_msg_data(raw_data, ctx)
+async def _prepare_text_msg(raw_data: Dict[str, Any], ctx) -> Tuple[ChatMsg, Dict[str, Any]]:
+    timings: Dict[str, float] = {}
+    with stage_timer(timings, "validate"):
+        raw_data.setdefault("token_id", None)
+        if raw_data.get("app_id") and raw_data.get("token_id") is None:
+            raw_data["token_id"] = f"{raw_data.get('app_id')}_{raw_data.get('server_id')}_{raw_data.get('role_id')}"
+        ensure_required_fields(raw_data, TEXT_REQUIRED_FIELDS)
+
+    with stage_timer(timings, "process_msg_data"):
+        data_params = await process_msg_data(raw_data, ctx, timings)
 
     chat_msg = ChatMsg()
     chat_msg.set_attrs(data_params)
+    chat_msg.stage_timings.update(timings)
 
     # app_id 校验
-    all_apps = ctx.config.get("ALL_APPS", [])
-    if str(chat_msg.app_id) not in all_apps or chat_msg.app_id == "all":
-        raise ParameterException(msg="app_id 不存在")
+    with stage_timer(chat_msg.stage_timings, "validate"):
+        all_apps = ctx.config.get("ALL_APPS", [])
+        if str(chat_msg.app_id) not in all_apps or chat_msg.app_id == "all":
+            raise ParameterException(msg="app_id 不存在")
+    return chat_msg, data_params
 
-    # 语种识别
-    if ctx.config.get("LANGUAGE_SWITCH"):
-        language_pred = LanguageClassification.predict(chat_msg, ctx)
-        if language_pred:
-            language_pred = language_pred.get("language", language_pred)
-            r["extra"]["language"]["predict"] = language_pred
-        else:
-            language_pred = {"nickname": "zh", "text": "zh"}
-            r["extra"]["language"]["msg"] = "language predict api timeout!"
-    else:
-        language_pred = {"nickname": "zh", "text": "zh"}
+
+def _apply_language_pred(r: Dict[str, Any], ctx, language_pred) -> Dict[str, Any]:
+    if not ctx.config.get("LANGUAGE_SWITCH"):
         r["extra"]["language"]["msg"] = "language switch is OFF"
+        return {"nickname": "zh", "text": "zh"}
+    if language_pred:
+        language_pred = language_pred.get("language", language_pred)
+        r["extra"]["language"]["predict"] = language_pred
+        return language_pred
+    r["extra"]["language"]["msg"] = "language predict api timeout!"
+    return {"nickname": "zh", "text": "zh"}
 
-    # 自研匹配算法过滤
-    ml_res = all_filter(chat_msg, r, ctx, language_pred)
+
+async def _finish_ai_filter(chat_msg: ChatMsg, ml_res: Dict[str, Any], ctx) -> Dict[str, Any]:
+    if chat_msg.ai_pending is not None:
+        try:
+            _, ml_res = await ai_filter_async(ctx, chat_msg, chat_msg.ai_pending, ml_res)
+        except Exception as err:
+            ctx.logger.debug(f"自定义规则过滤出错: {err}")
     ctx.logger.debug(f"自研匹配算法过滤: {ml_res}")
+    return ml_res
 
+
+def _record_timings(chat_msg: ChatMsg, response: Dict[str, Any], start_time: float, ctx) -> None:
+    timings = chat_msg.stage_timings
+    timings["total"] = (time.time() - start_time) * 1000
+    response["extra"]["response_time"]["total"] = int(timings["total"])
+    metrics = ctx.config.get("STAGE_METRICS")
+    if metrics is not None:
+        metrics.observe_timings(timings)
+    if ctx.config.get("RESPONSE_STAGE_TIMINGS"):
+        for stage, ms in timings.items():
+            if stage != "total":
+                response["extra"]["response_time"][stage] = round(ms, 3)
+
+
+def _finalize_response(chat_msg: ChatMsg, r: Dict[str, Any], ml_res: Dict[str, Any], start_time: float, ctx) -> Dict[str, Any]:
     if ml_res.get("riskLevel"):
         detail = ml_res.get("detail", {})
         ml_res["detail"] = json.dumps(detail, ensure_ascii=False)
         if not ml_res.get("requestId"):
             ml_res["requestId"] = chat_msg.request_id
-        ml_res["extra"]["response_time"]["total"] = int((time.time() - start_time) * 1000)
-        return ml_res, data_params
+        _record_timings(chat_msg, ml_res, start_time, ctx)
+        return ml_res
 
     # 默认 PASS
     r["riskLevel"] = "PASS"
     r["detail"] = json.dumps(build_pass_detail(chat_msg), ensure_ascii=False)
     r["requestId"] = chat_msg.request_id
-    r["extra"]["response_time"]["total"] = int((time.time() - start_time) * 1000)
-    return r, data_params
+    _record_timings(chat_msg, r, start_time, ctx)
+    return r
+
+
+async def handle_text_filter(raw_data: Dict[str, Any], ctx) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """文本检测主流程：网络调用（上下文、语种识别、广告模型、LLM）在事件循环上异步等待，名单匹配放到线程池执行。"""
+    start_time = time.time()
+    r = build_base_response(ctx)
+    chat_msg, data_params = await _prepare_text_msg(raw_data, ctx)
+
+    # 语种识别
+    language_pred = None
+    if ctx.config.get("LANGUAGE_SWITCH"):
+        with stage_timer(chat_msg.stage_timings, "language"):
+            language_pred = await LanguageClassification.predict_async(chat_msg, ctx)
+    language_pred = _apply_language_pred(r, ctx, language_pred)
+
+    # 自研匹配算法过滤
+    chat_msg.defer_ai()
+    ml_res = await run_in_threadpool(all_filter, chat_msg, r, ctx, language_pred)
+    ml_res = await _finish_ai_filter(chat_msg, ml_res, ctx)
+    return _finalize_response(chat_msg, r, ml_res, start_time, ctx), data_params
+
+
+def _error_item(err: Exception) -> Dict[str, Any]:
+    if isinstance(err, APIException):
+        return {"message": err.message, "code": err.error_code, "requestId": err.request_id}
+    return {"message": ServerError.message, "code": ServerError.error_code, "requestId": str(uuid.uuid4())}
+
+
+def _match_batch(msgs, responses, language_preds, ctx):
+    """在一次线程池调用内完成整批名单匹配，同一 (app_id, channel) 的作用域只解析一次。"""
+    scopes = {}
+    results = []
+    for chat_msg, r, language_pred in zip(msgs, responses, language_preds):
+        key = (str(chat_msg.app_id), chat_msg.channel)
+        if key not in scopes:
+            try:
+                scopes[key] = resolve_scope(ctx, chat_msg)
+            except Exception as err:
+                # 与单条接口一致：作用域配置异常时记录日志，按未命中处理，不影响同批其它消息
+                ctx.logger.debug(f"自定义规则过滤出错: {err}")
+                scopes[key] = None
+        if scopes[key] is None:
+            results.append(r)
+            continue
+        results.append(all_filter(chat_msg, r, ctx, language_pred, scope=scopes[key]))
+    return results
+
+
+async def handle_text_batch(items: List[Any], access_key: str, ctx) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """批量文本检测：返回与 items 一一对应的 (响应, 日志参数)，单条失败时响应为错误信息、日志参数为 None。
+
+    access_key 按 app_id 只校验一次，语种识别批量调用，名单匹配按 app/channel 复用作用域并在一次线程池调用内完成。
+    """
+    start_time = time.time()
+    results: List[Any] = [None] * len(items)
+    checked_keys: Dict[str, Any] = {}
+
+    async def prepare(index, raw_data):
+        try:
+            if raw_data is None:
+                raise ParameterException(msg="参数不合法(data is empty)")
+            if isinstance(raw_data, str):
+                raw_data = parse_json_string(raw_data)
+            if not isinstance(raw_data, dict):
+                raise ParameterException(msg="参数不合法(data is empty)")
+            app_id = str(raw_data.get("app_id"))
+            if app_id not in checked_keys:
+                try:
+                    validate_access_key(access_key, app_id, ctx)
+                    checked_keys[app_id] = None
+                except ParameterException as err:
+                    checked_keys[app_id] = err
+            if checked_keys[app_id] is not None:
+                raise checked_keys[app_id]
+            return index, await _prepare_text_msg(raw_data, ctx)
+        except Exception as err:
+            if not isinstance(err, APIException):
+                ctx.logger.error(f"批量文本检测预处理出错: {err}")
+            results[index] = (_error_item(err), None)
+            return None
+
+    prepared = [i for i in await asyncio.gather(*(prepare(i, item) for i, item in enumerate(items))) if i]
+    if not prepared:
+        return results
+
+    msgs = [chat_msg for _, (chat_msg, _) in prepared]
+    responses = [build_base_response(ctx) for _ in prepared]
+
+    # 语种识别：整批一次调用，每条消息记录整批的等待时间
+    if ctx.config.get("LANGUAGE_SWITCH"):
+        language_start = time.perf_counter()
+        predictions = await LanguageClassification.predict_batch_async(msgs, ctx)
+        language_ms = (time.perf_counter() - language_start) * 1000
+        for chat_msg in msgs:
+            chat_msg.stage_timings["language"] = language_ms
+    else:
+        predictions = [None] * len(msgs)
+    language_preds = [_apply_language_pred(r, ctx, pred) for r, pred in zip(responses, predictions)]
+
+    # 自研匹配算法过滤
+    for chat_msg in msgs:
+        chat_msg.defer_ai()
+    ml_results = await run_in_threadpool(_match_batch, msgs, responses, language_preds, ctx)
+    ml_results = await asyncio.gather(
+        *(_finish_ai_filter(chat_msg, ml_res, ctx) for chat_msg, ml_res in zip(msgs, ml_results))
+    )
+
+    for (index, (chat_msg, data_params)), r, ml_res in zip(prepared, responses, ml_results):
+        results[index] = (_finalize_response(chat_msg, r, ml_res, start_time, ctx), data_params)
+    return results
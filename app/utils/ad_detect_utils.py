@@ -28,6 +28,33 @@ def ad_detect(msg, ctx):
         return res
 
 
+async def ad_detect_async(msg, ctx):
+    t1 = time.time()
+    if msg.text == "" or "NICKNAME_CHECK" in msg.channel:
+        ctx.logger.debug(f"ad detect api costs: {(time.time() - t1) * 1000} ms")
+        return False
+    url = ctx.config.get("AD_DETECT_URL", "")
+    if not url:
+        return False
+    headers = {"Content-Type": "application/json"}
+    params = {
+        "nickname": msg.nickname,
+        "text": msg.text,
+        "score_threshold": get_threshold(ctx, msg.app_id),
+    }
+    res = False
+    try:
+        client = ctx.config.get("HTTP_CLIENT")
+        response = (await client.post(url=url, headers=headers, json=params, timeout=0.8)).json()
+        if response.get("code") == 0:
+            res = response
+    except Exception as err:
+        ctx.logger.debug(f"ad detect api err: {err}")
+    finally:
+        ctx.logger.debug(f"ad detect api costs: {(time.time() - t1) * 1000} ms")
+    return res
+
+
 def get_threshold(ctx, app_id):
     cache_app_channel = ctx.config.get("APP_CHANNEL", {})
     k = "AC_{}_all".format(app_id)
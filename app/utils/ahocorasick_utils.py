@@ -1,5 +1,7 @@
 import ahocorasick
 
+from app.utils.identifier_matcher import build_identifier_matcher, use_exact_match
+
 
 def build_actree(wordlist):
     actree = ahocorasick.Automaton()
@@ -7,3 +9,10 @@ def build_actree(wordlist):
         actree.add_word(word[0], (word[0], word[1]))
     actree.make_automaton()
     return actree
+
+
+def build_matcher(wordlist, match_rule=None, match_engine=None):
+    """按名单的 match_rule 选择匹配引擎：标识类名单走精确匹配，其余构建自动机。"""
+    if use_exact_match(match_rule, match_engine):
+        return build_identifier_matcher(wordlist, match_rule)
+    return build_actree(wordlist)
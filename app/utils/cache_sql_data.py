@@ -1,16 +1,33 @@
 import json
-import pickle
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from operator import itemgetter
 from urllib.parse import urlparse
 
 import pymysql
 import redis
 
-from app.utils.ahocorasick_utils import build_actree
+from app.services.cache import APP_CHANNEL_KEY_INDEX, LIST_KEY_INDEX, SQL_IMPORT_LOCK, SQL_IMPORT_PROGRESS_KEY
+from app.utils.actree_snapshot import dump_snapshot, load_actree
 from app.utils.enums import ListLanguageScopeEnum, ListMatchTypeEnum, ListScopeEnum
+from app.utils.list_delta import LIST_DELTA_PREFIX, delta_key
 from app.utils.tokenizer import AllTokenizer
 
 tokenizer = AllTokenizer()
 
+# 服务端游标每次取回的行数；每个 Redis 管道写入的名单数
+IMPORT_FETCH_SIZE = 2000
+IMPORT_PIPELINE_SIZE = 100
+# 导入锁的有效期（秒，写入进度时续期）；计数类进度写入 Redis 的最小间隔（秒）
+IMPORT_LOCK_SECONDS = 300
+IMPORT_PROGRESS_INTERVAL = 1.0
+
 
 class DataBaseHandle(object):
     def __init__(self, host, username, password, database, port):
@@ -35,6 +52,116 @@ class DataBaseHandle(object):
             self.cursor.close()
             return res
 
+    def stream(self, sql, return_dict=False, size=IMPORT_FETCH_SIZE):
+        """服务端游标逐批读取，结果集不会整体加载到内存；读完之前同一连接不能执行其它查询。"""
+        cursor = self.db.cursor(pymysql.cursors.SSDictCursor if return_dict else pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(sql)
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+
+class SqlImportJob(object):
+    """MySQL 全量导入 Redis 的后台任务。
+
+    互斥锁（SET NX EX，随进度续期）和进度都保存在 Redis 中：多个 worker 进程同时只会运行一个导入，
+    任一进程都能查询到进度。进程退出导致锁过期而进度仍为 running 时，查询结果为 interrupted。
+    """
+
+    def __init__(self, redis_client, lock_seconds: int = IMPORT_LOCK_SECONDS):
+        self.redis = redis_client
+        self.lock_seconds = lock_seconds
+        self.token = uuid.uuid4().hex
+        self._thread = None
+        self._saved_at = 0.0
+        self.reset()
+
+    def reset(self):
+        self.status = "idle"
+        self.stage = ""
+        self.lists_total = 0
+        self.lists_done = 0
+        self.words = 0
+        self.started_at = None
+        self.finished_at = None
+        self.error = ""
+
+    def start(self, target, **kwargs) -> bool:
+        """在后台线程中执行 target(progress=self, **kwargs)，其它进程的导入仍在运行时返回 False。"""
+        if not self.redis.set(SQL_IMPORT_LOCK, self.token, nx=True, ex=self.lock_seconds):
+            return False
+        self.reset()
+        self.status = "running"
+        self.started_at = time.time()
+        self._save()
+        self._thread = threading.Thread(target=self._run, args=(target, kwargs), name="sql-import", daemon=True)
+        self._thread.start()
+        return True
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def update(self, **kwargs):
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+        # 计数类进度按间隔写入，阶段变化立即写入
+        if "stage" in kwargs or time.time() - self._saved_at >= IMPORT_PROGRESS_INTERVAL:
+            self._save()
+
+    def _fields(self) -> dict:
+        return {
+            "status": self.status,
+            "stage": self.stage,
+            "lists_total": self.lists_total,
+            "lists_done": self.lists_done,
+            "words": self.words,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+    def _save(self):
+        self.redis.hset(
+            SQL_IMPORT_PROGRESS_KEY, mapping={k: "" if v is None else v for k, v in self._fields().items()}
+        )
+        if self.status == "running":
+            self.redis.expire(SQL_IMPORT_LOCK, self.lock_seconds)
+        self._saved_at = time.time()
+
+    def _run(self, target, kwargs):
+        try:
+            target(progress=self, **kwargs)
+            self.status = "done"
+        except Exception as err:
+            self.status = "failed"
+            self.error = str(err)
+        finally:
+            self.finished_at = time.time()
+            self._save()
+            if self.redis.get(SQL_IMPORT_LOCK) == self.token:
+                self.redis.delete(SQL_IMPORT_LOCK)
+
+    def snapshot(self) -> dict:
+        """读取 Redis 中最近一次导入的进度。"""
+        self.reset()
+        result = self._fields()
+        for k, v in self.redis.hgetall(SQL_IMPORT_PROGRESS_KEY).items():
+            if k in ("lists_total", "lists_done", "words"):
+                result[k] = int(v or 0)
+            elif k in ("started_at", "finished_at"):
+                result[k] = float(v) if v not in (None, "") else None
+            elif k in result:
+                result[k] = v
+        if result["status"] == "running" and not self.redis.exists(SQL_IMPORT_LOCK):
+            result["status"] = "interrupted"
+        return result
+
 
 def cache_from_redis(redis_store):
     local_all_apps = []
@@ -50,9 +177,15 @@ def cache_from_redis(redis_store):
             "list_detail_version_seq",
             "list_detail_version",
             "list_detail_version_index",
+            "black_client_ip",
+            "black_client_ip_version",
+            "list_delta_pending",
+            "list_delta_compact_lock",
+            SQL_IMPORT_LOCK,
+            SQL_IMPORT_PROGRESS_KEY,
         ]:
             continue
-        if i[:13] == "chat_sentinel":
+        if i[:13] == "chat_sentinel" or i.startswith(LIST_DELTA_PREFIX):
             continue
         if i == "all_apps":
             local_all_apps = list(redis_store.smembers(i))
@@ -70,15 +203,14 @@ def cache_from_redis(redis_store):
             local_app_channel_listname[i] = v
         else:
             v = redis_store.hgetall(i)
-            data = pickle.loads(v["data"].encode("latin1")) if v.get("data") else ""
-            v["data"] = data
+            v["data"] = load_actree(v.get("data"), v.get("match_rule"), v.get("match_engine"))
             local_list_data[i] = v
 
     local_all_apps = list(set(local_all_apps))
     return local_all_apps, local_app_channel_listname, local_list_data, local_access_key
 
 
-def sql_data_to_redis(redis_url: str, mysql_url: str):
+def sql_data_to_redis(redis_url: str, mysql_url: str, workers=None, progress=None):
     if not redis_url or not mysql_url:
         return
     parsed = urlparse(mysql_url.replace("mysql+pymysql", "mysql"))
@@ -91,9 +223,13 @@ def sql_data_to_redis(redis_url: str, mysql_url: str):
         database=db,
     )
     redis_store = redis.Redis.from_url(redis_url, decode_responses=True)
+    if progress is not None:
+        progress.update(stage="apps")
     read_sql_all_app(sql_db, redis_store)
+    if progress is not None:
+        progress.update(stage="app_channels")
     read_sql_app_channel(sql_db, redis_store)
-    read_sql_detail_data(sql_db, redis_store)
+    read_sql_detail_data(sql_db, redis_store, workers=workers, progress=progress)
 
 
 def read_sql_all_app(sql_db, redis_store):
@@ -146,10 +282,66 @@ def read_sql_app_channel(sql_db, redis_store):
         for m, n in v.items():
             v[m] = json.dumps(n)
         redis_store.hset(k, mapping=v)
+        redis_store.sadd(APP_CHANNEL_KEY_INDEX, k)
     return True
 
 
-def read_sql_detail_data(sql_db, redis_store):
+def _build_snapshot(list_no, semantic, texts):
+    """在进程池中执行：分词（语义名单）并生成词表快照，返回 (list_no, 词数, 快照)。"""
+    data = []
+    for text in texts:
+        filter_text = tokenizer.tokenize(text, drop_prun=True) if semantic else text
+        if filter_text:
+            data.append((filter_text, text))
+    return list_no, len(data), dump_snapshot(list_no, data) if data else None
+
+
+def _list_mapping(i, language_codes, base_version, snapshot=None):
+    language_scope = str(
+        i.get("language_scope")
+        or (ListLanguageScopeEnum.ALL.value if i.get("language") in [None, "", "all"] else ListLanguageScopeEnum.SPECIFIC.value)
+    ).upper()
+    if language_scope == ListLanguageScopeEnum.SPECIFIC.value and not language_codes:
+        legacy = str(i.get("language") or "").strip().lower()
+        if legacy and legacy != "all":
+            language_codes = [legacy]
+    r = {
+        "name": i["name"],
+        "type": i["type"],
+        "match_rule": i["match_rule"],
+        "match_type": i["match_type"],
+        "suggest": i["suggest"],
+        "risk_type": i["risk_type"],
+        "status": i["status"],
+        "language": i["language"] if i["language"] else "",
+        "language_scope": language_scope,
+        "language_codes": json.dumps(language_codes),
+    }
+    if snapshot:
+        r["data"] = snapshot
+    if i.get("match_engine"):
+        # 标识类名单为 exact 时加载为精确匹配，其余保持子串匹配
+        r["match_engine"] = i["match_engine"]
+    r["base_version"] = base_version
+    return r
+
+
+def _write_lists(redis_store, records):
+    pipe = redis_store.pipeline(transaction=False)
+    for list_no, r in records:
+        # 只删除已包含在新快照中的记录；导入开始后追加的记录（版本大于 base_version）保留，
+        # 加载时在快照上重放，增删操作按版本顺序重放结果不变
+        pipe.zremrangebyscore(delta_key(list_no), "-inf", r["base_version"])
+        pipe.hset(list_no, mapping=r)
+        pipe.sadd(LIST_KEY_INDEX, list_no)
+    pipe.execute()
+
+
+def read_sql_detail_data(sql_db, redis_store, workers=None, progress=None):
+    """按 list_no 排序流式读取一遍 list_detail，分词与快照生成分发到进程池，结果按批通过管道写入 Redis。
+
+    workers 为进程数，默认 CPU 核数，<=1 时在当前进程内完成。
+    """
     lang_map = {}
     lang_sql = """
             SELECT 
@@ -174,59 +366,54 @@ def read_sql_detail_data(sql_db, redis_store):
             WHERE
                 delete_time IS NULL
             """
-    res = sql_db.select(sql, return_dict=True)
+    lists = {i["no"]: i for i in sql_db.select(sql, return_dict=True)}
+    # 全量导入的词表即为新的基础快照，之前的增量日志一并丢弃
+    base_version = int(redis_store.get("list_detail_version_seq") or 0)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if progress is not None:
+        progress.update(stage="lists", lists_total=len(lists), lists_done=0, words=0)
 
-    for i in res:
-        list_no = i["no"]
-        query_detail_sql = """
-            SELECT * FROM list_detail WHERE list_no='%s' AND delete_time IS NULL
-        """ % list_no
-        data = []
-        for d in sql_db.select(query_detail_sql, return_dict=True):
-            if ListMatchTypeEnum(i["match_type"]) == ListMatchTypeEnum.SEMANTIC:
-                filter_text = tokenizer.tokenize(d["text"], drop_prun=True)
-            else:
-                filter_text = d["text"]
-            if filter_text:
-                data.append((filter_text, d["text"]))
-
-        language_scope = str(
-            i.get("language_scope")
-            or (ListLanguageScopeEnum.ALL.value if i.get("language") in [None, "", "all"] else ListLanguageScopeEnum.SPECIFIC.value)
-        ).upper()
-        language_codes = lang_map.get(list_no, [])
-        if language_scope == ListLanguageScopeEnum.SPECIFIC.value and not language_codes:
-            legacy = str(i.get("language") or "").strip().lower()
-            if legacy and legacy != "all":
-                language_codes = [legacy]
-
-        if data:
-            ac = build_actree(data)
-            ac = pickle.dumps(ac).decode("latin1")
-            r = {
-                "name": i["name"],
-                "type": i["type"],
-                "match_rule": i["match_rule"],
-                "match_type": i["match_type"],
-                "suggest": i["suggest"],
-                "risk_type": i["risk_type"],
-                "status": i["status"],
-                "language": i["language"] if i["language"] else "",
-                "language_scope": language_scope,
-                "language_codes": json.dumps(language_codes),
-                "data": ac,
-            }
-        else:
-            r = {
-                "name": i["name"],
-                "type": i["type"],
-                "match_rule": i["match_rule"],
-                "match_type": i["match_type"],
-                "suggest": i["suggest"],
-                "risk_type": i["risk_type"],
-                "status": i["status"],
-                "language": i["language"] if i["language"] else "",
-                "language_scope": language_scope,
-                "language_codes": json.dumps(language_codes),
-            }
-        redis_store.hset(list_no, mapping=r)
+    records = []
+    done = set()
+
+    def finish(result):
+        list_no, words, snapshot = result
+        records.append((list_no, _list_mapping(lists[list_no], lang_map.get(list_no, []), base_version, snapshot)))
+        done.add(list_no)
+        if progress is not None:
+            progress.update(lists_done=len(done), words=progress.words + words)
+        if len(records) >= IMPORT_PIPELINE_SIZE:
+            _write_lists(redis_store, records)
+            records.clear()
+
+    detail_sql = """
+        SELECT list_no, text FROM list_detail WHERE delete_time IS NULL ORDER BY list_no, id
+    """
+    # 导入运行在多线程的服务进程中，子进程用 spawn 启动，不 fork 当前进程的线程与锁状态
+    executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) if workers > 1 else None
+    futures = deque()
+    try:
+        for list_no, group in groupby(sql_db.stream(detail_sql, return_dict=True), key=itemgetter("list_no")):
+            texts = [d["text"] for d in group]
+            if list_no not in lists:
+                continue
+            semantic = ListMatchTypeEnum(lists[list_no]["match_type"]) == ListMatchTypeEnum.SEMANTIC
+            if executor is None:
+                finish(_build_snapshot(list_no, semantic, texts))
+                continue
+            futures.append(executor.submit(_build_snapshot, list_no, semantic, texts))
+            # 限制在途任务数，避免整张表的词条同时驻留内存
+            while len(futures) >= workers * 2:
+                finish(futures.popleft().result())
+        while futures:
+            finish(futures.popleft().result())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    # 没有词条的名单
+    for list_no in lists:
+        if list_no not in done:
+            finish((list_no, 0, None))
+    if records:
+        _write_lists(redis_store, records)
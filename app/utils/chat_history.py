@@ -0,0 +1,178 @@
+"""角色近期私聊记录（roleChatContent:*）的读取与本地缓存。
+
+- 只解析文档中 PRIVATE（或“私聊频道”）频道的那一段和 role_level，其它频道不反序列化；
+  定位不唯一或格式不符合预期时回退到整体 json.loads，结果与旧实现一致。
+- 解析结果按 timeline 排好序后放入短 TTL 的 LRU，同一角色短时间内的多次发言只读一次 Redis，
+  请求内只需二分截取最近一小时的记录。
+- 同一轮事件循环内的并发读取合并为一次 MGET，同一 key 只读一次。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+PRIVATE_CHANNELS = ("PRIVATE", "私聊频道")
+
+# (role_level, timelines, contents)，timelines 升序
+HistoryEntry = Tuple[int, Tuple[int, ...], Tuple]
+EMPTY_HISTORY: HistoryEntry = (0, (), ())
+
+_decoder = json.JSONDecoder()
+_KEY_PATTERNS = {
+    name: re.compile(r'"%s"\s*:\s*' % re.escape(name)) for name in PRIVATE_CHANNELS + ("role_level", "chat_content")
+}
+
+
+class _Ambiguous(Exception):
+    pass
+
+
+def _find_key(raw: str, name: str):
+    """返回唯一的 "name": 位置；键不存在时返回 None，出现多次时无法判断层级，抛出 _Ambiguous。"""
+    matches = _KEY_PATTERNS[name].finditer(raw)
+    first = next(matches, None)
+    if first is not None and next(matches, None) is not None:
+        raise _Ambiguous(name)
+    return first
+
+
+def _entry(role_level, chat_content) -> HistoryEntry:
+    if not chat_content:
+        return (role_level, (), ())
+    items = sorted(chat_content, key=lambda x: x["timeline"])
+    return role_level, tuple(item["timeline"] for item in items), tuple(item["chat_content"] for item in items)
+
+
+def _parse_full(raw) -> HistoryEntry:
+    data = json.loads(raw)
+    chat_content = data.get("chat_content", {}).get("PRIVATE") or data.get("chat_content", {}).get("私聊频道")
+    return _entry(data.get("role_level", 0), chat_content)
+
+
+def parse_private_history(raw) -> HistoryEntry:
+    if not raw:
+        return EMPTY_HISTORY
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+    try:
+        role_level = 0
+        match = _find_key(raw, "role_level")
+        if match is not None:
+            role_level = _decoder.raw_decode(raw, match.end())[0]
+            if not isinstance(role_level, (int, float)) or isinstance(role_level, bool):
+                raise _Ambiguous("role_level")
+        chat_content = None
+        container = _find_key(raw, "chat_content")
+        if container is not None:
+            for name in PRIVATE_CHANNELS:
+                match = _find_key(raw, name)
+                if match is None:
+                    continue
+                if match.start() < container.end():
+                    raise _Ambiguous(name)
+                chat_content = _decoder.raw_decode(raw, match.end())[0]
+                if chat_content:
+                    break
+        if chat_content is not None and not isinstance(chat_content, list):
+            raise _Ambiguous("chat_content")
+        return _entry(role_level, chat_content)
+    except (_Ambiguous, ValueError):
+        return _parse_full(raw)
+
+
+def recent_history(entry: HistoryEntry, since: int, max_role_level: int = 40) -> Optional[List]:
+    """返回 since 之后的发言（按时间升序）；没有私聊记录或等级超过上限时返回 None。"""
+    role_level, timelines, contents = entry
+    if not contents or role_level > max_role_level:
+        return None
+    return list(contents[bisect_left(timelines, since):])
+
+
+class ChatHistoryCache(object):
+    def __init__(self, maxsize: int = 10000, ttl: float = 2.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, HistoryEntry]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_scheduled = False
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[HistoryEntry]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def put(self, key: str, entry: HistoryEntry):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    async def fetch(self, redis_client, key: str):
+        """与同一轮事件循环内的其它读取合并为一次 MGET，返回 key 的原始值。"""
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                loop.call_soon(self._flush, redis_client)
+        return await asyncio.shield(future)
+
+    def _flush(self, redis_client):
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, {}
+        asyncio.ensure_future(self._mget(redis_client, pending))
+
+    async def _mget(self, redis_client, pending: Dict[str, asyncio.Future]):
+        keys = list(pending)
+        self.fetches += 1
+        try:
+            values = await redis_client.mget(keys)
+        except Exception as err:
+            self.errors += 1
+            for future in pending.values():
+                if not future.done():
+                    # 等待方都已超时返回时也要取走异常，避免 "exception was never retrieved"
+                    future.add_done_callback(lambda f: f.exception())
+                    future.set_exception(err)
+            return
+        for key, value in zip(keys, values):
+            if not pending[key].done():
+                pending[key].set_result(value)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 6) if lookups else 0,
+            "fetches": self.fetches,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
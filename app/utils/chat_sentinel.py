@@ -0,0 +1,135 @@
+"""策略模型（chat_sentinel_*）封禁名单的本地索引。
+
+Redis 中每条规则为 hash 的一个字段，值为 ``{app_id: [id, ...]}``。本地按 app 拆成子字典，
+值为规则编号（多条规则命中同一 id 时为编号元组），规则名只保存一份；同步时只解析内容有变化的规则，
+按新旧 id 集合的差异增删索引，不再整体重建。
+"""
+from __future__ import annotations
+
+import json
+import sys
+from typing import Dict, Optional
+
+SENTINEL_KINDS = ("account_id", "ip")
+
+
+def _parse_rule(raw) -> Dict[str, set]:
+    if not raw:
+        return {}
+    try:
+        detail = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(detail, dict):
+        return {}
+    return {str(app): {str(i) for i in ids} for app, ids in detail.items() if ids}
+
+
+class SentinelIndex(object):
+    __slots__ = ("rules", "rule_ids", "apps", "_raw")
+
+    def __init__(self):
+        self.rules = []
+        self.rule_ids = {}
+        # apps: {app_id: {id: rule_no | (rule_no, ...)}}
+        self.apps = {}
+        self._raw = {}
+
+    def __len__(self):
+        return sum(len(ids) for ids in self.apps.values())
+
+    def get(self, app_id, value) -> Optional[str]:
+        """返回命中的第一条规则名，未命中返回 None。"""
+        ids = self.apps.get(app_id if isinstance(app_id, str) else str(app_id))
+        if not ids:
+            return None
+        ref = ids.get(value if isinstance(value, str) else str(value))
+        if ref is None:
+            return None
+        return self.rules[ref if isinstance(ref, int) else ref[0]]
+
+    def _rule_no(self, rule: str) -> int:
+        rule_no = self.rule_ids.get(rule)
+        if rule_no is None:
+            rule_no = len(self.rules)
+            self.rules.append(sys.intern(rule))
+            self.rule_ids[self.rules[rule_no]] = rule_no
+        return rule_no
+
+    def _add(self, app_id: str, value: str, rule_no: int):
+        ids = self.apps.get(app_id)
+        if ids is None:
+            ids = self.apps[sys.intern(app_id)] = {}
+        ref = ids.get(value)
+        if ref is None:
+            ids[value] = rule_no
+        elif isinstance(ref, int):
+            if ref != rule_no:
+                ids[value] = (ref, rule_no)
+        elif rule_no not in ref:
+            ids[value] = ref + (rule_no,)
+
+    def _remove(self, app_id: str, value: str, rule_no: int):
+        ids = self.apps.get(app_id)
+        if not ids:
+            return
+        ref = ids.get(value)
+        if ref is None:
+            return
+        if isinstance(ref, int):
+            if ref == rule_no:
+                del ids[value]
+        elif rule_no in ref:
+            rest = tuple(i for i in ref if i != rule_no)
+            ids[value] = rest[0] if len(rest) == 1 else rest
+        if not ids:
+            del self.apps[app_id]
+
+    def apply_rule(self, rule: str, raw) -> bool:
+        """把一条规则更新为 raw（None 表示规则已删除），返回索引是否有变化。"""
+        old_raw = self._raw.get(rule)
+        if old_raw == raw:
+            return False
+        old = _parse_rule(old_raw)
+        new = _parse_rule(raw)
+        rule_no = self._rule_no(rule)
+        for app_id, ids in old.items():
+            for value in ids - new.get(app_id, set()):
+                self._remove(app_id, value, rule_no)
+        for app_id, ids in new.items():
+            for value in ids - old.get(app_id, set()):
+                self._add(app_id, value, rule_no)
+        if raw is None:
+            self._raw.pop(rule, None)
+        else:
+            self._raw[rule] = raw
+        return True
+
+    def sync(self, raw_rules: Dict[str, str]) -> int:
+        """按 HGETALL 的结果同步，返回有变化的规则数。"""
+        changed = 0
+        for rule in [rule for rule in self._raw if rule not in raw_rules]:
+            changed += self.apply_rule(rule, None)
+        for rule, raw in raw_rules.items():
+            changed += self.apply_rule(rule, raw)
+        return changed
+
+
+class ChatSentinel(object):
+    __slots__ = SENTINEL_KINDS
+
+    def __init__(self):
+        self.account_id = SentinelIndex()
+        self.ip = SentinelIndex()
+
+    def __bool__(self):
+        return bool(self.account_id.apps or self.ip.apps)
+
+    def index(self, kind: str) -> SentinelIndex:
+        return getattr(self, kind)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            kind: {"rules": len(self.index(kind)._raw), "apps": len(self.index(kind).apps), "ids": len(self.index(kind))}
+            for kind in SENTINEL_KINDS
+        }
@@ -233,6 +233,12 @@ class ListLanguageScopeEnum(Enum):
     SPECIFIC = "SPECIFIC"
 
 
+class ListMatchEngineEnum(Enum):
+    # 子串匹配（自动机）；exact 仅对标识类 match_rule 生效，按整值 / CIDR 网段匹配
+    SUBSTRING = "substring"
+    EXACT = "exact"
+
+
 class SwichEnum(Enum):
     OFF = 0
     ON = 1
@@ -0,0 +1,119 @@
+"""标识类名单（IP、区服、角色、账号、游族 ID、设备指纹）的整值匹配。
+
+这类名单匹配的是短标识，用自动机做子串匹配既慢又会误命中（``1.1.1.1`` 命中 ``11.1.1.10``），
+名单设置 ``match_engine=exact`` 时加载为哈希表精确匹配；IP 名单中的 CIDR 网段按前缀长度分层存放，
+查找时从最长前缀开始逐层查表。未设置或为 ``substring`` 时保持子串匹配（``10.0.`` 这类前缀条目依赖该语义）。
+"""
+import ipaddress
+
+from app.utils.enums import ListMatchEngineEnum, ListMatchRuleEnum
+
+MATCH_ENGINE_EXACT = ListMatchEngineEnum.EXACT.value
+MATCH_ENGINE_SUBSTRING = ListMatchEngineEnum.SUBSTRING.value
+
+IDENTIFIER_MATCH_RULES = frozenset(
+    {
+        ListMatchRuleEnum.IP.value,
+        ListMatchRuleEnum.SERVER_ID.value,
+        ListMatchRuleEnum.ROLE_AND_SERVER_ID.value,
+        ListMatchRuleEnum.ACCOUNT_ID.value,
+        ListMatchRuleEnum.YOUZU_ID.value,
+        ListMatchRuleEnum.FINGERPRINT_ID.value,
+    }
+)
+
+
+def use_exact_match(match_rule, match_engine=None):
+    if match_engine != MATCH_ENGINE_EXACT:
+        return False
+    try:
+        return int(match_rule) in IDENTIFIER_MATCH_RULES
+    except (TypeError, ValueError):
+        return False
+
+
+def parse_cidr(word):
+    """返回 (version, prefixlen, network_int)；不是网段时返回 None。"""
+    if "/" not in word:
+        return None
+    try:
+        network = ipaddress.ip_network(word, strict=False)
+    except ValueError:
+        return None
+    return network.version, network.prefixlen, int(network.network_address) >> (network.max_prefixlen - network.prefixlen)
+
+
+class IdentifierMatcher(object):
+    """与 ahocorasick.Automaton 的 iter/items 接口一致，iter(text) 只在整值相等或 IP 落在网段内时产出。"""
+
+    __slots__ = ("exact", "networks", "_levels")
+
+    def __init__(self):
+        self.exact = {}
+        # networks: {(version, prefixlen, network_int): (word, payload)}
+        self.networks = {}
+        self._levels = ()
+
+    def add(self, word, payload, cidr=False):
+        word = word.strip()
+        network = parse_cidr(word) if cidr else None
+        if network is None:
+            self.exact[word] = payload
+        else:
+            self.networks[network] = (word, payload)
+
+    def finish(self):
+        # _levels: ((version, prefixlen, max_prefixlen, {network_int: payload}), ...)，长前缀在前
+        tables = {}
+        for (version, prefixlen, key), (_, payload) in self.networks.items():
+            tables.setdefault((version, prefixlen), {})[key] = payload
+        self._levels = tuple(
+            (version, prefixlen, 32 if version == 4 else 128, tables[(version, prefixlen)])
+            for version, prefixlen in sorted(tables, key=lambda i: (i[0], -i[1]))
+        )
+        return self
+
+    def __len__(self):
+        return len(self.exact) + len(self.networks)
+
+    def exists(self, word):
+        word = word.strip()
+        if word in self.exact:
+            return True
+        network = parse_cidr(word)
+        return network is not None and network in self.networks and self.networks[network][0] == word
+
+    def iter(self, text):
+        if not isinstance(text, str):
+            return
+        payload = self.exact.get(text)
+        if payload is not None:
+            yield len(text) - 1, payload
+        if not self._levels:
+            return
+        try:
+            address = ipaddress.ip_address(text)
+        except ValueError:
+            return
+        value = int(address)
+        for version, prefixlen, max_prefixlen, table in self._levels:
+            if version != address.version:
+                continue
+            payload = table.get(value >> (max_prefixlen - prefixlen))
+            if payload is not None:
+                yield len(text) - 1, payload
+
+    def items(self):
+        for word, payload in self.exact.items():
+            yield word, payload
+        for word, payload in self.networks.values():
+            yield word, payload
+
+
+def build_identifier_matcher(wordlist, match_rule):
+    """wordlist: [(filter_word, raw_word)]，payload 与 build_actree 一致为 (filter_word, raw_word)。"""
+    cidr = int(match_rule) == ListMatchRuleEnum.IP.value
+    matcher = IdentifierMatcher()
+    for word in wordlist:
+        matcher.add(word[0], (word[0], word[1]), cidr)
+    return matcher.finish()
@@ -0,0 +1,84 @@
+"""调用方 IP 黑名单：支持 IPv4 / IPv6 单个地址与 CIDR 网段。
+
+地址按位写入前缀树（每个版本一棵），查找沿地址的高位逐位下行，遇到第一个终止节点即命中，
+耗时与前缀长度成正比、与条目数量无关。精确地址另有哈希表作为快速路径。
+实例构建后只读，变更时整体重建并替换。
+"""
+import ipaddress
+
+
+def normalize_ip_entry(value):
+    """返回规范化后的条目：单个地址为地址本身，网段为 network/prefixlen；格式不正确时抛出 ValueError。"""
+    value = str(value or "").strip()
+    if not value:
+        raise ValueError("empty ip")
+    if "/" not in value:
+        return str(ipaddress.ip_address(value))
+    network = ipaddress.ip_network(value, strict=False)
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+
+class IPBlocklist(object):
+    __slots__ = ("_entries", "_exact", "_roots")
+
+    def __init__(self, entries=()):
+        self._entries = set()
+        self._exact = set()
+        # 节点为 [0 分支, 1 分支, 命中的条目]
+        self._roots = {}
+        for entry in entries:
+            try:
+                self._add(normalize_ip_entry(entry))
+            except ValueError:
+                continue
+
+    def _add(self, entry):
+        if entry in self._entries:
+            return
+        self._entries.add(entry)
+        network = ipaddress.ip_network(entry)
+        if network.prefixlen == network.max_prefixlen:
+            self._exact.add(entry)
+        node = self._roots.setdefault(network.version, [None, None, None])
+        value = int(network.network_address)
+        for shift in range(network.max_prefixlen - 1, network.max_prefixlen - 1 - network.prefixlen, -1):
+            bit = (value >> shift) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        node[2] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, ip):
+        return self.match(ip) is not None
+
+    def entries(self):
+        return sorted(self._entries)
+
+    def match(self, ip):
+        """返回命中的条目，未命中或 ip 不合法时返回 None。"""
+        if not self._entries or not ip:
+            return None
+        if ip in self._exact:
+            return ip
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        node = self._roots.get(address.version)
+        if node is None:
+            return None
+        value = int(address)
+        for shift in range(address.max_prefixlen - 1, -1, -1):
+            if node[2] is not None:
+                return node[2]
+            node = node[(value >> shift) & 1]
+            if node is None:
+                return None
+        return node[2]
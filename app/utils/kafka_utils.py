@@ -1,36 +1,164 @@
 import collections
 import json
+import time
+from json.encoder import encode_basestring
 
+from app.core.metrics import record_stage
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+
+# 日志字段定义：(来源, 原字段, 扁平 JSON 字段, 需去除的字符)，顺序即竖线日志的列顺序
+_REQ, _RESP, _EXTRA = 0, 1, 2
+LOG_FIELDS = [
+    (_REQ, "bt_id", "request_id", ""),
+    (_REQ, "timestamp", "timestamp", ""),
+    (_REQ, "token_id", "token_id", ""),
+    (_REQ, "nickname", "role_name", "'|\n"),
+    (_REQ, "text", "text", "\r'|\n"),
+    (_REQ, "app_id", "app_id", ""),
+    (_REQ, "server_id", "server_id", ""),
+    (_REQ, "account_id", "account_id", ""),
+    (_REQ, "role_id", "role_id", ""),
+    (_REQ, "vip_level", "role_vip", ""),
+    (_REQ, "level", "role_level", ""),
+    (_REQ, "ip", "ip", ""),
+    (_REQ, "channel", "channel", ""),
+    (_REQ, "relationship", "relationship", ""),
+    (_REQ, "target_id", "target_id", ""),
+    (_REQ, "organization_id", "union_id", ""),
+    (_REQ, "team_id", "team_id", ""),
+    (_REQ, "scene_id", "scene_id", ""),
+    (_REQ, "mac", "mac", ""),
+    (_REQ, "uuid", "uuid", ""),
+    (_REQ, "idfv", "idfv", ""),
+    (_REQ, "idfa", "idfa", ""),
+    (_REQ, "deviceId", "device_id", ""),
+    (_REQ, "phone", "phone", ""),
+    (_REQ, "imei", "imei", ""),
+    (_REQ, "title", "title", "|"),
+    (_REQ, "topic", "topic", "|"),
+    (_REQ, "nickocr", "nick_orc", "|"),
+    (_REQ, "channel_id", "channel_id", ""),
+    (_REQ, "sumPay", "total_pay_money", ""),
+    (_REQ, "logtime", "register_datetime", ""),
+    (_REQ, "logday", "register_date", ""),
+    (_REQ, "lastPay", "last_pay_datetime", ""),
+    (_REQ, "lastPayDay", "last_pay_date", ""),
+    (_REQ, "lastLogin", "last_login_datetime", ""),
+    (_REQ, "lastLoginDay", "last_login_date", ""),
+    (_REQ, "lastLogout", "last_logout_datetime", ""),
+    (_REQ, "lastLogoutDay", "last_logout_date", ""),
+    (_REQ, "deviceType", "device_type", ""),
+    (_RESP, "code", "code", ""),
+    (_EXTRA, "extra", "extra", ""),
+    (_RESP, "riskLevel", "risk_level", ""),
+    (_RESP, "detail", "detail", "|"),
+    (_RESP, "score", "score", ""),
+    (_RESP, "requestId", "response_id", ""),
+    (_RESP, "message", "message", "|"),
+]
+# 扁平 JSON 中 app_id 排在最前，其余按列顺序
+_JSON_ORDER = [5] + [i for i in range(len(LOG_FIELDS)) if i != 5]
+
+
+def _compile_fields(fields):
+    return [(source, key, tuple(strip)) for source, key, _, strip in fields]
+
+
+_COMPILED_FIELDS = _compile_fields(LOG_FIELDS)
+_JSON_PREFIXES = [(i, encode_basestring(LOG_FIELDS[i][2]) + ": ") for i in _JSON_ORDER]
+
+
+def dumps(obj, encoder="json"):
+    """encoder 为 orjson 且已安装时使用 orjson（输出为紧凑格式），否则与 json.dumps(ensure_ascii=False) 一致。"""
+    if encoder == "orjson" and orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False)
 
-def submit_kafka(data_params, response, ctx):
-    try:
-        one_row = write_hdfs_log(data_params, response)
-        tag = "plat_" + str(data_params["app_id"]) + "_chatmsg"
-        log_line = str(tag) + "\t" + str(one_row)
-        ctx.kafka_logger.write_msg(log_line)
 
-        qp_dict = {"request_data": data_params, "response_data": response, "app_id": str(data_params["app_id"])}
-        ctx.kafka_logger.write_query(json.dumps(qp_dict, ensure_ascii=False))
+def build_log_lines(data_params, response, encoder="json"):
+    """一次遍历字段定义，生成 (竖线日志行, query JSON, 扁平 JSON)。
 
-        text_dict = transfor_json(data_params, response)
-        ctx.kafka_logger.write_json(json.dumps(text_dict, ensure_ascii=False))
+    默认编码器下输出与 write_hdfs_log / transfor_json / json.dumps 的组合逐字节一致。
+    """
+    values = []
+    for source, key, strip in _COMPILED_FIELDS:
+        if source == _REQ:
+            value = str(data_params.get(key, ""))
+        elif source == _RESP:
+            value = str(response.get(key, ""))
+        else:
+            value = dumps(response.get(key, ""), encoder)
+        for char in strip:
+            # 多数字段不含这些字符，先判断再替换比 str.translate 快
+            if char in value:
+                value = value.replace(char, "")
+        values.append(value)
+
+    one_row = "|".join(values)
+    app_id = values[5]
+    query_line = dumps({"request_data": data_params, "response_data": response, "app_id": app_id}, encoder)
+    if encoder == "orjson" and orjson is not None:
+        json_line = dumps({LOG_FIELDS[i][2]: values[i] for i in _JSON_ORDER}, encoder)
+    else:
+        json_line = "{" + ", ".join(prefix + encode_basestring(values[i]) for i, prefix in _JSON_PREFIXES) + "}"
+    return one_row, query_line, json_line
+
+
+def text_log_records(data_params, response, encoder="json"):
+    """文本检测日志：[(日志流, 日志行)]，日志流对应 KafkaLog 的 msg / query / json 文件。"""
+    one_row, query_line, json_line = build_log_lines(data_params, response, encoder)
+    tag = "plat_" + str(data_params["app_id"]) + "_chatmsg"
+    return [("msg", tag + "\t" + one_row), ("query", query_line), ("json", json_line)]
+
+
+def img_log_records(data_params, response, encoder="json"):
+    qp_dict = {"request_data": data_params, "response_data": response, "app_id": str(data_params["app_id"])}
+    img_dict = {}
+    img_dict.update(data_params)
+    img_dict.update(response)
+    img_dict["app_id"] = str(data_params["app_id"])
+    return [("query", dumps(qp_dict, encoder)), ("img", dumps(img_dict, encoder))]
+
+
+def submit_kafka(data_params, response, ctx):
+    try:
+        encoder = ctx.config.get("LOG_JSON_ENCODER", "json")
+        for stream, line in text_log_records(data_params, response, encoder):
+            getattr(ctx.kafka_logger, f"write_{stream}")(line)
     except Exception as err:
         ctx.logger.debug(f"write request log err: {err}")
 
 
 def submit_img_kafka(data_params, response, ctx):
     try:
-        qp_dict = {"request_data": data_params, "response_data": response, "app_id": str(data_params["app_id"])}
-        ctx.kafka_logger.write_query(json.dumps(qp_dict, ensure_ascii=False))
-        img_dict = {}
-        img_dict.update(data_params)
-        img_dict.update(response)
-        img_dict["app_id"] = str(data_params["app_id"])
-        ctx.kafka_logger.write_img(json.dumps(img_dict, ensure_ascii=False))
+        encoder = ctx.config.get("LOG_JSON_ENCODER", "json")
+        for stream, line in img_log_records(data_params, response, encoder):
+            getattr(ctx.kafka_logger, f"write_{stream}")(line)
     except Exception as err:
         ctx.logger.debug(f"write img request log err: {err}")
 
 
+def submit_log(ctx, kind, data_params, response):
+    """接口日志入口：放入后台日志管道；未启用管道时同步写入。kind 为 text 或 img。"""
+    start = time.perf_counter()
+    pipeline = ctx.config.get("LOG_PIPELINE")
+    if pipeline is not None:
+        pipeline.submit(kind, data_params, response)
+    elif kind == "img":
+        submit_img_kafka(data_params, response, ctx)
+    else:
+        submit_kafka(data_params, response, ctx)
+    record_stage(ctx, "kafka_submit", time.perf_counter() - start)
+
+
 def write_hdfs_log(data_json, response):
     data_json = collections.defaultdict(handle, data_json)
     response = collections.defaultdict(handle, response)
@@ -1,3 +1,4 @@
+import asyncio
 import json
 
 
@@ -16,3 +17,51 @@ class LanguageClassification(object):
         except Exception as err:
             ctx.logger.debug(f"language predict err: {err}")
             return False
+
+    @classmethod
+    async def predict_async(cls, msg, ctx):
+        url = ctx.config.get("LANGUAGE_CLS_URL", "")
+        if not url:
+            return False
+        headers = {"Content-Type": "application/json"}
+        params = {"nickname": msg.nickname, "text": msg.text}
+        try:
+            client = ctx.config.get("HTTP_CLIENT")
+            response = await client.post(url=url, headers=headers, json=params, timeout=0.2)
+            return json.loads(response.text)
+        except Exception as err:
+            ctx.logger.debug(f"language predict err: {err}")
+            return False
+
+    @classmethod
+    async def predict_batch_async(cls, msgs, ctx):
+        """批量语种识别，返回与 msgs 对应的结果列表（失败项为 False）。
+
+        配置了 LANGUAGE_CLS_BATCH_URL 时一次请求完成：请求体为 [{"nickname", "text"}, ...]，响应为等长的结果列表；
+        否则对去重后的 (nickname, text) 并发调用单条接口。
+        """
+        keys = [(msg.nickname, msg.text) for msg in msgs]
+        unique = list(dict.fromkeys(keys))
+        by_key = dict(zip(unique, await cls._predict_unique(unique, msgs, ctx)))
+        return [by_key[key] for key in keys]
+
+    @classmethod
+    async def _predict_unique(cls, unique, msgs, ctx):
+        url = ctx.config.get("LANGUAGE_CLS_BATCH_URL", "")
+        if url:
+            headers = {"Content-Type": "application/json"}
+            params = [{"nickname": nickname, "text": text} for nickname, text in unique]
+            try:
+                client = ctx.config.get("HTTP_CLIENT")
+                response = await client.post(url=url, headers=headers, json=params, timeout=0.5)
+                results = json.loads(response.text)
+                if isinstance(results, list) and len(results) == len(unique):
+                    return results
+                ctx.logger.debug(f"language batch predict bad response: {response.text[:200]}")
+            except Exception as err:
+                ctx.logger.debug(f"language batch predict err: {err}")
+            return [False] * len(unique)
+        first = {}
+        for msg in msgs:
+            first.setdefault((msg.nickname, msg.text), msg)
+        return await asyncio.gather(*(cls.predict_async(first[key], ctx) for key in unique))
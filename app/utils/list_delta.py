@@ -0,0 +1,74 @@
+"""名单词条的增量日志。
+
+词条变更不再整体改写名单 hash 中的 data，而是在 ``list_delta:{list_no}``（zset）中追加一条记录，
+score 为本次变更的 list_detail_version，member 为::
+
+    {"v": version, "ops": [["+", filter_word, raw_word] | ["-", filter_word], ...]}
+
+名单 hash 中的 data 为基础快照，base_version 为快照已包含的最大版本；基础快照依次应用 base_version
+之后的记录即为完整词表。压缩时把记录合并进新的基础快照并删除已合并的记录，见 app/services/cache.py。
+"""
+import json
+from typing import Dict, Iterable, List, Tuple
+
+LIST_DELTA_PREFIX = "list_delta:"
+
+OP_ADD = "+"
+OP_REMOVE = "-"
+
+# [(version, ops)]，按版本升序
+Deltas = List[Tuple[int, list]]
+
+
+def delta_key(list_no):
+    return f"{LIST_DELTA_PREFIX}{list_no}"
+
+
+def add_op(filter_word, raw_word):
+    return [OP_ADD, filter_word, raw_word]
+
+
+def remove_op(filter_word):
+    return [OP_REMOVE, filter_word]
+
+
+def encode_ops(ops):
+    return json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_delta(version, ops):
+    # 与 app/services/cache.py 中追加记录的 Lua 脚本拼出的格式一致
+    return '{"v":%d,"ops":%s}' % (int(version), encode_ops(ops))
+
+
+def decode_deltas(members: Iterable, after: int = 0) -> Deltas:
+    """解码 zset 中的记录，跳过版本不大于 after 的记录（已包含在基础快照中）和无法解析的记录。"""
+    deltas = []
+    for member in members or ():
+        if isinstance(member, bytes):
+            member = member.decode("utf-8")
+        try:
+            item = json.loads(member)
+            version = int(item["v"])
+            ops = item["ops"]
+        except (TypeError, ValueError, KeyError):
+            continue
+        if version > after:
+            deltas.append((version, ops))
+    deltas.sort(key=lambda i: i[0])
+    return deltas
+
+
+def apply_deltas(words: Dict[str, str], deltas: Deltas) -> Dict[str, str]:
+    """words: {filter_word: raw_word}，原地应用增量并返回。"""
+    for _, ops in deltas:
+        for op in ops:
+            if op[0] == OP_ADD:
+                words[op[1]] = op[2]
+            elif op[0] == OP_REMOVE:
+                words.pop(op[1], None)
+    return words
+
+
+def last_version(deltas: Deltas, default: int = 0) -> int:
+    return deltas[-1][0] if deltas else default
@@ -0,0 +1,104 @@
+import json
+
+from app.utils.enums import ListLanguageScopeEnum, ListMatchRuleEnum, ListMatchTypeEnum, ListStatusEnum
+
+META_KEY = "_meta"
+
+# 按语种过滤的匹配规则：文本 + 昵称 / 文本 / 昵称，其余规则（IP、账号等）不看语种
+LANGUAGE_MATCH_RULES = frozenset(
+    (ListMatchRuleEnum.TEXT_AND_NAME.value, ListMatchRuleEnum.TEXT.value, ListMatchRuleEnum.ROLE_NAME.value)
+)
+
+
+def parse_language_codes(raw):
+    if raw is None:
+        return []
+    if isinstance(raw, list):
+        return [str(i).strip().lower() for i in raw if str(i).strip()]
+    if isinstance(raw, str):
+        raw_str = raw.strip()
+        if not raw_str:
+            return []
+        if raw_str.startswith("["):
+            try:
+                parsed = json.loads(raw_str)
+                if isinstance(parsed, list):
+                    return [str(i).strip().lower() for i in parsed if str(i).strip()]
+            except Exception:
+                pass
+        return [str(i).strip().lower() for i in raw_str.split(",") if str(i).strip()]
+    return []
+
+
+def language_scope_and_codes(name_list):
+    scope_raw = name_list.get("language_scope")
+    scope = str(scope_raw).strip().upper() if scope_raw else ""
+    codes = parse_language_codes(name_list.get("language_codes"))
+    if not scope:
+        legacy = str(name_list.get("language") or "").strip().lower()
+        if legacy and legacy != "all":
+            return ListLanguageScopeEnum.SPECIFIC.value, [legacy]
+        return ListLanguageScopeEnum.ALL.value, []
+    if scope == ListLanguageScopeEnum.SPECIFIC.value:
+        if not codes:
+            legacy = str(name_list.get("language") or "").strip().lower()
+            if legacy and legacy != "all":
+                codes = [legacy]
+        return scope, codes
+    if scope == ListLanguageScopeEnum.ALL.value:
+        return scope, []
+    return ListLanguageScopeEnum.ALL.value, []
+
+
+def normalize_language(value):
+    if not value:
+        return ""
+    return str(value).strip().lower()
+
+
+class ListMeta(object):
+    """名单的预解析元数据，加载缓存时生成一次，匹配时不再解析 JSON / 转换枚举。"""
+
+    __slots__ = ("name", "enabled", "match_rule", "match_type", "risk_type", "all_languages", "codes")
+
+    def __init__(self, name_list):
+        self.name = name_list.get("name")
+        try:
+            self.enabled = int(name_list.get("status", "")) == ListStatusEnum.ON.value
+        except (TypeError, ValueError):
+            self.enabled = False
+        try:
+            self.match_rule = int(name_list.get("match_rule"))
+        except (TypeError, ValueError):
+            self.match_rule = None
+        try:
+            self.match_type = ListMatchTypeEnum(int(name_list.get("match_type"))).value
+        except (TypeError, ValueError):
+            self.match_type = None
+        self.risk_type = name_list.get("risk_type")
+        scope, codes = language_scope_and_codes(name_list)
+        self.all_languages = scope == ListLanguageScopeEnum.ALL.value
+        self.codes = frozenset(codes)
+
+    @property
+    def language_filtered(self):
+        return self.match_rule in LANGUAGE_MATCH_RULES
+
+    def allows(self, language):
+        """language 需已经过 normalize_language。"""
+        if self.all_languages:
+            return True
+        return bool(language) and language in self.codes
+
+
+def attach_list_meta(name_list):
+    name_list[META_KEY] = ListMeta(name_list)
+    return name_list
+
+
+def list_meta(name_list):
+    meta = name_list.get(META_KEY)
+    if meta is None:
+        meta = ListMeta(name_list)
+        name_list[META_KEY] = meta
+    return meta
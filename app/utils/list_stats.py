@@ -0,0 +1,65 @@
+import threading
+import time
+
+
+class ListStats(object):
+    """按名单统计的扫描次数、命中次数与累计扫描耗时，用于找出从不命中或扫描代价异常的名单。
+
+    计数在匹配热路径上更新，为降低开销不加锁，多线程并发时可能丢失少量计数，只作容量规划参考。
+    """
+
+    def __init__(self):
+        # list_no -> [扫描次数, 命中次数, 累计耗时(秒)]
+        self._counters = {}
+        self._since = time.time()
+        self._reset_lock = threading.Lock()
+
+    def record(self, list_no, hit, seconds):
+        counter = self._counters.get(list_no)
+        if counter is None:
+            counter = self._counters.setdefault(list_no, [0, 0, 0.0])
+        counter[0] += 1
+        if hit:
+            counter[1] += 1
+        counter[2] += seconds
+
+    def reset(self):
+        with self._reset_lock:
+            self._counters = {}
+            self._since = time.time()
+
+    def snapshot(self, cache_data):
+        """合并本地缓存中的名单信息；缓存中存在但从未被扫描的名单也会列出（计数为 0）。"""
+        counters = dict(self._counters)
+        result = []
+        for list_no in set(counters) | set(cache_data):
+            scans, hits, seconds = counters.get(list_no, (0, 0, 0.0))
+            name_list = cache_data.get(list_no) or {}
+            result.append(
+                {
+                    "list_no": list_no,
+                    "name": name_list.get("name", ""),
+                    "type": name_list.get("type", ""),
+                    "status": name_list.get("status", ""),
+                    "words": _automaton_size(name_list.get("data")),
+                    "scans": scans,
+                    "hits": hits,
+                    "hit_rate": round(hits / scans, 6) if scans else 0,
+                    "scan_ms_total": round(seconds * 1000, 3),
+                    "scan_us_avg": round(seconds * 1e6 / scans, 3) if scans else 0,
+                }
+            )
+        result.sort(key=lambda item: (-item["scan_ms_total"], item["list_no"]))
+        return {"since": int(self._since), "lists": result}
+
+
+def _automaton_size(data):
+    if not data:
+        return 0
+    try:
+        return len(data)
+    except TypeError:
+        return 0
+
+
+list_stats = ListStats()
@@ -18,28 +18,46 @@ prompt = """你是一位应用场景的文本风控专家。请负责识别用
 url = "http://ai.llm.yoozoo.com/v1/chat/completions"
 
 
+def _build_request(latest_chat, recent_chat_history):
+    return {
+        "model": "Qwen1.5-14B-Chat",
+        "messages": [
+            {"role": "system", "content": prompt},
+            {
+                "role": "user",
+                "content": f"latest_chat: {latest_chat}, recent_chat_history: {recent_chat_history}",
+            },
+        ],
+        "do_sample": True,
+        "temperature": 0,
+        "top_p": 0,
+        "n": 1,
+        "max_tokens": 0,
+        "stream": False,
+    }
+
+
+def _need_llm(app_id, recent_chat_history):
+    return str(app_id) in ["2013101", "2013001"] and bool(recent_chat_history)
+
+
 def get_llm_ans(app_id, latest_chat, recent_chat_history):
     try:
-        if str(app_id) not in ["2013101", "2013001"] or not recent_chat_history:
+        if not _need_llm(app_id, recent_chat_history):
             return False
+        res = requests.post(url=url, json=_build_request(latest_chat, recent_chat_history), timeout=0.5).json()
+        ans = res["choices"][0]["message"]["content"].strip()
+        return str(ans) == "True"
+    except Exception:
+        return False
+
 
-        data = {
-            "model": "Qwen1.5-14B-Chat",
-            "messages": [
-                {"role": "system", "content": prompt},
-                {
-                    "role": "user",
-                    "content": f"latest_chat: {latest_chat}, recent_chat_history: {recent_chat_history}",
-                },
-            ],
-            "do_sample": True,
-            "temperature": 0,
-            "top_p": 0,
-            "n": 1,
-            "max_tokens": 0,
-            "stream": False,
-        }
-        res = requests.post(url=url, json=data, timeout=0.5).json()
+async def get_llm_ans_async(ctx, app_id, latest_chat, recent_chat_history):
+    try:
+        if not _need_llm(app_id, recent_chat_history):
+            return False
+        client = ctx.config.get("HTTP_CLIENT")
+        res = (await client.post(url=url, json=_build_request(latest_chat, recent_chat_history), timeout=0.5)).json()
         ans = res["choices"][0]["message"]["content"].strip()
         return str(ans) == "True"
     except Exception:
@@ -1,18 +1,23 @@
 import json
 import time
+from collections import OrderedDict
 from random import choice
 
-from app.utils.ad_detect_utils import ad_detect
+from app.core.metrics import stage_timer
+from app.utils.ad_detect_utils import ad_detect, ad_detect_async
 from app.utils.enums import (
     ListMatchRuleEnum,
     ListMatchTypeEnum,
     ListRiskTypeEnum,
-    ListLanguageScopeEnum,
-    ListStatusEnum,
     ListTypeEnum,
     SwichEnum,
 )
-from app.utils.llm_utils import get_llm_ans
+from app.models.chat_msg import ChatMsg
+from app.utils.identifier_matcher import IDENTIFIER_MATCH_RULES
+from app.utils.list_meta import list_meta, normalize_language
+from app.utils.list_stats import list_stats
+from app.utils.llm_utils import get_llm_ans, get_llm_ans_async
+from app.utils.scope_index import ScopeIndex
 from app.utils.tokenizer import AllTokenizer
 
 tokenizer = AllTokenizer()
@@ -31,8 +36,90 @@ def timer(func):
     return wrapper
 
 
+class ChannelPolicy(object):
+    """某个 (app_id, channel) 合并 channel / app / 全局三级配置后的名单与开关。"""
+
+    __slots__ = ("white_list", "ignore_list", "black_list", "ac_switch_on", "ai_switch_on", "shumei_off")
+
+    def __init__(self, white_list, ignore_list, black_list, ac_switch_on, ai_switch_on, shumei_off):
+        self.white_list = tuple(white_list)
+        self.ignore_list = tuple(ignore_list)
+        self.black_list = tuple(black_list)
+        self.ac_switch_on = ac_switch_on
+        self.ai_switch_on = ai_switch_on
+        self.shumei_off = shumei_off
+
+
+def build_channel_policy(ctx, app_id, channel):
+    msg = ChatMsg(channel=channel, app_id=app_id)
+    white_list, ignore_list, black_list = get_white_black_list(msg, ctx.config["APP_CHANNEL"])
+    return ChannelPolicy(
+        white_list,
+        ignore_list,
+        black_list,
+        ac_switch_is_on(ctx, msg),
+        ai_switch_is_on(ctx, app_id),
+        shumei_swich_is_off(channel, ctx, app_id),
+    )
+
+
+def get_channel_policy(ctx, app_id, channel):
+    """请求路径只做一次字典查找；APP_CHANNEL 变更时由 refresh_channel_policies 重建受影响的条目。
+
+    channel 来自请求，缓存最多保留 CHANNEL_POLICY_CACHE_SIZE 个 (app_id, channel)，超出时淘汰最早加入的条目。
+    """
+    policies = ctx.config.get("CHANNEL_POLICY")
+    if policies is None:
+        policies = ctx.config.setdefault("CHANNEL_POLICY", OrderedDict())
+    key = (str(app_id), channel)
+    policy = policies.get(key)
+    if policy is None:
+        policy = build_channel_policy(ctx, key[0], channel)
+        policies[key] = policy
+        maxsize = ctx.config.get("CHANNEL_POLICY_CACHE_SIZE", 10000)
+        while len(policies) > maxsize:
+            try:
+                policies.popitem(last=False)
+            except KeyError:
+                break
+    return policy
+
+
+def _policy_depends_on(key, app_channel_key):
+    if app_channel_key == "AC_all_all":
+        return True
+    if app_channel_key == f"AC_{key[0]}_all":
+        return True
+    return app_channel_key == f"AC_{key[1]}"
+
+
+def refresh_channel_policies(ctx, app_channel_keys=None):
+    """重建依赖指定 AC_* 配置的策略，app_channel_keys 为 None 时清空全部（APP_CHANNEL 整体替换）。"""
+    if app_channel_keys is None:
+        ctx.config["CHANNEL_POLICY"] = OrderedDict()
+        return
+    policies = ctx.config.get("CHANNEL_POLICY")
+    if not policies:
+        return
+    for key in list(policies.keys()):
+        if not any(_policy_depends_on(key, k) for k in app_channel_keys):
+            continue
+        try:
+            policies[key] = build_channel_policy(ctx, key[0], key[1])
+        except Exception:
+            # 配置值不合法时丢弃缓存，由请求路径重建并按原逻辑报错
+            policies.pop(key, None)
+
+
+def resolve_scope(ctx, msg):
+    """返回 (名单与开关策略, 黑名单合并索引)，同一 app/channel 的消息可共用。"""
+    policy = get_channel_policy(ctx, msg.app_id, msg.channel)
+    scope_index = get_scope_index(ctx, policy.black_list, ctx.config["CACHE_DATA"])
+    return policy, scope_index
+
+
 @timer
-def all_filter(msg, r, ctx, language_pred):
+def all_filter(msg, r, ctx, language_pred, scope=None):
     detail = {
         "contextText": "",
         "filteredText": "",
@@ -45,37 +132,40 @@ def all_filter(msg, r, ctx, language_pred):
     }
 
     try:
-        cache_app_channel = ctx.config["APP_CHANNEL"]
         cache_data = ctx.config["CACHE_DATA"]
         chat_sentinel = ctx.config.get("CHAT_SENTINEL", {})
 
-        white_list, ignore_list, black_list = get_white_black_list(msg, cache_app_channel)
+        policy, scope_index = scope or resolve_scope(ctx, msg)
+        timings = msg.stage_timings
 
         # 白名单过滤
-        return_flag, r = whitelist_filter(
-            msg, cache_data, white_list, r, detail, language_pred
-        )
+        with stage_timer(timings, "whitelist"):
+            return_flag, r = whitelist_filter(
+                msg, cache_data, policy.white_list, r, detail, language_pred
+            )
         if return_flag:
             return r
 
         # 忽略名单
-        msg = ignorelist_filter(msg, cache_data, ignore_list, language_pred)
+        with stage_timer(timings, "ignorelist"):
+            msg = ignorelist_filter(msg, cache_data, policy.ignore_list, language_pred)
 
         # 黑名单过滤
-        if ac_switch_is_on(ctx, msg):
-            blacklist_res = blacklist_filter(
-                msg, cache_data, black_list, r, detail, language_pred, chat_sentinel, True
-            )
-            return_flag, r = blacklist_res[0], blacklist_res[1]
-            if ai_switch_is_on(ctx, msg.app_id):
-                return_flag, r = ai_filter(ctx, msg, blacklist_res, r)
-        else:
+        with stage_timer(timings, "blacklist"):
             blacklist_res = blacklist_filter(
-                msg, cache_data, black_list, r, detail, language_pred, chat_sentinel, False
+                msg,
+                cache_data,
+                policy.black_list,
+                r,
+                detail,
+                language_pred,
+                chat_sentinel,
+                policy.ac_switch_on,
+                scope_index,
             )
-            return_flag, r = blacklist_res[0], blacklist_res[1]
-            if ai_switch_is_on(ctx, msg.app_id):
-                return_flag, r = ai_filter(ctx, msg, blacklist_res, r)
+        return_flag, r = blacklist_res[0], blacklist_res[1]
+        if policy.ai_switch_on:
+            return_flag, r = _run_ai_filter(ctx, msg, blacklist_res, r)
 
         if return_flag:
             return r
@@ -84,9 +174,16 @@ def all_filter(msg, r, ctx, language_pred):
     return r
 
 
-def tokenize_text(text, match_type, text_language=None):
+def tokenize_text(text, match_type, text_language=None, cache=None):
     if ListMatchTypeEnum(int(match_type)) == ListMatchTypeEnum.SEMANTIC:
-        text = tokenizer.tokenize(text, drop_prun=True, language=text_language)
+        if cache is None:
+            return tokenizer.tokenize(text, drop_prun=True, language=text_language)
+        key = (text, text_language, ListMatchTypeEnum.SEMANTIC.value)
+        tokenized = cache.get(key)
+        if tokenized is None:
+            tokenized = tokenizer.tokenize(text, drop_prun=True, language=text_language)
+            cache[key] = tokenized
+        return tokenized
     return text
 
 
@@ -102,7 +199,7 @@ def _dedup(items):
 
 
 def _is_list_active(name_list):
-    return name_list.get("data") and int(name_list.get("status", "")) == ListStatusEnum.ON.value
+    return bool(name_list.get("data")) and list_meta(name_list).enabled
 
 
 def _get_match_languages(match_rule, language_pred):
@@ -115,8 +212,8 @@ def _get_match_languages(match_rule, language_pred):
     return None
 
 
-def _iter_ac_matches(ac_data, text, match_type, text_language):
-    tokenized = tokenize_text(text, match_type, text_language)
+def _iter_ac_matches(ac_data, text, match_type, text_language, cache=None):
+    tokenized = tokenize_text(text, match_type, text_language, cache)
     for item in ac_data.iter(tokenized):
         raw_word = str(item[1][1])
         filter_word = str(item[1][0])
@@ -124,19 +221,20 @@ def _iter_ac_matches(ac_data, text, match_type, text_language):
 
 
 def _collect_match_words(name_list, msg, language_pred):
-    match_rule = int(name_list["match_rule"])
+    meta = list_meta(name_list)
+    match_rule = meta.match_rule
     languages = _get_match_languages(match_rule, language_pred)
     filter_texts = ListMatchRuleEnum.enum2filtertext(match_rule, msg)
     results = []
     for idx, text in enumerate(filter_texts):
         text_language = languages[idx] if languages else None
-        if languages and not _language_allowed(name_list, text_language):
+        if languages and not meta.allows(normalize_language(text_language)):
             results.append((text, text_language, [], []))
             continue
         raw_words = []
         format_words = []
         for raw_word, filter_word in _iter_ac_matches(
-            name_list["data"], text, name_list["match_type"], text_language
+            name_list["data"], text, meta.match_type, text_language, msg.token_cache
         ):
             raw_words.append(raw_word)
             format_words.append(filter_word)
@@ -144,6 +242,14 @@ def _collect_match_words(name_list, msg, language_pred):
     return match_rule, filter_texts, results
 
 
+def _word_positions(text, raw_word, match_rule):
+    start = text.find(raw_word)
+    if start < 0 and match_rule in IDENTIFIER_MATCH_RULES:
+        # IP 网段命中时词条不出现在原文中，位置取整个字段
+        return list(range(len(text)))
+    return list(range(start, start + len(raw_word)))
+
+
 def _apply_remove(text, words):
     for w in words:
         text = text.replace(w, "")
@@ -166,12 +272,12 @@ def _apply_sentinel_hit(detail, r, risk_type, rule_model):
 def _check_chat_sentinel(chat_sentinel, msg, detail, r):
     if not chat_sentinel:
         return False, r
-    account_hit = chat_sentinel["account_id"].get(f"{msg.app_id}_{msg.account_id}", None)
-    if account_hit:
-        return _apply_sentinel_hit(detail, r, ListRiskTypeEnum.BLACK_ACCOUNT.value, account_hit[0])
-    ip_hit = chat_sentinel["ip"].get(f"{msg.app_id}_{msg.ip}", None)
-    if ip_hit:
-        return _apply_sentinel_hit(detail, r, ListRiskTypeEnum.BLACK_IP.value, ip_hit[0])
+    account_rule = chat_sentinel.account_id.get(msg.app_id, msg.account_id)
+    if account_rule is not None:
+        return _apply_sentinel_hit(detail, r, ListRiskTypeEnum.BLACK_ACCOUNT.value, account_rule)
+    ip_rule = chat_sentinel.ip.get(msg.app_id, msg.ip)
+    if ip_rule is not None:
+        return _apply_sentinel_hit(detail, r, ListRiskTypeEnum.BLACK_IP.value, ip_rule)
     return False, r
 
 
@@ -189,7 +295,43 @@ def _build_matched_detail_item(list_id, match_rule, name, words, positions):
     return item
 
 
-def _collect_blacklist_hits(black_list, cache_data, msg, language_pred):
+def build_scope_index(black_list, cache_data, previous=None):
+    sources = tuple(cache_data.get(list_no) for list_no in black_list)
+    lists = [
+        (list_no, name_list)
+        for list_no, name_list in zip(black_list, sources)
+        if name_list and _is_list_active(name_list)
+    ]
+    return ScopeIndex(lists, sources, previous)
+
+
+def get_scope_index(ctx, black_list, cache_data):
+    """按黑名单列表缓存合并后的自动机，黑名单相同的 channel 共用一份。
+
+    名单数据被替换后自动重建（只有增量层变化时复用合并结果）。
+    """
+    black_list = tuple(black_list)
+    indexes = ctx.config.setdefault("SCOPE_INDEX", {})
+    index = indexes.get(black_list)
+    if index is None or not index.is_fresh(tuple(cache_data.get(list_no) for list_no in black_list)):
+        index = build_scope_index(black_list, cache_data, index)
+        indexes[black_list] = index
+    return index
+
+
+def refresh_scope_indexes(ctx):
+    """重建已缓存的黑名单索引，并丢弃当前策略都不再引用的索引。"""
+    cache_data = ctx.config.get("CACHE_DATA", {})
+    indexes = ctx.config.get("SCOPE_INDEX", {})
+    in_use = {policy.black_list for policy in list(ctx.config.get("CHANNEL_POLICY", {}).values())}
+    for black_list in list(indexes.keys()):
+        if black_list not in in_use:
+            indexes.pop(black_list, None)
+            continue
+        get_scope_index(ctx, black_list, cache_data)
+
+
+def _collect_blacklist_hits(black_list, cache_data, msg, language_pred, scope_index=None):
     aggregate = {
         "match_words": [],
         "format_match_words": [],
@@ -199,43 +341,79 @@ def _collect_blacklist_hits(black_list, cache_data, msg, language_pred):
         "all_word_positions": [],
         "matched_detail": [],
     }
-    for list_no in black_list:
-        name_list = cache_data.get(list_no)
-        if not name_list or not _is_list_active(name_list):
-            continue
-        match_rule = int(name_list["match_rule"])
+    if scope_index is None:
+        scope_index = build_scope_index(black_list, cache_data)
+    scanned = {}
+    # 名单统计：合并扫描的耗时由共享该次扫描的名单平均分摊
+    scan_cost = {}
+    scan_users = {}
+    visited = []
+    hit_lists = set()
+    normalized_pred = {
+        "text": normalize_language(language_pred.get("text")),
+        "nickname": normalize_language(language_pred.get("nickname")),
+    }
+    # 只访问在当前语种下可能生效的名单
+    for i in scope_index.candidates(normalized_pred["text"], normalized_pred["nickname"]):
+        list_no, name_list = scope_index.lists[i]
+        meta = scope_index.metas[i]
+        match_rule = meta.match_rule
+        match_type = meta.match_type
         languages = _get_match_languages(match_rule, language_pred)
+        normalized = _get_match_languages(match_rule, normalized_pred)
         filter_l = ListMatchRuleEnum.enum2filtertext(match_rule, msg)
+        list_visited = False
         for idx, text in enumerate(filter_l):
             text_language = languages[idx] if languages else None
-            if languages and not _language_allowed(name_list, text_language):
+            if languages and not meta.allows(normalized[idx]):
+                continue
+            list_visited = True
+            scan_key = (text, match_type, text_language)
+            hits = scanned.get(scan_key)
+            if hits is None:
+                start = time.perf_counter()
+                tokenized = tokenize_text(text, match_type, text_language, msg.token_cache)
+                hits = scope_index.scan(tokenized, match_type)
+                scan_cost[scan_key] = time.perf_counter() - start
+                scanned[scan_key] = hits
+            scan_users.setdefault(scan_key, []).append(list_no)
+            single_hits = hits.get(list_no)
+            if not single_hits:
                 continue
+            hit_lists.add(list_no)
             single_match_words = []
             single_positions = []
             single_format_words = []
-            for raw_word, filter_word in _iter_ac_matches(
-                name_list["data"], text, name_list["match_type"], text_language
-            ):
+            for raw_word, filter_word in single_hits:
                 single_match_words.append(raw_word)
                 single_format_words.append(filter_word)
-                single_positions.append(list(range(text.find(raw_word), text.find(raw_word) + len(raw_word))))
-            if not single_match_words:
-                continue
+                single_positions.append(_word_positions(text, raw_word, match_rule))
             aggregate["match_rule_list"].append(text)
             aggregate["match_words"].extend(single_match_words)
             aggregate["format_match_words"].extend(single_format_words)
-            aggregate["match_name_list"].append(name_list["name"])
-            aggregate["risk_types"].append(name_list["risk_type"])
+            aggregate["match_name_list"].append(meta.name)
+            aggregate["risk_types"].append(meta.risk_type)
             aggregate["matched_detail"].append(
-                _build_matched_detail_item(
-                    list_no, match_rule, name_list["name"], single_match_words, single_positions
-                )
+                _build_matched_detail_item(list_no, match_rule, meta.name, single_match_words, single_positions)
             )
             for p in single_positions:
                 aggregate["all_word_positions"].extend(p)
+        if list_visited:
+            visited.append(list_no)
+    _record_blacklist_stats(visited, hit_lists, scan_cost, scan_users)
     return aggregate
 
 
+def _record_blacklist_stats(visited, hit_lists, scan_cost, scan_users):
+    shares = {}
+    for scan_key, users in scan_users.items():
+        share = scan_cost[scan_key] / len(users)
+        for list_no in users:
+            shares[list_no] = shares.get(list_no, 0.0) + share
+    for list_no in visited:
+        list_stats.record(list_no, list_no in hit_lists, shares.get(list_no, 0.0))
+
+
 def _build_blacklist_detail(aggregate, msg, detail):
     match_words = aggregate["match_words"]
     if not match_words:
@@ -274,60 +452,6 @@ def _build_blacklist_detail(aggregate, msg, detail):
     return True
 
 
-def _parse_language_codes(raw):
-    if raw is None:
-        return []
-    if isinstance(raw, list):
-        return [str(i).strip().lower() for i in raw if str(i).strip()]
-    if isinstance(raw, str):
-        raw_str = raw.strip()
-        if not raw_str:
-            return []
-        if raw_str.startswith("["):
-            try:
-                parsed = json.loads(raw_str)
-                if isinstance(parsed, list):
-                    return [str(i).strip().lower() for i in parsed if str(i).strip()]
-            except Exception:
-                pass
-        return [str(i).strip().lower() for i in raw_str.split(",") if str(i).strip()]
-    return []
-
-
-def _get_language_scope_and_codes(name_list):
-    scope_raw = name_list.get("language_scope")
-    scope = str(scope_raw).strip().upper() if scope_raw else ""
-    codes = _parse_language_codes(name_list.get("language_codes"))
-    if not scope:
-        legacy = str(name_list.get("language") or "").strip().lower()
-        if legacy and legacy != "all":
-            return ListLanguageScopeEnum.SPECIFIC.value, [legacy]
-        return ListLanguageScopeEnum.ALL.value, []
-    if scope == ListLanguageScopeEnum.SPECIFIC.value:
-        if not codes:
-            legacy = str(name_list.get("language") or "").strip().lower()
-            if legacy and legacy != "all":
-                codes = [legacy]
-        return scope, codes
-    if scope == ListLanguageScopeEnum.ALL.value:
-        return scope, []
-    return ListLanguageScopeEnum.ALL.value, []
-
-
-def _language_allowed(name_list, language_value):
-    scope, codes = _get_language_scope_and_codes(name_list)
-    if not language_value:
-        return scope == ListLanguageScopeEnum.ALL.value
-    lang = str(language_value).strip().lower()
-    if not lang:
-        return scope == ListLanguageScopeEnum.ALL.value
-    if scope == ListLanguageScopeEnum.ALL.value:
-        return True
-    if scope == ListLanguageScopeEnum.SPECIFIC.value and not codes:
-        return False
-    return lang in codes
-
-
 def shumei_swich_is_off(app_channel, ctx, app_id):
     cache_app_channel = ctx.config["APP_CHANNEL"]
     global_k = "AC_{}_all".format(app_id)
@@ -387,12 +511,14 @@ def whitelist_filter(msg, cache_data, white_list, r, detail, language_pred):
         if cache_data.get(i):
             name_list = cache_data.get(i)
             if _is_list_active(name_list):
+                start = time.perf_counter()
                 _, filter_l, results = _collect_match_words(name_list, msg, language_pred)
                 match_words = []
                 format_match_words = []
                 for _, _, raw_words, fmt_words in results:
                     match_words.extend(raw_words)
                     format_match_words.extend(fmt_words)
+                list_stats.record(i, bool(match_words), time.perf_counter() - start)
                 if match_words:
                     detail["contextText"] = ",".join(filter_l)
                     detail["filteredText"] = ",".join(filter_l)
@@ -415,7 +541,10 @@ def ignorelist_filter(msg, cache_data, ignore_list, language_pred):
         if cache_data.get(i):
             name_list = cache_data.get(i)
             if _is_list_active(name_list):
+                start = time.perf_counter()
                 match_rule, _, results = _collect_match_words(name_list, msg, language_pred)
+                list_stats.record(i, any(raw_words for _, _, raw_words, _ in results), time.perf_counter() - start)
+                before = (msg.text, msg.nickname)
                 for idx, (_, _, raw_words, _) in enumerate(results):
                     if not raw_words:
                         continue
@@ -440,12 +569,14 @@ def ignorelist_filter(msg, cache_data, ignore_list, language_pred):
                         for f in raw_words:
                             nickname = nickname.replace(f, "")
                         msg.nickname = nickname
+                if (msg.text, msg.nickname) != before:
+                    msg.reset_token_cache()
     return msg
 
 
 @timer
 def blacklist_filter(
-    msg, cache_data, black_list, r, detail, language_pred, chat_sentinel, ac_switch
+    msg, cache_data, black_list, r, detail, language_pred, chat_sentinel, ac_switch, scope_index=None
 ):
     sentinel_hit, r = _check_chat_sentinel(chat_sentinel, msg, detail, r)
     if sentinel_hit:
@@ -453,7 +584,7 @@ def blacklist_filter(
 
     if not ac_switch:
         return False, r
-    aggregate = _collect_blacklist_hits(black_list, cache_data, msg, language_pred)
+    aggregate = _collect_blacklist_hits(black_list, cache_data, msg, language_pred, scope_index)
     if _build_blacklist_detail(aggregate, msg, detail):
         r["riskLevel"] = "REJECT"
         r["extra"]["desc"] = "命中自定义黑名单"
@@ -500,43 +631,34 @@ def get_white_black_list(msg, cache_app_channel):
     return _dedup(white_list), _dedup(ignore_list), _dedup(black_list)
 
 
-def ai_filter(ctx, msg, blacklist_res, r):
-    ad_res = ad_detect(msg, ctx)
+def _run_ai_filter(ctx, msg, blacklist_res, r):
+    if msg.ai_deferred:
+        msg.set_ai_pending(blacklist_res)
+        return blacklist_res[0], blacklist_res[1]
+    return ai_filter(ctx, msg, blacklist_res, r)
+
+
+def _ad_verdict(ctx, blacklist_res, r, ad_res):
+    """广告模型判定，命中时返回 ((True, r), detail)，否则返回 (None, detail)。"""
     ctx.logger.debug(f"广告模型返回: {ad_res}")
     ad_result = ad_res["data"][0].get("label", None) if ad_res else None
 
     blacklist_flag = blacklist_res[0]
     detail = blacklist_res[1]["detail"] if blacklist_res[1].get("detail", "") else {}
 
-    if blacklist_flag:
-        if ad_result == "REJECT":
-            detail["riskType"] = 310
-            detail["description"] = "广告拉人"
-            detail["descriptionV2"] = "广告拉人"
-            detail["filteredText"] = ""
-            r["detail"] = detail
-            r["riskLevel"] = "REJECT"
-            return True, r
-        llm_ans = get_llm_ans(msg.app_id, msg.text, msg.chat_history)
-        if llm_ans:
-            detail["riskType"] = 310
-            detail["description"] = "广告拉人:卖号"
-            detail["descriptionV2"] = "广告拉人:卖号"
-            detail["filteredText"] = ""
-            r["detail"] = detail
-            r["riskLevel"] = "REJECT"
-            return True, r
-        return True, blacklist_res[1]
-
     if ad_result == "REJECT":
         detail["riskType"] = 310
         detail["description"] = "广告拉人"
         detail["descriptionV2"] = "广告拉人"
+        if blacklist_flag:
+            detail["filteredText"] = ""
         r["detail"] = detail
         r["riskLevel"] = "REJECT"
-        return True, r
+        return (True, r), detail
+    return None, detail
 
-    llm_ans = get_llm_ans(msg.app_id, msg.text, msg.chat_history)
+
+def _llm_verdict(blacklist_res, r, detail, llm_ans):
     if llm_ans:
         detail["riskType"] = 310
         detail["description"] = "广告拉人:卖号"
@@ -545,4 +667,28 @@ def ai_filter(ctx, msg, blacklist_res, r):
         r["detail"] = detail
         r["riskLevel"] = "REJECT"
         return True, r
+    if blacklist_res[0]:
+        return True, blacklist_res[1]
     return False, r
+
+
+def ai_filter(ctx, msg, blacklist_res, r):
+    with stage_timer(msg.stage_timings, "ad_detect"):
+        ad_res = ad_detect(msg, ctx)
+    verdict, detail = _ad_verdict(ctx, blacklist_res, r, ad_res)
+    if verdict:
+        return verdict
+    with stage_timer(msg.stage_timings, "llm"):
+        llm_ans = get_llm_ans(msg.app_id, msg.text, msg.chat_history)
+    return _llm_verdict(blacklist_res, r, detail, llm_ans)
+
+
+async def ai_filter_async(ctx, msg, blacklist_res, r):
+    with stage_timer(msg.stage_timings, "ad_detect"):
+        ad_res = await ad_detect_async(msg, ctx)
+    verdict, detail = _ad_verdict(ctx, blacklist_res, r, ad_res)
+    if verdict:
+        return verdict
+    with stage_timer(msg.stage_timings, "llm"):
+        llm_ans = await get_llm_ans_async(ctx, msg.app_id, msg.text, msg.chat_history)
+    return _llm_verdict(blacklist_res, r, detail, llm_ans)
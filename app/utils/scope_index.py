@@ -0,0 +1,159 @@
+import ahocorasick
+
+from app.utils.enums import ListMatchRuleEnum
+from app.utils.identifier_matcher import IdentifierMatcher
+from app.utils.list_meta import list_meta
+from app.utils.tiered_matcher import TierState, TieredMatcher
+
+
+class ScopeIndex(object):
+    """把一个作用域（AC_{app}_{channel}）下生效的黑名单合并成按匹配类型划分的自动机。
+
+    每个词的 payload 为 ((list_no, risk_type, raw_word, filter_word), ...)，一次扫描即可得到所有名单的命中。
+    同时按语种预先划分可能生效的名单，指定语种的名单不会被其它语种的消息访问到。
+    """
+
+    __slots__ = (
+        "lists",
+        "metas",
+        "sources",
+        "bases",
+        "automatons",
+        "identifiers",
+        "overlays",
+        "tombstones",
+        "partitions",
+        "_candidates",
+    )
+
+    # 每个作用域缓存的 (文本语种, 昵称语种) 组合上限
+    MAX_CANDIDATE_KEYS = 256
+
+    def __init__(self, lists, sources=(), previous=None):
+        # lists: [(list_no, name_list)]，已按名单优先级排好序且均为启用状态
+        metas = [list_meta(name_list) for _, name_list in lists]
+        valid = [i for i, meta in enumerate(metas) if meta.match_rule is not None and meta.match_type is not None]
+        self.lists = [lists[i] for i in valid]
+        self.metas = [metas[i] for i in valid]
+        self.sources = sources
+        # 两级匹配器（TieredMatcher）只合并基础层，增量层与墓碑在扫描时逐名单处理
+        states = [_tier_state(name_list["data"]) for _, name_list in self.lists]
+        self.bases = tuple(state.base for state in states)
+        self.overlays = {}
+        self.tombstones = {}
+        for (list_no, _), meta, state in zip(self.lists, self.metas, states):
+            if state.tombstones:
+                self.tombstones[list_no] = state.tombstones
+            if state.delta is not None:
+                self.overlays.setdefault(meta.match_type, []).append((list_no, state.delta))
+        if previous is not None and previous._same_bases(self):
+            # 只有增量层变化时复用已合并的自动机
+            self.automatons = previous.automatons
+            self.identifiers = previous.identifiers
+            self.partitions = previous.partitions
+            self._candidates = previous._candidates
+            return
+
+        self.automatons = {}
+        self.identifiers = {}
+        grouped = {}
+        grouped_identifiers = {}
+        for (list_no, _), meta, data in zip(self.lists, self.metas, self.bases):
+            if data is None:
+                continue
+            if isinstance(data, IdentifierMatcher):
+                # 标识类名单合并成一个精确匹配表，IP 网段与同名的普通标识分开存放
+                cidr = meta.match_rule == ListMatchRuleEnum.IP.value
+                words = grouped_identifiers.setdefault(meta.match_type, {})
+                for filter_word, value in data.items():
+                    payload = (list_no, meta.risk_type, str(value[1]), str(value[0]))
+                    words.setdefault((filter_word, cidr), []).append(payload)
+                continue
+            words = grouped.setdefault(meta.match_type, {})
+            for filter_word, value in data.items():
+                words.setdefault(filter_word, []).append((list_no, meta.risk_type, str(value[1]), str(value[0])))
+        for match_type, words in grouped.items():
+            actree = ahocorasick.Automaton()
+            for filter_word, payload in words.items():
+                actree.add_word(filter_word, tuple(payload))
+            actree.make_automaton()
+            self.automatons[match_type] = actree
+        for match_type, words in grouped_identifiers.items():
+            matcher = IdentifierMatcher()
+            for (filter_word, cidr), payload in words.items():
+                matcher.add(filter_word, tuple(payload), cidr)
+            self.identifiers[match_type] = matcher.finish()
+
+        # partitions: 语种 -> 该语种下可能生效的名单下标；"" 对应未指定语种或不在任何名单语种中的消息
+        codes = set()
+        for meta in self.metas:
+            codes.update(meta.codes)
+        self.partitions = {}
+        for code in [""] + sorted(codes):
+            self.partitions[code] = tuple(
+                i for i, meta in enumerate(self.metas) if not meta.language_filtered or meta.allows(code)
+            )
+        self._candidates = {}
+
+    def _same_bases(self, other):
+        if len(self.lists) != len(other.lists):
+            return False
+        for i, (list_no, _) in enumerate(self.lists):
+            if list_no != other.lists[i][0] or self.bases[i] is not other.bases[i]:
+                return False
+            if _meta_key(self.metas[i]) != _meta_key(other.metas[i]):
+                return False
+        return True
+
+    def is_fresh(self, sources):
+        if len(sources) != len(self.sources):
+            return False
+        for new, old in zip(sources, self.sources):
+            if new is not old:
+                return False
+        return True
+
+    def candidates(self, text_language, nickname_language):
+        """返回文本 / 昵称语种下需要访问的名单下标（保持名单顺序），语种需已经过 normalize_language。"""
+        key = (text_language, nickname_language)
+        result = self._candidates.get(key)
+        if result is not None:
+            return result
+        text_part = self.partitions.get(text_language, self.partitions[""])
+        if nickname_language == text_language:
+            result = text_part
+        else:
+            nickname_part = self.partitions.get(nickname_language, self.partitions[""])
+            result = tuple(sorted(set(text_part) | set(nickname_part)))
+        if len(self._candidates) < self.MAX_CANDIDATE_KEYS:
+            self._candidates[key] = result
+        return result
+
+    def scan(self, tokenized, match_type):
+        """扫描一次文本，返回 {list_no: [(raw_word, filter_word), ...]}，顺序与单名单自动机一致。"""
+        hits = {}
+        match_type = int(match_type)
+        tombstones = self.tombstones
+        for matcher in (self.automatons.get(match_type), self.identifiers.get(match_type)):
+            if matcher is None:
+                continue
+            for _, payload in matcher.iter(tokenized):
+                for list_no, _, raw_word, filter_word in payload:
+                    if tombstones and filter_word in tombstones.get(list_no, ()):
+                        continue
+                    hits.setdefault(list_no, []).append((raw_word, filter_word))
+        for list_no, delta in self.overlays.get(match_type, ()):
+            for _, value in delta.iter(tokenized):
+                hits.setdefault(list_no, []).append((str(value[1]), str(value[0])))
+        return hits
+
+
+def _tier_state(data):
+    if isinstance(data, TieredMatcher):
+        return data.state
+    return TierState(data or None, None, {}, frozenset(), 0, (), 0)
+
+
+def _meta_key(meta):
+    return meta.match_rule, meta.match_type, meta.risk_type, meta.all_languages, meta.codes
+
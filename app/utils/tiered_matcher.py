@@ -0,0 +1,181 @@
+"""名单的两级匹配器：不可变的基础匹配器 + 近期变更词的小自动机 + 基础匹配器中已失效词的墓碑集合。
+
+应用一次增量只需重建增量层（O(增量)），不再对整个名单重新 make_automaton；增量层超过阈值后在后台线程中
+合并成新的基础匹配器。对外与 ahocorasick.Automaton 的 iter/items 接口一致，payload 为 (filter_word, raw_word)。
+"""
+from __future__ import annotations
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.utils import ahocorasick_utils
+from app.utils.list_delta import OP_ADD, Deltas
+
+# size 为当前生效的词数；tombstones 中的词在 base 中命中时忽略；
+# log 为 base 之后已应用的增量（按版本升序），base_version 为已合并进 base 的最大增量版本
+TierState = namedtuple("TierState", ["base", "delta", "delta_words", "tombstones", "size", "log", "base_version"])
+
+_merge_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="matcher-merge")
+
+
+def _size(matcher) -> int:
+    try:
+        return len(matcher)
+    except TypeError:
+        return 0
+
+
+def _contains(matcher, word) -> bool:
+    exists = getattr(matcher, "exists", None)
+    # 无法判断时按存在处理，多出的墓碑不影响结果
+    return True if exists is None else bool(exists(word))
+
+
+def _items(state: TierState):
+    base, _, delta_words, tombstones, _, _, _ = state
+    if base is not None:
+        for word, payload in base.items():
+            if payload[0] not in tombstones:
+                yield word, payload
+    for filter_word, raw_word in delta_words.items():
+        yield filter_word, (filter_word, raw_word)
+
+
+class _Lineage(object):
+    """经 apply 派生出的匹配器共享：同时只有一个合并任务，完成的合并结果由后续派生的匹配器接续。
+
+    merged 为 (新的基础匹配器, 合并进该匹配器的最大增量版本)。
+    """
+
+    __slots__ = ("merging", "merged")
+
+    def __init__(self):
+        self.merging = False
+        self.merged = None
+
+
+class TieredMatcher(object):
+    __slots__ = ("_state", "match_rule", "match_engine", "_lineage")
+
+    def __init__(
+        self, base=None, match_rule=None, match_engine=None, state: Optional[TierState] = None, lineage=None
+    ):
+        self.match_rule = match_rule
+        self.match_engine = match_engine
+        if state is None:
+            base = base or None
+            state = TierState(base, None, {}, frozenset(), _size(base) if base is not None else 0, (), 0)
+        self._state = state
+        self._lineage = lineage or _Lineage()
+
+    @property
+    def state(self) -> TierState:
+        return self._state
+
+    @property
+    def pending(self) -> int:
+        """增量层大小：新增 / 覆盖的词数加墓碑数。"""
+        state = self._state
+        return len(state.delta_words) + len(state.tombstones)
+
+    def __len__(self):
+        return max(self._state.size, 0)
+
+    def iter(self, text):
+        base, delta, _, tombstones, _, _, _ = self._state
+        if base is not None:
+            if tombstones:
+                for end, payload in base.iter(text):
+                    if payload[0] not in tombstones:
+                        yield end, payload
+            else:
+                yield from base.iter(text)
+        if delta is not None:
+            yield from delta.iter(text)
+
+    def items(self):
+        return _items(self._state)
+
+    def apply(self, deltas: Deltas) -> "TieredMatcher":
+        """返回应用了 deltas 的新匹配器，当前对象不变，正在扫描的请求不受影响。
+
+        派生链上有比当前基础层更新的合并结果时，改为在合并后的基础匹配器上重放其后的增量，
+        合并完成时发起合并的对象即使已被取代，结果也不会丢弃。
+        """
+        state = self._state
+        merged = self._lineage.merged
+        if merged is not None and state.base_version < merged[1] <= (state.log[-1][0] if state.log else 0):
+            base, version = merged
+            rebased = TieredMatcher(
+                match_rule=self.match_rule,
+                match_engine=self.match_engine,
+                state=TierState(base, None, {}, frozenset(), _size(base) if base is not None else 0, (), version),
+                lineage=self._lineage,
+            )
+            return rebased._apply(tuple(i for i in state.log if i[0] > version) + tuple(deltas))
+        return self._apply(deltas)
+
+    def _apply(self, deltas) -> "TieredMatcher":
+        base, _, delta_words, tombstones, size, log, base_version = self._state
+        delta_words = dict(delta_words)
+        tombstones = set(tombstones)
+        for _, ops in deltas:
+            for op in ops:
+                word = op[1]
+                if word in delta_words:
+                    del delta_words[word]
+                    size -= 1
+                elif base is not None and word not in tombstones and _contains(base, word):
+                    tombstones.add(word)
+                    size -= 1
+                if op[0] == OP_ADD:
+                    delta_words[word] = op[2]
+                    size += 1
+        delta = None
+        if delta_words:
+            delta = ahocorasick_utils.build_matcher(list(delta_words.items()), self.match_rule, self.match_engine)
+        state = TierState(base, delta, delta_words, frozenset(tombstones), size, log + tuple(deltas), base_version)
+        return TieredMatcher(match_rule=self.match_rule, match_engine=self.match_engine, state=state, lineage=self._lineage)
+
+    def merge(self) -> bool:
+        """把增量层合并进新的基础匹配器，返回是否产生了合并结果。
+
+        结果记录在派生链上，由之后派生的匹配器接续；当前对象的状态未变时同时原地替换。
+        """
+        state = self._state
+        if not state.log:
+            return False
+        words = [payload for _, payload in _items(state)]
+        base = ahocorasick_utils.build_matcher(words, self.match_rule, self.match_engine) if words else None
+        version = state.log[-1][0]
+        merged = self._lineage.merged
+        if merged is None or merged[1] < version:
+            self._lineage.merged = (base, version)
+        if self._state is state:
+            self._state = TierState(base, None, {}, frozenset(), len(words), (), version)
+        return True
+
+    def merge_async(self):
+        """在后台线程中合并，同一派生链同时只有一个合并任务。"""
+        lineage = self._lineage
+        if lineage.merging:
+            return None
+        lineage.merging = True
+        future = _merge_executor.submit(self.merge)
+        future.add_done_callback(lambda _: setattr(lineage, "merging", False))
+        return future
+
+
+def tiered(matcher, match_rule=None, match_engine=None) -> TieredMatcher:
+    """把已加载的匹配器包装为两级匹配器作为基础层，已是 TieredMatcher 时直接返回。"""
+    if isinstance(matcher, TieredMatcher):
+        return matcher
+    return TieredMatcher(matcher, match_rule, match_engine)
+
+
+def base_matcher(matcher):
+    """ScopeIndex 合并时使用的基础匹配器。"""
+    if isinstance(matcher, TieredMatcher):
+        return matcher.state.base
+    return matcher
@@ -1,3 +1,4 @@
+import re
 import unicodedata
 
 import six
@@ -13,85 +14,44 @@ class AllTokenizer(object):
 
     def tokenize(self, text, drop_prun=True, language=None):
         text = convert_to_unicode(text)
-        text = self._clean_text(text)
         if language == "ja":
-            text = self._tokenize_ja_chars(text)
+            text = self._tokenize_ja_chars(self._clean_text(text))
         else:
-            text = self._tokenize_chinese_chars(text)
+            text = self._translate(text, _CLEAN_CJK_TABLE, _astral_clean)
 
-        orig_tokens = whitespace_tokenize(text)
-        split_tokens = []
-        for token in orig_tokens:
-            if self.do_lower_case:
-                token = token.lower()
-            split_tokens.extend(self._run_split_on_punc(token, drop_prun))
-
-        output_tokens = whitespace_tokenize(" ".join(split_tokens))
+        if self.do_lower_case:
+            text = text.lower()
+        output_tokens = self._run_split_on_punc(text, drop_prun)
         output_text = "\001" + "\001".join(output_tokens) + "\001" if output_tokens else ""
         return output_text
 
     def _run_split_on_punc(self, text, drop_prun):
-        chars = list(text)
-        i = 0
-        start_new_word = True
-        output = []
-        while i < len(chars):
-            char = chars[i]
-            if _is_punctuation(char):
-                if not drop_prun:
-                    output.append([char])
-                start_new_word = True
-            else:
-                if start_new_word:
-                    output.append([])
-                start_new_word = False
-                output[-1].append(char)
-            i += 1
-
-        return ["".join(x) for x in output]
+        if drop_prun:
+            text = self._translate(text, _PUNC_DROP_TABLE, _astral_punc_drop)
+        else:
+            text = self._translate(text, _PUNC_KEEP_TABLE, _astral_punc_keep)
+        return whitespace_tokenize(text)
 
     def _tokenize_chinese_chars(self, text):
-        output = []
-        for char in text:
-            cp = ord(char)
-            if self._is_chinese_char(cp):
-                output.append(" ")
-                output.append(char)
-                output.append(" ")
-            else:
-                output.append(char)
-        return "".join(output)
+        return text.translate(_CJK_TABLE)
 
     def _tokenize_ja_chars(self, text):
         output = [token.surface for token in ja_tokenizer.tokenize(text)]
         return " ".join(output)
 
     def _is_chinese_char(self, cp):
-        if (
-            (cp >= 0x4E00 and cp <= 0xA000)
-            or (cp >= 0x3400 and cp <= 0x4DBF)
-            or (cp >= 0x3040 and cp <= 0x309F)
-            or (cp >= 0x30A0 and cp <= 0x30FF)
-            or (cp >= 0x31F0 and cp <= 0x31FF)
-            or (cp >= 0xAC00 and cp <= 0xD7AF)
-            or (cp >= 0x1100 and cp <= 0x11FF)
-            or (cp >= 0x3130 and cp <= 0x318F)
-            or (cp >= 0x0E00 and cp <= 0x0E7F)
-        ):
-            return True
-        return False
+        return _is_chinese_char(cp)
 
     def _clean_text(self, text):
-        output = []
-        for char in text:
-            cp = ord(char)
-            if cp == 0 or cp == 0xFFFD or _is_control(char):
-                continue
-            if _is_whitespace(char):
-                output.append(" ")
-            else:
-                output.append(char)
-        return "".join(output)
+        return self._translate(text, _CLEAN_TABLE, _astral_clean)
+
+    @staticmethod
+    def _translate(text, table, astral_repl):
+        # 查表只覆盖 BMP，少量 BMP 以外的字符（emoji 等）单独处理
+        text = text.translate(table)
+        if not text.isascii() and _ASTRAL_RE.search(text):
+            text = _ASTRAL_RE.sub(astral_repl, text)
+        return text
 
 
 def convert_to_unicode(text):
@@ -132,6 +92,58 @@ def _is_punctuation(char):
     return cat.startswith("P")
 
 
+def _is_chinese_char(cp):
+    if (
+        (cp >= 0x4E00 and cp <= 0xA000)
+        or (cp >= 0x3400 and cp <= 0x4DBF)
+        or (cp >= 0x3040 and cp <= 0x309F)
+        or (cp >= 0x30A0 and cp <= 0x30FF)
+        or (cp >= 0x31F0 and cp <= 0x31FF)
+        or (cp >= 0xAC00 and cp <= 0xD7AF)
+        or (cp >= 0x1100 and cp <= 0x11FF)
+        or (cp >= 0x3130 and cp <= 0x318F)
+        or (cp >= 0x0E00 and cp <= 0x0E7F)
+    ):
+        return True
+    return False
+
+
+def _build_tables():
+    clean, cjk, punc_drop, punc_keep = {}, {}, {}, {}
+    for cp in range(0x10000):
+        char = chr(cp)
+        if cp == 0 or cp == 0xFFFD or _is_control(char):
+            clean[cp] = None
+        elif _is_whitespace(char):
+            clean[cp] = " "
+        elif _is_chinese_char(cp):
+            cjk[cp] = " " + char + " "
+        if _is_punctuation(char):
+            punc_drop[cp] = " "
+            punc_keep[cp] = " " + char + " "
+    clean_cjk = dict(cjk)
+    clean_cjk.update(clean)
+    return clean, cjk, clean_cjk, punc_drop, punc_keep
+
+
+# 码点分类表：清洗（删除控制字符、统一空白）、中日韩字符切分、标点切分
+_CLEAN_TABLE, _CJK_TABLE, _CLEAN_CJK_TABLE, _PUNC_DROP_TABLE, _PUNC_KEEP_TABLE = _build_tables()
+_ASTRAL_RE = re.compile("[\U00010000-\U0010FFFF]")
+
+
+def _astral_clean(match):
+    return "" if _is_control(match.group()) else match.group()
+
+
+def _astral_punc_drop(match):
+    return " " if _is_punctuation(match.group()) else match.group()
+
+
+def _astral_punc_keep(match):
+    char = match.group()
+    return " " + char + " " if _is_punctuation(char) else char
+
+
 def whitespace_tokenize(text):
     text = text.strip()
     if not text:
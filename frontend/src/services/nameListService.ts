@@ -14,6 +14,7 @@ export interface NameListPayload {
   channel_ids: number[];
   language_scope: "ALL" | "SPECIFIC" | string;
   language_codes: string[];
+  match_engine?: "substring" | "exact" | string;
   username: string;
 }
 
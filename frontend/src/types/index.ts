@@ -45,6 +45,7 @@ export interface NameList {
   status: number;
   scope: "GLOBAL" | "APP" | "APP_CHANNEL" | string;
   language_scope: "ALL" | "SPECIFIC" | string;
+  match_engine?: "substring" | "exact" | string;
   language?: string;
   language_codes?: string[];
   app_ids?: string[];
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.db import Base, init_engine  # noqa: E402
+from app.models.list_detail import ListDetail  # noqa: E402
+from app.services import list_detail_service  # noqa: E402
+from app.services.validators import FormProxy  # noqa: E402
+
+
+def legacy_add_batch(db, name_list, form):
+    """旧实现：逐条 SELECT ... first() 判断是否存在，逐条 db.add。"""
+    new_text = []
+    for text in list(set(form.data.data)):
+        exist = (
+            db.query(ListDetail)
+            .filter(ListDetail.list_no == name_list.no, ListDetail.text == text, ListDetail.delete_time.is_(None))
+            .first()
+        )
+        if exist:
+            continue
+        new_text.append(text)
+        db.add(
+            ListDetail(
+                list_id=name_list.id,
+                list_no=name_list.no,
+                text=text,
+                memo="",
+                create_by=form.username.data,
+                update_by=form.username.data,
+                create_time=datetime.now(),
+                update_time=datetime.now(),
+            )
+        )
+    db.commit()
+    return len(new_text)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="批量新增名单词条：逐条查询插入 vs 集合查询 + 批量插入（不含 Redis 写入）")
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--existing", type=float, default=0.2, help="提交的词条中已存在的比例")
+    parser.add_argument("--db-uri", default="", help="默认使用临时 sqlite 文件")
+    args = parser.parse_args()
+
+    # Redis 写入两种实现都只有一次，这里只比较数据库部分
+    list_detail_service._add_batch_redis_data = lambda ctx, name_list, text_list: None
+    tmp = tempfile.TemporaryDirectory()
+    for size in [int(i) for i in args.sizes.split(",") if i]:
+        results = {}
+        for name, func in (
+            ("legacy", lambda db, nl, form: legacy_add_batch(db, nl, form)),
+            ("bulk", lambda db, nl, form: list_detail_service.add_batch_detail(db, None, nl, form)["inserted"]),
+        ):
+            uri = args.db_uri or f"sqlite:///{tmp.name}/bench_{name}_{size}.db"
+            engine, SessionLocal = init_engine(uri)
+            Base.metadata.drop_all(bind=engine, tables=[ListDetail.__table__])
+            Base.metadata.create_all(bind=engine, tables=[ListDetail.__table__])
+            name_list = SimpleNamespace(id=1, no=f"bench{size}")
+            db = SessionLocal()
+            seeded = int(size * args.existing)
+            db.execute(
+                ListDetail.__table__.insert(),
+                [{"list_id": 1, "list_no": name_list.no, "text": f"w{i}", "memo": ""} for i in range(seeded)],
+            )
+            db.commit()
+            form = FormProxy(list_no=name_list.no, data=[f"w{i}" for i in range(size)], username="bench")
+            start = time.perf_counter()
+            inserted = func(db, name_list, form)
+            results[name] = (time.perf_counter() - start, inserted)
+            db.close()
+            engine.dispose()
+        print(
+            f"words={size} existing={int(size * args.existing)} "
+            + " ".join(f"{name}={cost * 1000:.0f}ms(inserted={n})" for name, (cost, n) in results.items())
+        )
+    tmp.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.cache import load_cache_from_redis  # noqa: E402
+from app.utils.actree_snapshot import dump_snapshot, load_actree  # noqa: E402
+
+
+class LatencyRedis(object):
+    """内存版 Redis，每次网络往返 sleep 一个 RTT；pipeline 整体算一次往返，SCAN 每批 10 个 key。"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.round_trips = 0
+        self.data = {}
+
+    def _trip(self):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+
+    def _type(self, key):
+        value = self.data.get(key)
+        if value is None:
+            return "none"
+        return {dict: "hash", set: "set"}.get(type(value), "string")
+
+    def scan_iter(self, count=10):
+        keys = list(self.data)
+        for i in range(0, len(keys), count):
+            self._trip()
+            yield from keys[i:i + count]
+
+    def type(self, key):
+        self._trip()
+        return self._type(key)
+
+    def hgetall(self, key):
+        self._trip()
+        return dict(self.data.get(key) or {})
+
+    def hmget(self, key, fields):
+        self._trip()
+        return [(self.data.get(key) or {}).get(f) for f in fields]
+
+    def smembers(self, key):
+        self._trip()
+        return set(self.data.get(key) or set())
+
+    def sadd(self, key, *members):
+        self._trip()
+        self.data.setdefault(key, set()).update(members)
+
+    def get(self, key):
+        self._trip()
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self._trip()
+        self.data[key] = str(value)
+
+    def delete(self, key):
+        self._trip()
+        self.data.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+
+class _Pipeline(object):
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def hgetall(self, key):
+        self.commands.append(lambda: dict(self.client.data.get(key) or {}))
+
+    def type(self, key):
+        self.commands.append(lambda: self.client._type(key))
+
+    def execute(self, raise_on_error=True):
+        self.client._trip()
+        return [command() for command in self.commands]
+
+
+def legacy_load(redis_client):
+    """改造前的加载方式：SCAN 全部 key，逐个 TYPE + HGETALL。"""
+    list_data = {}
+    for key in redis_client.scan_iter():
+        if key in {"all_apps", "access_key"} or key.startswith("cache_"):
+            continue
+        if key.startswith("AC_"):
+            redis_client.hgetall(key)
+            continue
+        if redis_client.type(key) != "hash":
+            continue
+        v = redis_client.hgetall(key)
+        v["data"] = load_actree(v.get("data"))
+        list_data[key] = v
+    return list_data
+
+
+def seed(redis_client, num_lists, num_channels):
+    snapshot = dump_snapshot("bench", [("word", "word")])
+    redis_client.data["all_apps"] = {"1001"}
+    redis_client.data["access_key"] = {"1001": "key"}
+    for i in range(num_lists):
+        redis_client.data[f"L{i}"] = {"name": f"L{i}", "status": "1", "match_type": "1", "data": snapshot}
+    for i in range(num_channels):
+        redis_client.data[f"AC_1001_{i}"] = {"1": json.dumps([f"L{i % max(num_lists, 1)}"])}
+    # 其它业务 key（登录态等）同样会被 SCAN 到
+    for i in range(num_lists):
+        redis_client.data[f"refresh:{i}"] = "1"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="缓存冷启动：逐 key 读取 vs 索引 + 流水线批量读取")
+    parser.add_argument("--lists", default="1000,10000,30000")
+    parser.add_argument("--channels", type=int, default=2000)
+    parser.add_argument("--rtt-ms", type=float, default=0.2, help="模拟的单次网络往返耗时")
+    args = parser.parse_args()
+
+    for num_lists in [int(i) for i in args.lists.split(",") if i]:
+        client = LatencyRedis(args.rtt_ms / 1000)
+        seed(client, num_lists, args.channels)
+
+        start = time.perf_counter()
+        legacy_load(client)
+        legacy_cost, legacy_trips = time.perf_counter() - start, client.round_trips
+
+        client.round_trips = 0
+        stats = {}
+        start = time.perf_counter()
+        load_cache_from_redis(client, stats=stats)
+        first_cost, first_trips = time.perf_counter() - start, client.round_trips
+
+        client.round_trips = 0
+        stats = {}
+        start = time.perf_counter()
+        load_cache_from_redis(client, stats=stats)
+        cost, trips = time.perf_counter() - start, client.round_trips
+        print(
+            f"lists={num_lists} channels={args.channels} rtt={args.rtt_ms}ms "
+            f"legacy={legacy_cost * 1000:.0f}ms/{legacy_trips}rt "
+            f"first(scan+backfill)={first_cost * 1000:.0f}ms/{first_trips}rt "
+            f"indexed={cost * 1000:.0f}ms/{trips}rt speedup={legacy_cost / cost:.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils.chat_sentinel import SentinelIndex  # noqa: E402
+
+
+def process_redis_data(data):
+    """旧的展开格式 {f"{app}_{id}": [rule, ...]}，作为 SentinelIndex 的对照实现。"""
+    result = {}
+    if not data:
+        return result
+    for rule, detail_str in data.items():
+        detail = json.loads(detail_str)
+        for app, ids in detail.items():
+            for item in ids:
+                key = f"{app}_{item}"
+                result.setdefault(key, []).append(rule)
+    return result
+
+
+def build_raw_rules(accounts, apps, rules, overlap, seed=7):
+    """生成 HGETALL chat_sentinel_account_id 的结果：每个账号属于一条规则，overlap 比例的账号同时属于第二条规则。"""
+    rng = random.Random(seed)
+    detail = [{} for _ in range(rules)]
+    for i in range(accounts):
+        app_id = str(1000 + i % apps)
+        account_id = f"u{i:09d}"
+        r = rng.randrange(rules)
+        detail[r].setdefault(app_id, []).append(account_id)
+        if rng.random() < overlap:
+            detail[(r + 1) % rules].setdefault(app_id, []).append(account_id)
+    return {f"RULE_{r}": json.dumps(d) for r, d in enumerate(detail)}
+
+
+def measure(func):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    cost = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, cost, current
+
+
+def lookup_ns(func, keys, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for app_id, account_id in keys:
+            func(app_id, account_id)
+    return (time.perf_counter() - start) * 1e9 / (rounds * len(keys))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="策略模型封禁名单：展开字典 vs 增量索引的内存、同步与查询耗时")
+    parser.add_argument("--accounts", type=int, default=1_000_000)
+    parser.add_argument("--apps", type=int, default=10)
+    parser.add_argument("--rules", type=int, default=20)
+    parser.add_argument("--overlap", type=float, default=0.05)
+    parser.add_argument("--changed", type=int, default=1000, help="增量同步时新增到一条规则中的账号数")
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    raw = build_raw_rules(args.accounts, args.apps, args.rules, args.overlap)
+    print(f"accounts={args.accounts} apps={args.apps} rules={args.rules} raw_bytes={sum(len(v) for v in raw.values())}")
+
+    legacy, legacy_cost, legacy_mem = measure(lambda: process_redis_data(raw))
+    print(f"legacy  build={legacy_cost * 1000:.0f}ms memory={legacy_mem / 2**20:.1f}MiB keys={len(legacy)}")
+
+    def build_index():
+        index = SentinelIndex()
+        index.sync(raw)
+        return index
+
+    index, index_cost, index_mem = measure(build_index)
+    # 索引保留的原始 JSON 即 HGETALL 返回的字符串，单独计入
+    raw_mem = sum(sys.getsizeof(v) for v in raw.values())
+    print(
+        f"index   build={index_cost * 1000:.0f}ms memory={index_mem / 2**20:.1f}MiB "
+        f"(+raw {raw_mem / 2**20:.1f}MiB) ids={len(index)}"
+    )
+
+    # 定时同步：内容未变化
+    _, legacy_tick, _ = measure(lambda: process_redis_data(raw))
+    _, index_tick, _ = measure(lambda: index.sync(dict(raw)))
+    print(f"tick unchanged     legacy={legacy_tick * 1000:.0f}ms index={index_tick * 1000:.2f}ms")
+
+    # 定时同步：一条规则新增 changed 个账号
+    changed = dict(raw)
+    detail = json.loads(changed["RULE_0"])
+    detail.setdefault("1000", []).extend(f"n{i:09d}" for i in range(args.changed))
+    changed["RULE_0"] = json.dumps(detail)
+    _, legacy_tick, _ = measure(lambda: process_redis_data(changed))
+    _, index_tick, _ = measure(lambda: index.sync(changed))
+    print(f"tick one rule +{args.changed} legacy={legacy_tick * 1000:.0f}ms index={index_tick * 1000:.0f}ms")
+
+    rng = random.Random(11)
+    hits = [(str(1000 + i % args.apps), f"u{i:09d}") for i in rng.sample(range(args.accounts), args.lookups)]
+    misses = [(app_id, "x" + account_id[1:]) for app_id, account_id in hits]
+    for name, keys in (("hit", hits), ("miss", misses)):
+        legacy_ns = lookup_ns(lambda app_id, account_id: legacy.get(f"{app_id}_{account_id}"), keys, 3)
+        index_ns = lookup_ns(index.get, keys, 3)
+        print(f"lookup {name:<4} legacy={legacy_ns:.0f}ns index={index_ns:.0f}ns")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
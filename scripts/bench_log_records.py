@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.text_service import build_pass_detail  # noqa: E402
+from app.models.chat_msg import ChatMsg  # noqa: E402
+from app.utils import kafka_utils  # noqa: E402
+from app.utils.kafka_utils import build_log_lines, transfor_json, write_hdfs_log  # noqa: E402
+
+
+def sample(i):
+    data_params = {
+        "timestamp": 1700000000 + i,
+        "nickname": "玩家'昵称|",
+        "text": f"加我微信 abc{i} 领福利|\n一起玩",
+        "server_id": "s1",
+        "account_id": f"a{i}",
+        "app_id": "1001",
+        "role_id": "r1",
+        "vip_level": "1",
+        "level": "30",
+        "ip": "127.0.0.1",
+        "channel": "1001_world",
+        "relationship": "",
+        "target_id": "",
+        "request_id": f"req-{i}",
+        "bt_id": f"bt-{i}",
+        "token_id": f"a{i}",
+    }
+    chat_msg = ChatMsg(text=data_params["text"])
+    response = {
+        "status": 0,
+        "code": 1100,
+        "extra": {
+            "server_area": "zh",
+            "language": {"switch": "ON", "predict": {"text": "zh", "nickname": "zh"}, "msg": "success"},
+            "client_ip": "10.0.0.1",
+            "response_time": {"total": 3},
+        },
+        "riskLevel": "PASS",
+        "detail": json.dumps(build_pass_detail(chat_msg), ensure_ascii=False),
+        "score": 0,
+        "requestId": f"req-{i}",
+        "message": "成功",
+    }
+    return data_params, response
+
+
+def legacy(data_params, response):
+    """改造前 submit_kafka 的序列化过程。"""
+    one_row = write_hdfs_log(data_params, response)
+    qp_dict = {"request_data": data_params, "response_data": response, "app_id": str(data_params["app_id"])}
+    query_line = json.dumps(qp_dict, ensure_ascii=False)
+    json_line = json.dumps(transfor_json(data_params, response), ensure_ascii=False)
+    return one_row, query_line, json_line
+
+
+def measure(func, records, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for data_params, response in records:
+            func(data_params, response)
+        best = min(best, time.perf_counter() - start)
+    return best / len(records) * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="请求日志序列化：改造前的多次遍历 vs 单次遍历字段定义")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    records = [sample(i) for i in range(args.records)]
+    for data_params, response in records[:100]:
+        assert build_log_lines(data_params, response) == legacy(data_params, response)
+
+    base = measure(legacy, records, args.rounds)
+    print(f"legacy            {base:.2f}us/record")
+    cost = measure(build_log_lines, records, args.rounds)
+    print(f"single-pass(json) {cost:.2f}us/record speedup={base / cost:.2f}x")
+    if kafka_utils.orjson is not None:
+        cost = measure(lambda d, r: build_log_lines(d, r, "orjson"), records, args.rounds)
+        print(f"single-pass(orjson) {cost:.2f}us/record speedup={base / cost:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
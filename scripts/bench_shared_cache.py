@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import random
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.shared_cache import SharedCacheStore  # noqa: E402
+from app.utils.actree_snapshot import dump_snapshot, load_actree  # noqa: E402
+
+
+def build_lists(total_words: int, num_lists: int, seed: int):
+    rng = random.Random(seed)
+    alphabet = string.ascii_lowercase + "敏感词广告加微信出售账号代练外挂"
+    raw_lists = {}
+    per_list = max(total_words // num_lists, 1)
+    for n in range(num_lists):
+        words = set()
+        while len(words) < per_list:
+            words.add("".join(rng.choice(alphabet) for _ in range(rng.randint(2, 8))))
+        list_no = f"bench_{n}"
+        raw_lists[list_no] = {
+            "name": list_no,
+            "match_rule": "0",
+            "match_type": "1",
+            "risk_type": "300",
+            "status": "1",
+            "data": dump_snapshot(list_no, [(w, w) for w in sorted(words)]),
+        }
+    return raw_lists
+
+
+def memory_kb():
+    """返回 (rss, pss)，单位 KB；PSS 按共享页面在进程间均摊，更能反映多 worker 的真实占用。"""
+    values = {}
+    try:
+        with open("/proc/self/smaps_rollup", "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] in ("Rss:", "Pss:"):
+                    values[parts[0]] = int(parts[1])
+    except OSError:
+        import resource
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss, rss
+    return values.get("Rss:", 0), values.get("Pss:", 0)
+
+
+def worker(mode, raw_lists, directory, ready, done, result):
+    start = time.perf_counter()
+    cache_data = {}
+    if mode == "local":
+        for list_no, v in raw_lists.items():
+            item = dict(v)
+            item["data"] = load_actree(item["data"])
+            cache_data[list_no] = item
+    elif mode == "shared":
+        cache_data = SharedCacheStore(directory).attach()
+    cost = time.perf_counter() - start
+    ready.set()
+    done.wait()
+    rss, pss = memory_kb()
+    result.put((cost, rss, pss, len(cache_data)))
+
+
+def run(mode, raw_lists, directory, workers):
+    # fork 后子进程共享父进程的 raw_lists，baseline 模式给出不加载名单时的占用作为参照
+    ctx = multiprocessing.get_context("fork")
+    result = ctx.Queue()
+    done = ctx.Event()
+    procs = []
+    readies = []
+    for _ in range(workers):
+        ready = ctx.Event()
+        p = ctx.Process(target=worker, args=(mode, raw_lists, directory, ready, done, result))
+        p.start()
+        procs.append(p)
+        readies.append(ready)
+    for ready in readies:
+        ready.wait()
+    done.set()
+    stats = [result.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="共享名单缓存 vs 每个 worker 独立加载：内存与刷新耗时")
+    parser.add_argument("--sizes", default="10000,100000,400000", help="所有名单的总词数")
+    parser.add_argument("--lists", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--dir", default=None, help="共享缓存目录，默认使用临时目录（建议 /dev/shm）")
+    args = parser.parse_args()
+
+    for size in [int(i) for i in args.sizes.split(",") if i]:
+        raw_lists = build_lists(size, args.lists, size)
+        with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+            store = SharedCacheStore(directory)
+            store.try_become_leader()
+            start = time.perf_counter()
+            store.publish(raw_lists, 1)
+            publish_cost = time.perf_counter() - start
+            store.attach()
+
+            # 单个名单变化时的增量发布
+            list_no = next(iter(raw_lists))
+            start = time.perf_counter()
+            store.publish({list_no: raw_lists[list_no]}, 2, store.list_nos())
+            incremental_cost = time.perf_counter() - start
+            store.release()
+
+            for mode in ("baseline", "local", "shared"):
+                stats = run(mode, raw_lists, directory, args.workers)
+                load = max(i[0] for i in stats)
+                rss = sum(i[1] for i in stats) / len(stats)
+                pss = sum(i[2] for i in stats) / len(stats)
+                print(
+                    f"words={size} mode={mode} workers={args.workers} load={load * 1000:.0f}ms "
+                    f"rss_per_worker={rss / 1024:.1f}MB pss_per_worker={pss / 1024:.1f}MB"
+                )
+            print(
+                f"words={size} publish_full={publish_cost * 1000:.0f}ms "
+                f"publish_one_list={incremental_cost * 1000:.0f}ms"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
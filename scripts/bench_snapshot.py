@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import argparse
+import pickle
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils.actree_snapshot import dump_snapshot, load_actree  # noqa: E402
+from app.utils.ahocorasick_utils import build_actree  # noqa: E402
+
+
+def build_words(size: int, seed: int):
+    rng = random.Random(seed)
+    alphabet = string.ascii_lowercase + "敏感词广告加微信出售账号代练外挂"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(alphabet) for _ in range(rng.randint(2, 8))))
+    return [(w, w) for w in sorted(words)]
+
+
+def timed(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        cost = time.perf_counter() - start
+        best = cost if best is None else min(best, cost)
+    return best, result
+
+
+def fetch_cost(args, key, value):
+    """worker 从 Redis 取回 value 的耗时：给定 --redis-url 时实测 GET，否则按 --bandwidth-mbps 估算传输时间。"""
+    if args.redis_url:
+        import redis
+
+        client = redis.Redis.from_url(args.redis_url)
+        client.set(key, value)
+        try:
+            return timed(lambda: client.get(key), args.repeat)[0]
+        finally:
+            client.delete(key)
+    return len(value) * 8 / (args.bandwidth_mbps * 1e6)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="名单快照格式 vs pickle 体积与加载耗时（含从 Redis 取回的耗时）")
+    parser.add_argument("--sizes", default="1000,10000,100000,200000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--bandwidth-mbps", type=float, default=1000, help="未指定 --redis-url 时估算传输耗时的带宽")
+    parser.add_argument("--redis-url", default=None, help="实测 GET 耗时的 Redis，例如 redis://127.0.0.1:6379/15")
+    args = parser.parse_args()
+
+    for size in [int(i) for i in args.sizes.split(",") if i]:
+        words = build_words(size, size)
+        legacy = pickle.dumps(build_actree(words)).decode("latin1")
+        snapshot = dump_snapshot("bench", words)
+        legacy_bytes = legacy.encode("utf-8")
+        legacy_cost, _ = timed(lambda: pickle.loads(legacy.encode("latin1")), args.repeat)
+        snapshot_cost, _ = timed(lambda: load_actree(snapshot), args.repeat)
+        legacy_fetch = fetch_cost(args, "bench_snapshot:pickle", legacy_bytes)
+        snapshot_fetch = fetch_cost(args, "bench_snapshot:acs1", snapshot)
+        print(
+            f"words={size} pickle_bytes={len(legacy_bytes)} snapshot_bytes={len(snapshot)} "
+            f"pickle_load={legacy_cost * 1000:.1f}ms snapshot_load={snapshot_cost * 1000:.1f}ms "
+            f"pickle_fetch={legacy_fetch * 1000:.1f}ms snapshot_fetch={snapshot_fetch * 1000:.1f}ms "
+            f"pickle_total={(legacy_cost + legacy_fetch) * 1000:.1f}ms "
+            f"snapshot_total={(snapshot_cost + snapshot_fetch) * 1000:.1f}ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.models.chat_msg import ChatMsg  # noqa: E402
+from app.services.text_service import build_base_response, handle_text_filter  # noqa: E402
+from app.utils.language_classification import LanguageClassification  # noqa: E402
+from app.utils.match_data_utils import all_filter  # noqa: E402
+
+UPSTREAM_LANG = {"language": {"text": "zh", "nickname": "zh"}}
+UPSTREAM_AD = {"code": 0, "data": [{"label": "PASS"}]}
+
+
+class BlockingSession(object):
+    """模拟 requests.Session：每次调用阻塞 latency 秒。"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def post(self, url, **kwargs):
+        time.sleep(self.latency)
+        body = UPSTREAM_LANG if "lang" in url else UPSTREAM_AD
+        return SimpleNamespace(text=json.dumps(body), json=lambda: body)
+
+
+def build_ctx(latency):
+    async def upstream(request):
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=UPSTREAM_LANG if "lang" in str(request.url) else UPSTREAM_AD)
+
+    logger = logging.getLogger("bench")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    return SimpleNamespace(
+        logger=logger,
+        config={
+            "COUNTRY": "zh",
+            "LANGUAGE_SWITCH": True,
+            "LANGUAGE_CLS_URL": "http://upstream/lang",
+            "AD_DETECT_URL": "http://upstream/ad",
+            "ALL_APPS": ["1001"],
+            "APP_CHANNEL": {"AC_1001_all": {"ai_switch": 1}},
+            "CACHE_DATA": {},
+            "REQUESTS_SESSION": BlockingSession(latency),
+            "HTTP_CLIENT": httpx.AsyncClient(transport=httpx.MockTransport(upstream)),
+        },
+    )
+
+
+def request_data(i):
+    return {
+        "timestamp": 1,
+        "nickname": "nick",
+        "text": f"hello {i}",
+        "server_id": "s1",
+        "account_id": f"a{i}",
+        "app_id": "1001",
+        "role_id": "r1",
+        "vip_level": "1",
+        "level": "1",
+        "ip": "127.0.0.1",
+        "channel": "c1",
+    }
+
+
+async def legacy_handler(raw_data, ctx):
+    """改造前的流程：语种识别、名单匹配与 AI 检测都在事件循环上同步执行。"""
+    r = build_base_response(ctx)
+    msg = ChatMsg()
+    msg.set_attrs(raw_data)
+    msg.channel = f"{msg.app_id}_{msg.channel}"
+    language_pred = LanguageClassification.predict(msg, ctx)
+    language_pred = language_pred.get("language", language_pred)
+    return all_filter(msg, r, ctx, language_pred)
+
+
+async def run(handler, ctx, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await handler(request_data(i), ctx)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+async def main_async(args) -> int:
+    for latency_ms in [float(i) for i in args.latency_ms.split(",") if i]:
+        ctx = build_ctx(latency_ms / 1000)
+        for name, handler in (("blocking", legacy_handler), ("async", handle_text_filter)):
+            cost = await run(handler, ctx, args.requests, args.concurrency)
+            print(
+                f"upstream_latency={latency_ms:.0f}ms mode={name} concurrency={args.concurrency} "
+                f"requests={args.requests} throughput={args.requests / cost:.0f}/s"
+            )
+        await ctx.config["HTTP_CLIENT"].aclose()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="文本检测接口在上游延迟下的并发吞吐：同步阻塞 vs 异步链路")
+    parser.add_argument("--latency-ms", default="5,20,50")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils.ahocorasick_utils import build_actree  # noqa: E402
+from app.utils.list_delta import add_op, remove_op  # noqa: E402
+from app.utils.tiered_matcher import tiered  # noqa: E402
+
+
+def build_words(size: int, seed: int):
+    rng = random.Random(seed)
+    alphabet = string.ascii_lowercase + "敏感词广告加微信出售账号代练外挂"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(alphabet) for _ in range(rng.randint(2, 8))))
+    return [(w, w) for w in sorted(words)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="单词条变更：整体重建自动机 vs 两级匹配器应用增量")
+    parser.add_argument("--sizes", default="10000,100000,200000")
+    parser.add_argument("--changes", type=int, default=100, help="连续应用的单词条变更次数")
+    parser.add_argument("--scan", type=int, default=20000, help="扫描耗时对比的文本条数")
+    args = parser.parse_args()
+
+    for size in [int(i) for i in args.sizes.split(",") if i]:
+        words = build_words(size, size)
+        rng = random.Random(1)
+        changes = []
+        for i in range(args.changes):
+            if i % 2:
+                changes.append((i + 1, [remove_op(words[rng.randrange(size)][0])]))
+            else:
+                changes.append((i + 1, [add_op(f"新词{i}", f"新词{i}")]))
+
+        word_map = dict(words)
+        start = time.perf_counter()
+        for _, ops in changes[:5]:
+            for op in ops:
+                if op[0] == "+":
+                    word_map[op[1]] = op[2]
+                else:
+                    word_map.pop(op[1], None)
+            rebuilt = build_actree(list(word_map.items()))
+        rebuild_ms = (time.perf_counter() - start) * 1000 / 5
+
+        matcher = tiered(build_actree(words))
+        start = time.perf_counter()
+        for change in changes:
+            matcher = matcher.apply([change])
+        apply_ms = (time.perf_counter() - start) * 1000 / len(changes)
+
+        texts = ["".join(rng.choice(words)[0] for _ in range(6)) for _ in range(args.scan)]
+        start = time.perf_counter()
+        for text in texts:
+            for _ in rebuilt.iter(text):
+                pass
+        plain_us = (time.perf_counter() - start) * 1e6 / len(texts)
+        start = time.perf_counter()
+        for text in texts:
+            for _ in matcher.iter(text):
+                pass
+        tiered_us = (time.perf_counter() - start) * 1e6 / len(texts)
+
+        start = time.perf_counter()
+        matcher.merge()
+        merge_ms = (time.perf_counter() - start) * 1000
+        print(
+            f"words={size} rebuild_per_change={rebuild_ms:.1f}ms tiered_apply_per_change={apply_ms:.2f}ms "
+            f"(pending={args.changes}) merge={merge_ms:.0f}ms scan plain={plain_us:.1f}us tiered={tiered_us:.1f}us"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
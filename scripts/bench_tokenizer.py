@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils.tokenizer import AllTokenizer  # noqa: E402
+
+
+SAMPLES = [
+    "加V信:abc123，送钻石!!! 便宜出号，走过路过不要错过",
+    "Hello, World! This is a normal chat message from a player.",
+    "안녕하세요 여러분, 오늘 같이 던전 가실 분?",
+    "ΑΣ.Β ΟΔΟΣ σοφός ŞİŞLİ ＦＵＬＬ　ｗｉｄｔｈ！ 😀👍",
+    "สวัสดีครับ ขายไอดีราคาถูก",
+]
+
+
+def build_corpus(size: int, seed: int):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(SAMPLES) for _ in range(rng.randint(1, 3))) for _ in range(size)]
+
+
+def bench(tokenizer, corpus, language, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            tokenizer.tokenize(text, drop_prun=True, language=language)
+        cost = time.perf_counter() - start
+        best = cost if best is None else min(best, cost)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="AllTokenizer 分词微基准")
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.size, args.seed)
+    chars = sum(len(i) for i in corpus)
+    tokenizer = AllTokenizer()
+    for language in (None, "ja"):
+        cost = bench(tokenizer, corpus if language is None else corpus[: args.size // 10], language, args.repeat)
+        n = len(corpus) if language is None else args.size // 10
+        print(
+            f"language={language or 'default'} texts={n} "
+            f"total={cost * 1000:.1f}ms per_text={cost / n * 1e6:.2f}us "
+            f"chars_per_sec={(chars if language is None else chars / 10) / cost:,.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,13 +2,17 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
+import queue
 import shutil
 import uuid
+from types import SimpleNamespace
 
 import pytest
 from fastapi.testclient import TestClient
 
 from app import main as main_module
+from app.services.cache import APPEND_LIST_DELTA_SCRIPT, BUMP_LIST_VERSION_SCRIPT, RESET_LIST_WORDS_SCRIPT
+from app.utils.list_delta import encode_delta
 
 
 class DummySettings:
@@ -35,6 +39,15 @@ class DummyKafkaLog:
     def write_img(self, msg):
         return None
 
+    def write_batch(self, records, newline=True):
+        return None
+
+    def stats(self):
+        return {}
+
+    def close(self, timeout=None):
+        return None
+
 
 class FakeACTree:
     def __init__(self, wordlist=None):
@@ -56,21 +69,147 @@ class FakeACTree:
         return iter([])
 
 
+class FakePubSub:
+    def __init__(self, redis_client):
+        self._redis = redis_client
+        self._channels = set()
+        self._queue = queue.Queue()
+
+    def subscribe(self, *channels):
+        self._channels.update(channels)
+        if self not in self._redis._subscribers:
+            self._redis._subscribers.append(self)
+
+    def get_message(self, timeout=0):
+        try:
+            if timeout:
+                return self._queue.get(timeout=timeout)
+            return self._queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self):
+        if self in self._redis._subscribers:
+            self._redis._subscribers.remove(self)
+
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self._redis = redis_client
+        self._commands = []
+        self._immediate = False
+
+    def watch(self, *keys):
+        # WATCH 之后到 MULTI 之前命令立即执行
+        self._immediate = True
+
+    def multi(self):
+        self._immediate = False
+
+    def reset(self):
+        self._commands = []
+        self._immediate = False
+
+    def __getattr__(self, name):
+        method = getattr(self._redis, name)
+        if self._immediate:
+            return method
+
+        def queue_command(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue_command
+
+    def execute(self, raise_on_error=True):
+        results = []
+        for method, args, kwargs in self._commands:
+            try:
+                results.append(method(*args, **kwargs))
+            except Exception as err:
+                if raise_on_error:
+                    raise
+                results.append(err)
+        self._commands = []
+        return results
+
+
+def _bump_list_version(redis_client, keys, args):
+    version = redis_client.incr(keys[0])
+    redis_client.hset(keys[1], args[0], version)
+    redis_client.zadd(keys[2], {args[0]: version})
+    redis_client.sadd(keys[3], args[0])
+    return version
+
+
+def _append_list_delta(redis_client, keys, args):
+    version = _bump_list_version(redis_client, keys, args)
+    redis_client.zadd(keys[4], {encode_delta(version, json.loads(args[1])): version})
+    redis_client.sadd(keys[5], args[0])
+    return version
+
+
+def _reset_list_words(redis_client, keys, args):
+    version = _bump_list_version(redis_client, keys, args)
+    if args[1] == "":
+        redis_client.hdel(keys[4], "data")
+    else:
+        redis_client.hset(keys[4], "data", args[1])
+    redis_client.hset(keys[4], "base_version", version)
+    redis_client.delete(keys[5])
+    redis_client.srem(keys[6], args[0])
+    return version
+
+
+# 应用中 Lua 脚本的等价实现，脚本整体执行，不会与其它命令交错
+_SCRIPTS = {
+    BUMP_LIST_VERSION_SCRIPT: _bump_list_version,
+    APPEND_LIST_DELTA_SCRIPT: _append_list_delta,
+    RESET_LIST_WORDS_SCRIPT: _reset_list_words,
+}
+
+
+class FakeScript:
+    def __init__(self, redis_client, script):
+        self._redis = redis_client
+        self._handler = _SCRIPTS[script]
+
+    def __call__(self, keys=None, args=None, client=None):
+        return self._handler(client or self._redis, list(keys or []), list(args or []))
+
+
 class FakeRedis:
     def __init__(self):
         self._sets = {}
         self._hashes = {}
         self._zsets = {}
         self._strings = {}
+        self._subscribers = []
+
+    def publish(self, channel, message):
+        receivers = [sub for sub in list(self._subscribers) if channel in sub._channels]
+        for sub in receivers:
+            sub._queue.put({"type": "message", "channel": channel, "data": message})
+        return len(receivers)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
 
     def smembers(self, key):
         return set(self._sets.get(key, set()))
 
     def sadd(self, key, *members):
-        self._sets.setdefault(key, set()).update(str(m) for m in members)
+        current = self._sets.setdefault(key, set())
+        added = {str(m) for m in members} - current
+        current.update(added)
+        return len(added)
 
     def srem(self, key, member):
-        self._sets.setdefault(key, set()).discard(str(member))
+        current = self._sets.setdefault(key, set())
+        if str(member) not in current:
+            return 0
+        current.discard(str(member))
+        return 1
 
     def hgetall(self, key):
         return dict(self._hashes.get(key, {}))
@@ -78,6 +217,16 @@ class FakeRedis:
     def hget(self, key, field):
         return self._hashes.get(key, {}).get(field)
 
+    def hmget(self, key, keys, *args):
+        fields = list(keys) + list(args) if isinstance(keys, (list, tuple)) else [keys] + list(args)
+        return [self._hashes.get(key, {}).get(field) for field in fields]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def register_script(self, script):
+        return FakeScript(self, script)
+
     def hset(self, key, field=None, value=None, mapping=None, **kwargs):
         if mapping is None:
             mapping = {}
@@ -114,11 +263,36 @@ class FakeRedis:
         filtered.sort(key=lambda item: item[1], reverse=True)
         return [item[0] for item in filtered]
 
+    def zrangebyscore(self, key, min, max):
+        data = self._zsets.get(key, {})
+        filtered = [(member, score) for member, score in data.items() if float(min) <= score <= float(max)]
+        filtered.sort(key=lambda item: item[1])
+        return [item[0] for item in filtered]
+
+    def zcard(self, key):
+        return len(self._zsets.get(key, {}))
+
     def zremrangebyscore(self, key, min, max):
         data = self._zsets.get(key, {})
+        removed = 0
         for member, score in list(data.items()):
             if float(min) <= score <= float(max):
                 data.pop(member, None)
+                removed += 1
+        if not data:
+            self._zsets.pop(key, None)
+        return removed
+
+    def type(self, key):
+        if key in self._hashes:
+            return "hash"
+        if key in self._sets:
+            return "set"
+        if key in self._zsets:
+            return "zset"
+        if key in self._strings:
+            return "string"
+        return "none"
 
     def scan_iter(self):
         keys = set(self._sets.keys()) | set(self._hashes.keys()) | set(self._zsets.keys()) | set(self._strings.keys())
@@ -127,8 +301,11 @@ class FakeRedis:
     def get(self, key):
         return self._strings.get(key)
 
-    def set(self, key, value):
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self._strings:
+            return None
         self._strings[key] = value
+        return True
 
     def incr(self, key, amount=1):
         current = int(self._strings.get(key, 0))
@@ -139,6 +316,9 @@ class FakeRedis:
     def setex(self, key, time, value):
         self._strings[key] = value
 
+    def expire(self, key, time):
+        return self.exists(key)
+
     def delete(self, key):
         removed = 0
         if key in self._strings:
@@ -161,6 +341,27 @@ def fake_redis():
     return FakeRedis()
 
 
+class NullLogger:
+    def debug(self, msg):
+        return None
+
+    info = warning = error = debug
+
+
+@pytest.fixture
+def make_ctx(fake_redis):
+    """不启动应用的 worker 上下文：make_ctx(**config)，REDIS_CLIENT 默认为 fake_redis，本地缓存字段为空。"""
+
+    def factory(**config):
+        config.setdefault("REDIS_CLIENT", fake_redis)
+        config.setdefault("TIME_SEED", 0)
+        config.setdefault("APP_CHANNEL", {})
+        config.setdefault("CACHE_DATA", {})
+        return SimpleNamespace(redis=config["REDIS_CLIENT"], config=config, logger=NullLogger())
+
+    return factory
+
+
 @pytest.fixture
 def tmp_path():
     base = Path.cwd() / ".tmp_tests"
@@ -205,15 +406,12 @@ def client(monkeypatch, tmp_path, fake_redis):
 
     fake_builder = lambda wordlist: FakeACTree(wordlist)
     from app.utils import ahocorasick_utils
-    from app.services import list_detail_service
 
     monkeypatch.setattr(ahocorasick_utils, "build_actree", fake_builder)
-    monkeypatch.setattr(list_detail_service, "build_actree", fake_builder)
 
     app = main_module.create_app()
     with TestClient(app) as test_client:
         ctx = test_client.app.state.ctx
-        ctx.config["BLACK_CLIENT_IP"] = ["1.1.1.1"]
         session = test_client.app.state.SessionLocal()
         try:
             from app.models.user import User
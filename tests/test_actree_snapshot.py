@@ -0,0 +1,33 @@
+import pickle
+
+import pytest
+
+from app.utils.actree_snapshot import SnapshotError, dump_snapshot, load_actree, load_words, read_snapshot
+from app.utils.ahocorasick_utils import build_actree
+
+
+def test_snapshot_round_trip():
+    words = [("\001加\001微\001", "加微"), ("spam", "spam"), ("spam", "SPAM"), ("广告", "广告")]
+    raw = dump_snapshot("list-1", words)
+    assert raw.isascii()
+
+    header, loaded = read_snapshot(raw)
+    assert header["list_no"] == "list-1"
+    assert header["word_count"] == 3
+    assert loaded == [("\001加\001微\001", "加微"), ("spam", "SPAM"), ("广告", "广告")]
+
+    actree = load_actree(raw)
+    assert [v for _, v in actree.iter("xx spam 广告")] == [("spam", "SPAM"), ("广告", "广告")]
+
+
+def test_snapshot_rejects_corruption():
+    raw = dump_snapshot("list-1", [("spam", "spam")])
+    corrupted = raw[:-4] + ("AAAA" if raw[-4:] != "AAAA" else "BBBB")
+    with pytest.raises(SnapshotError):
+        read_snapshot(corrupted)
+
+
+def test_load_legacy_pickle():
+    legacy = pickle.dumps(build_actree([("spam", "spam")])).decode("latin1")
+    assert load_words(legacy) == [("spam", "spam")]
+    assert load_actree("") == ""
@@ -1,4 +1,5 @@
 import json
+import time
 
 
 def test_black_ip_crud(client):
@@ -12,6 +13,66 @@ def test_black_ip_crud(client):
     assert resp.status_code == 200
 
 
+def test_ip_blocklist_cidr_and_exact():
+    from app.utils.ip_blocklist import IPBlocklist
+
+    blocklist = IPBlocklist(["1.1.1.1", "10.0.0.0/8", "192.168.1.7/24", "2001:db8::/32", "bad-ip"])
+    assert blocklist.entries() == ["1.1.1.1", "10.0.0.0/8", "192.168.1.0/24", "2001:db8::/32"]
+    assert blocklist.match("1.1.1.1") == "1.1.1.1"
+    assert blocklist.match("10.200.3.4") == "10.0.0.0/8"
+    assert blocklist.match("192.168.1.99") == "192.168.1.0/24"
+    assert blocklist.match("2001:DB8::1") == "2001:db8::/32"
+    assert blocklist.match("::ffff:10.0.0.1") == "10.0.0.0/8"
+    assert "11.1.1.1" not in blocklist
+    assert "192.168.2.1" not in blocklist
+    assert "testclient" not in blocklist
+
+
+def test_black_ip_shared_via_redis_and_enforced(client, fake_redis):
+    from app.services.cache import BLACK_CLIENT_IP_KEY, apply_cache_events
+    from app.utils.ip_blocklist import IPBlocklist
+
+    ctx = client.app.state.ctx
+    resp = client.post("/blacklisted-ips", json={"ip": "10.1.0.0/16", "username": "tester"})
+    assert resp.status_code == 200
+    # 旧的黑名单文件在首次启动时已导入 Redis
+    assert fake_redis.smembers(BLACK_CLIENT_IP_KEY) == {"1.1.1.1", "10.1.0.0/16"}
+    resp = client.post("/blacklisted-ips", json={"ip": "10.1.2.3/16", "username": "tester"})
+    assert resp.json()["code"] == 1902
+    resp = client.post("/blacklisted-ips", json={"ip": "not-an-ip", "username": "tester"})
+    assert resp.json()["code"] == 1902
+    assert client.get("/blacklisted-ips").json() == ["1.1.1.1", "10.1.0.0/16"]
+
+    payload = {"access_key": "test_key", "ugc_source": "chat", "data": {"app_id": "1001", "text": "hi"}}
+    resp = client.post("/moderation/text", json=payload, headers={"Yz-Client-Ip": "10.1.9.9"})
+    assert resp.status_code == 403
+    assert resp.json()["code"] == 40300
+    resp = client.post("/moderation/images", json=payload, headers={"Yz-Client-Ip": "10.1.9.9"})
+    assert resp.status_code == 403
+    # 只认最右侧（前置代理追加的）一项，调用方伪造的左侧各项不影响判断
+    resp = client.post("/moderation/text", json=payload, headers={"Yz-Client-Ip": "10.1.9.9, 8.8.8.8"})
+    assert resp.status_code != 403
+    resp = client.post("/moderation/text", json=payload, headers={"Yz-Client-Ip": "8.8.8.8, 10.1.9.9"})
+    assert resp.status_code == 403
+    # 配置了可信代理时，直连对端不在其中则忽略该请求头
+    ctx.config["TRUSTED_PROXY_NETS"] = IPBlocklist(["192.168.0.0/16"])
+    resp = client.post("/moderation/text", json=payload, headers={"Yz-Client-Ip": "10.1.9.9"})
+    assert resp.status_code != 403
+    ctx.config["TRUSTED_PROXY_NETS"] = IPBlocklist()
+
+    # 其它 worker 写入后通过事件刷新本地黑名单
+    fake_redis.sadd(BLACK_CLIENT_IP_KEY, "3.3.3.3")
+    fake_redis.incr("black_client_ip_version")
+    apply_cache_events(ctx, [{"type": "black_ip", "version": 0}])
+    assert "3.3.3.3" in ctx.config["IP_BLOCKLIST"]
+
+    resp = client.delete("/blacklisted-ips/10.1.0.0/16")
+    assert resp.status_code == 200
+    assert "10.1.9.9" not in ctx.config["IP_BLOCKLIST"]
+    resp = client.delete("/blacklisted-ips/10.1.0.0/16")
+    assert resp.json()["code"] == 1902
+
+
 def test_base_endpoints(client, fake_redis, monkeypatch):
     from app.api.v1 import base as base_module
 
@@ -33,6 +94,9 @@ def test_base_endpoints(client, fake_redis, monkeypatch):
         "/cache/redis/list-data",
         "/cache/redis/chat-sentinel/accounts",
         "/cache/redis/chat-sentinel/ips",
+        "/cache/load-stats",
+        "/cache/list-stats",
+        "/cache/redis/import",
     ]
     for path in get_paths:
         resp = client.get(path)
@@ -47,10 +111,16 @@ def test_base_endpoints(client, fake_redis, monkeypatch):
         "/cache/apps/refresh-from-db",
         "/cache/redis/pending-app-channels/reset",
         "/cache/redis/pending-list-details/reset",
+        "/cache/redis/key-index/rebuild",
+        "/cache/list-stats/reset",
     ]
     for path in post_paths:
         resp = client.post(path)
         assert resp.status_code == 200
+    deadline = time.time() + 5
+    while client.get("/cache/redis/import").json()["status"] == "running" and time.time() < deadline:
+        time.sleep(0.01)
+    assert client.get("/cache/redis/import").json()["status"] == "done"
 
     resp = client.post("/cache/redis/chat-sentinel/ips/reset", params={"rule": "RULE1"})
     assert resp.status_code == 200
@@ -0,0 +1,177 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from app.core.cache_subscriber import CacheSubscriber
+from app.services import cache as cache_module
+from app.services.cache import (
+    CACHE_EVENT_CHANNEL,
+    apply_cache_events,
+    bump_list_detail_version,
+    mark_app_channel_updated,
+    reset_list_words,
+    update_cache_data,
+)
+from app.utils.actree_snapshot import dump_snapshot, matcher_words
+from app.utils.match_data_utils import get_channel_policy, refresh_scope_indexes, resolve_scope
+
+
+def _put_list(redis_client, list_no, words):
+    redis_client.hset(
+        list_no,
+        mapping={"name": list_no, "match_rule": 0, "match_type": 1, "risk_type": 300, "status": 1,
+                 "data": dump_snapshot(list_no, [(w, w) for w in words])},
+    )
+    return bump_list_detail_version(redis_client, list_no)
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_write_paths_publish_events(fake_redis):
+    sub = fake_redis.pubsub()
+    sub.subscribe(CACHE_EVENT_CHANNEL)
+    version = _put_list(fake_redis, "L1", ["bad"])
+    fake_redis.hset("AC_1001_all", "1", json.dumps(["L1"]))
+    mark_app_channel_updated(fake_redis, "AC_1001_all", "1")
+
+    events = [json.loads(sub.get_message()["data"]) for _ in range(2)]
+    assert events == [
+        {"list_no": "L1", "version": version, "type": "list"},
+        {"key": "AC_1001_all", "field": "1", "type": "app_channel"},
+    ]
+    assert fake_redis.zcount("waiting_update_app_channel_list", 0, time.time() + 1) == 1
+
+
+def test_events_applied_and_poll_skips_loaded_lists(fake_redis, make_ctx, monkeypatch):
+    ctx = make_ctx()
+    _put_list(fake_redis, "L1", ["bad"])
+    fake_redis.hset("AC_1001_all", "1", json.dumps(["L1"]))
+
+    assert apply_cache_events(
+        ctx,
+        [
+            {"type": "list", "list_no": "L1", "version": 1},
+            {"type": "list", "list_no": "L1", "version": 1},
+            {"type": "app_channel", "key": "AC_1001_all", "field": "1"},
+        ],
+    )
+    assert ctx.config["APP_CHANNEL"]["AC_1001_all"]["1"] == ["L1"]
+    loaded = ctx.config["CACHE_DATA"]["L1"]
+    assert loaded["name"] == "L1"
+
+    calls = []
+    original = cache_module.load_actree
+    monkeypatch.setattr(cache_module, "load_actree", lambda raw: calls.append(raw) or original(raw))
+    assert update_cache_data(ctx)
+    assert calls == []
+    assert ctx.config["CACHE_DATA"]["L1"] is loaded
+    assert ctx.config["LIST_DETAIL_VERSION"] == 1
+
+    # 重复的事件不会触发重新加载
+    assert not apply_cache_events(ctx, [{"type": "list", "list_no": "L1", "version": 1}])
+    assert calls == []
+
+
+def test_subscriber_applies_changes(fake_redis, make_ctx):
+    ctx = make_ctx()
+    subscriber = CacheSubscriber(ctx, poll_timeout=0.05)
+    subscriber.start()
+    try:
+        assert _wait_for(lambda: fake_redis._subscribers)
+        _put_list(fake_redis, "L1", ["bad"])
+        fake_redis.hset("AC_1001_all", "1", json.dumps(["L1"]))
+        mark_app_channel_updated(fake_redis, "AC_1001_all", "1")
+        assert _wait_for(lambda: "L1" in ctx.config["CACHE_DATA"])
+        assert _wait_for(lambda: ctx.config["APP_CHANNEL"].get("AC_1001_all", {}).get("1") == ["L1"])
+    finally:
+        subscriber.shutdown()
+    assert not fake_redis._subscribers
+
+
+def test_channel_policy_rebuilt_only_for_changed_scope(fake_redis, make_ctx):
+    ctx = make_ctx()
+    ctx.config["APP_CHANNEL"] = {
+        "AC_all_all": {"1": ["G1"]},
+        "AC_1001_all": {"0": ["W1"], "1": ["L1", "G1"], "ai_switch": 1},
+        "AC_1001_c1": {"1": ["L2"], "ac_switch": 0},
+    }
+    policy = get_channel_policy(ctx, "1001", "1001_c1")
+    assert policy.white_list == ("W1",)
+    assert policy.black_list == ("L2", "L1", "G1")
+    assert policy.ai_switch_on and not policy.ac_switch_on and not policy.shumei_off
+    other = get_channel_policy(ctx, "1002", "1002_c1")
+    assert other.black_list == ("G1",) and other.ac_switch_on
+    assert get_channel_policy(ctx, "1001", "1001_c1") is policy
+
+    fake_redis.hset("AC_1001_c1", "ac_switch", json.dumps(1))
+    assert apply_cache_events(ctx, [{"type": "app_channel", "key": "AC_1001_c1", "field": "ac_switch"}])
+    assert get_channel_policy(ctx, "1001", "1001_c1").ac_switch_on
+    assert get_channel_policy(ctx, "1002", "1002_c1") is other
+
+    fake_redis.hset("AC_all_all", "1", json.dumps(["G2"]))
+    assert apply_cache_events(ctx, [{"type": "app_channel", "key": "AC_all_all", "field": "1"}])
+    assert get_channel_policy(ctx, "1002", "1002_c1").black_list == ("G2",)
+    assert get_channel_policy(ctx, "1001", "1001_c1").black_list == ("L2", "L1", "G1", "G2")
+
+
+def test_scope_index_shared_and_channel_policies_bounded(fake_redis, make_ctx):
+    ctx = make_ctx()
+    ctx.config["CHANNEL_POLICY_CACHE_SIZE"] = 3
+    ctx.config["APP_CHANNEL"] = {"AC_1001_all": {"1": ["L1"]}, "AC_1001_c9": {"1": ["L2"]}}
+    ctx.config["CACHE_DATA"] = {}
+    # 请求中任意的 channel 都落到同一组黑名单，共用一份合并索引
+    indexes = {resolve_scope(ctx, SimpleNamespace(app_id="1001", channel=f"1001_c{i}"))[1] for i in range(5)}
+    assert len(indexes) == 1
+    assert list(ctx.config["SCOPE_INDEX"].keys()) == [("L1",)]
+    assert len(ctx.config["CHANNEL_POLICY"]) == 3
+    assert list(ctx.config["CHANNEL_POLICY"].keys())[0] == ("1001", "1001_c2")
+
+    resolve_scope(ctx, SimpleNamespace(app_id="1001", channel="1001_c9"))
+    assert set(ctx.config["SCOPE_INDEX"].keys()) == {("L1",), ("L2", "L1")}
+    # 不再被任何策略引用的索引在刷新时丢弃
+    ctx.config["CHANNEL_POLICY"].clear()
+    resolve_scope(ctx, SimpleNamespace(app_id="1001", channel="1001_c1"))
+    refresh_scope_indexes(ctx)
+    assert list(ctx.config["SCOPE_INDEX"].keys()) == [("L1",)]
+
+
+def test_poll_and_events_are_serialized(fake_redis, make_ctx, monkeypatch):
+    ctx = make_ctx()
+    _put_list(fake_redis, "L1", ["old"])
+    entered, release = threading.Event(), threading.Event()
+    original = cache_module.read_raw_lists
+
+    def slow_read(*args, **kwargs):
+        raw = original(*args, **kwargs)
+        if not entered.is_set():
+            entered.set()
+            release.wait(2)
+        return raw
+
+    monkeypatch.setattr(cache_module, "read_raw_lists", slow_read)
+    poll = threading.Thread(target=update_cache_data, args=(ctx,))
+    poll.start()
+    assert entered.wait(2)
+
+    # 定时同步已读到旧词表，此时写入新版本并由订阅线程处理
+    version = reset_list_words(fake_redis, "L1", [("new", "new")])
+    done = threading.Event()
+    events = threading.Thread(
+        target=lambda: apply_cache_events(ctx, [{"type": "list", "list_no": "L1", "version": version}]) and done.set()
+    )
+    events.start()
+    assert not done.wait(0.1)
+    release.set()
+    poll.join(2)
+    events.join(2)
+    assert done.is_set()
+    assert matcher_words(ctx.config["CACHE_DATA"]["L1"]["data"]) == {"new": "new"}
+    assert ctx.config["LIST_VERSIONS"]["L1"] == version
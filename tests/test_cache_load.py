@@ -0,0 +1,82 @@
+import json
+from types import SimpleNamespace
+
+from app.services import cache as cache_module
+from app.services.cache import (
+    APP_CHANNEL_KEY_INDEX,
+    LIST_KEY_INDEX,
+    bump_list_detail_version,
+    load_cache_from_redis,
+    update_cache_data,
+)
+from app.utils.actree_snapshot import dump_snapshot
+from app.utils.list_meta import META_KEY
+
+
+def _put_list(redis_client, list_no, words):
+    redis_client.hset(list_no, mapping={"name": list_no, "status": 1, "data": dump_snapshot(list_no, [(w, w) for w in words])})
+
+
+def _seed(redis_client, num_lists):
+    redis_client.sadd("all_apps", "1001")
+    redis_client.hset("access_key", "1001", "key")
+    redis_client.hset("AC_1001_all", "1", json.dumps([f"L{i}" for i in range(num_lists)]))
+    redis_client.hset("AC_1001_all", "swich_shumei", "1")
+    redis_client.set("refresh:abc", "1")
+    redis_client.hset("chat_sentinel_ip", "R1", json.dumps({}))
+    for i in range(num_lists):
+        _put_list(redis_client, f"L{i}", [f"w{i}"])
+
+
+def test_load_backfills_key_index_then_reads_it(fake_redis, monkeypatch):
+    monkeypatch.setattr(cache_module, "LOAD_CHUNK_SIZE", 2)
+    _seed(fake_redis, 5)
+
+    stats = {}
+    all_apps, app_channel, cache_data, access_key = load_cache_from_redis(fake_redis, stats=stats)
+    assert stats["source"] == "scan"
+    assert sorted(cache_data) == [f"L{i}" for i in range(5)]
+    assert app_channel["AC_1001_all"]["1"] == [f"L{i}" for i in range(5)]
+    assert app_channel["AC_1001_all"]["swich_shumei"] == "1"
+    assert all_apps == ["1001"] and access_key == {"1001": "key"}
+    assert fake_redis.smembers(LIST_KEY_INDEX) == {f"L{i}" for i in range(5)}
+    assert fake_redis.smembers(APP_CHANNEL_KEY_INDEX) == {"AC_1001_all"}
+
+    # 索引就绪后不再扫描 keyspace
+    monkeypatch.setattr(fake_redis, "scan_iter", lambda: (_ for _ in ()).throw(AssertionError("scan")))
+    stats = {}
+    _, app_channel_2, cache_data_2, _ = load_cache_from_redis(fake_redis, stats=stats)
+    assert stats["source"] == "index"
+    assert stats["lists"] == 5 and stats["app_channels"] == 1 and stats["keys"] == 6
+    # 5 个名单按 2 个一块读取，再加 1 次作用域
+    assert stats["round_trips"] == 4
+    assert app_channel_2 == app_channel
+    assert sorted(cache_data_2) == sorted(cache_data)
+    assert [v for _, v in cache_data_2["L3"]["data"].items()] == [("w3", "w3")]
+    # 名单元数据在加载时预解析
+    assert cache_data_2["L3"][META_KEY].enabled and cache_data_2["L3"][META_KEY].all_languages
+
+
+def test_write_paths_maintain_key_index(fake_redis):
+    _seed(fake_redis, 1)
+    load_cache_from_redis(fake_redis)
+    _put_list(fake_redis, "NEW", ["x"])
+    bump_list_detail_version(fake_redis, "NEW")
+    _, _, cache_data, _ = load_cache_from_redis(fake_redis)
+    assert "NEW" in cache_data
+
+
+def test_update_reloads_lists_without_per_key_round_trips(fake_redis, monkeypatch):
+    _seed(fake_redis, 3)
+    ctx = SimpleNamespace(config={"REDIS_CLIENT": fake_redis, "TIME_SEED": 0}, logger=None)
+    for i in range(3):
+        bump_list_detail_version(fake_redis, f"L{i}")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("per-key round trip")
+
+    monkeypatch.setattr(fake_redis, "hget", fail)
+    monkeypatch.setattr(fake_redis, "type", fail)
+    assert update_cache_data(ctx)
+    assert sorted(ctx.config["CACHE_DATA"]) == ["L0", "L1", "L2"]
+    assert ctx.config["LIST_DETAIL_VERSION"] == 3
@@ -0,0 +1,121 @@
+import threading
+
+from app.services.cache import LIST_KEY_INDEX, SQL_IMPORT_LOCK
+from app.utils.actree_snapshot import load_words
+from app.utils.cache_sql_data import SqlImportJob, read_sql_detail_data
+from app.utils.list_delta import add_op, decode_deltas, delta_key, encode_delta
+from app.utils.tokenizer import AllTokenizer
+
+
+class _SqlDb:
+    def __init__(self, lists, details, languages=()):
+        self.lists = lists
+        self.details = details
+        self.languages = list(languages)
+        self.streamed = 0
+
+    def select(self, sql, return_dict=False):
+        if "name_list_language" in sql:
+            return self.languages
+        if "name_list" in sql:
+            return self.lists
+        raise AssertionError("list_detail should be streamed")
+
+    def stream(self, sql, return_dict=False):
+        assert "ORDER BY list_no" in sql
+        for row in sorted(self.details, key=lambda d: d["list_no"]):
+            self.streamed += 1
+            yield row
+
+
+def _name_list(no, match_type=1, **kwargs):
+    row = {
+        "no": no,
+        "name": no,
+        "type": 1,
+        "match_rule": 1,
+        "match_type": match_type,
+        "suggest": 1,
+        "risk_type": 300,
+        "status": 1,
+        "language": "",
+        "language_scope": "ALL",
+    }
+    row.update(kwargs)
+    return row
+
+
+def _import(fake_redis, workers):
+    lists = [_name_list("L1"), _name_list("L2", match_type=2), _name_list("L3", language_scope="SPECIFIC")]
+    details = [
+        {"list_no": "L2", "text": "加 微信!"},
+        {"list_no": "L1", "text": "bad"},
+        {"list_no": "L9", "text": "orphan"},
+        {"list_no": "L1", "text": "evil"},
+    ]
+    sql_db = _SqlDb(lists, details, [{"list_no": "L3", "language_code": "EN"}])
+    fake_redis.set("list_detail_version_seq", 7)
+    # 版本 7 已包含在导入的快照中；版本 8 在导入开始后追加，需要保留
+    fake_redis.zadd(delta_key("L1"), {encode_delta(7, [add_op("stale", "stale")]): 7})
+    fake_redis.zadd(delta_key("L1"), {encode_delta(8, [add_op("late", "late")]): 8})
+    job = SqlImportJob(fake_redis)
+    read_sql_detail_data(sql_db, fake_redis, workers=workers, progress=job)
+    assert sql_db.streamed == 4
+    return job
+
+
+def test_import_streams_details_and_writes_snapshots(fake_redis):
+    job = _import(fake_redis, workers=1)
+    assert job.lists_total == 3 and job.lists_done == 3 and job.words == 3
+
+    assert fake_redis.smembers(LIST_KEY_INDEX) == {"L1", "L2", "L3"}
+    assert dict(load_words(fake_redis.hget("L1", "data"))) == {"bad": "bad", "evil": "evil"}
+    semantic = AllTokenizer().tokenize("加 微信!", drop_prun=True)
+    assert dict(load_words(fake_redis.hget("L2", "data"))) == {semantic: "加 微信!"}
+    assert fake_redis.hget("L3", "data") is None
+    assert fake_redis.hget("L3", "language_codes") == '["en"]'
+    assert int(fake_redis.hget("L1", "base_version")) == 7
+    assert decode_deltas(fake_redis.zrangebyscore(delta_key("L1"), "-inf", "+inf")) == [(8, [["+", "late", "late"]])]
+    assert not fake_redis.exists("L9")
+
+
+def test_import_with_process_pool_matches_inline(fake_redis):
+    _import(fake_redis, workers=2)
+    assert dict(load_words(fake_redis.hget("L1", "data"))) == {"bad": "bad", "evil": "evil"}
+    assert fake_redis.hget("L2", "data")
+
+
+def test_import_job_state_is_shared_through_redis(fake_redis):
+    job = SqlImportJob(fake_redis)
+    calls = []
+    started, release = threading.Event(), threading.Event()
+
+    def target(progress, **kwargs):
+        calls.append(kwargs)
+        progress.update(stage="lists", lists_total=2)
+        started.set()
+        release.wait(5)
+        if kwargs.get("fail"):
+            raise RuntimeError("mysql down")
+
+    assert job.start(target, redis_url="r")
+    assert started.wait(5)
+    # 其它 worker 进程：不能重复启动，能查到进度
+    other = SqlImportJob(fake_redis)
+    assert not other.start(target)
+    snapshot = other.snapshot()
+    assert snapshot["status"] == "running" and snapshot["stage"] == "lists" and snapshot["lists_total"] == 2
+    release.set()
+    job.join(5)
+    assert other.snapshot()["status"] == "done" and calls == [{"redis_url": "r"}]
+    assert not fake_redis.exists(SQL_IMPORT_LOCK)
+
+    assert other.start(target, fail=True)
+    other.join(5)
+    snapshot = SqlImportJob(fake_redis).snapshot()
+    assert snapshot["status"] == "failed" and snapshot["error"] == "mysql down"
+    assert snapshot["finished_at"] >= snapshot["started_at"]
+
+    # 运行导入的进程退出后锁过期
+    fake_redis.hset("sql_import_progress", "status", "running")
+    assert SqlImportJob(fake_redis).snapshot()["status"] == "interrupted"
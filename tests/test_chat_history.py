@@ -0,0 +1,94 @@
+import asyncio
+import json
+import time
+
+from app.services.text_service import get_history_chat_async
+from app.utils.chat_history import (
+    ChatHistoryCache,
+    _parse_full,
+    parse_private_history,
+    recent_history,
+)
+
+
+class AsyncStubRedis:
+    def __init__(self, data, delay=0):
+        self.data = data
+        self.delay = delay
+        self.calls = []
+
+    async def mget(self, keys):
+        self.calls.append(list(keys))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return [self.data.get(k) for k in keys]
+
+
+def _doc(private, role_level=10, **channels):
+    return json.dumps(
+        {"role_level": role_level, "chat_content": dict({"PRIVATE": private}, **channels)}, ensure_ascii=False
+    )
+
+
+def test_parse_private_slice_matches_full_parse():
+    now = int(time.time())
+    private = [{"timeline": now - 10, "chat_content": "b"}, {"timeline": now - 20, "chat_content": "a"}]
+    docs = [
+        _doc(private, WORLD=[{"timeline": now, "chat_content": 'say "PRIVATE": [1]'}]),
+        _doc([], **{"私聊频道": private}),
+        _doc(private, role_level=50),
+        _doc(private, WORLD=[{"timeline": now, "chat_content": "x", "role_level": 99}]),
+        json.dumps({"chat_content": {"WORLD": []}}),
+        json.dumps({"role_level": 1}),
+    ]
+    for raw in docs:
+        assert parse_private_history(raw) == _parse_full(raw)
+    entry = parse_private_history(docs[0])
+    assert entry[2] == ("a", "b")
+    assert recent_history(entry, now - 15) == ["b"]
+    assert recent_history(parse_private_history(docs[2]), 0) is None
+    assert parse_private_history(None) == (0, (), ())
+
+
+def test_history_cache_ttl_and_lru():
+    cache = ChatHistoryCache(maxsize=2, ttl=60)
+    cache.put("k1", (1, (), ()))
+    cache.put("k2", (2, (), ()))
+    assert cache.get("k1") == (1, (), ())
+    cache.put("k3", (3, (), ()))
+    assert cache.get("k2") is None
+    assert cache.get("k3") == (3, (), ())
+    expired = ChatHistoryCache(ttl=0.01)
+    expired.put("k", (1, (), ()))
+    time.sleep(0.02)
+    assert expired.get("k") is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_history_fetch_coalesced_cached_and_bounded(make_ctx):
+    now = int(time.time())
+    key = "roleChatContent:2013101:a1:r1"
+    redis_client = AsyncStubRedis({key: _doc([{"timeline": now - 5, "chat_content": "hi"}])})
+    ctx = make_ctx(CHAT_LOG_ASYNC_REDIS_CLIENT=redis_client, CHAT_HISTORY_TIMEOUT=0.5)
+
+    def raw(role_id="r1"):
+        return {"app_id": "2013101", "account_id": "a1", "role_id": role_id, "channel": "2013101_c1", "text": "t"}
+
+    async def run():
+        first = await asyncio.gather(*(get_history_chat_async(raw(r), ctx) for r in ("r1", "r1", "r2")))
+        second = await get_history_chat_async(raw(), ctx)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [item.get("chat_history") for item in first] == [["hi"], ["hi"], None]
+    assert second["chat_history"] == ["hi"]
+    # 并发的三次读取合并为一次 MGET，之后命中本地缓存
+    assert redis_client.calls == [[key, "roleChatContent:2013101:a1:r2"]]
+    stats = ctx.config["CHAT_HISTORY_CACHE"].stats()
+    assert stats["fetches"] == 1 and stats["hits"] == 1
+
+    slow = AsyncStubRedis({key: _doc([{"timeline": now, "chat_content": "hi"}])}, delay=0.2)
+    ctx = make_ctx(CHAT_LOG_ASYNC_REDIS_CLIENT=slow, CHAT_HISTORY_TIMEOUT=0.01)
+    result = asyncio.run(get_history_chat_async(raw(), ctx))
+    assert "chat_history" not in result
+    assert ctx.config["CHAT_HISTORY_CACHE"].stats()["timeouts"] == 1
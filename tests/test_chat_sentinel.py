@@ -0,0 +1,61 @@
+import json
+from types import SimpleNamespace
+
+from app.models.chat_msg import ChatMsg
+from app.services.cache import load_chat_sentinel, reset_chat_sentinel_rule
+from app.utils.match_data_utils import _check_chat_sentinel
+
+
+def _lookup(index, legacy_key):
+    app_id, value = legacy_key.split("_", 1)
+    return index.get(app_id, value)
+
+
+def test_sentinel_index_matches_legacy_expansion(fake_redis):
+    fake_redis.hset("chat_sentinel_account_id", "R1", json.dumps({"1001": ["a1", "a2"], "1002": [7]}))
+    fake_redis.hset("chat_sentinel_account_id", "R2", json.dumps({"1001": ["a2", "a3"]}))
+    fake_redis.hset("chat_sentinel_ip", "IP1", json.dumps({"1001": ["1.1.1.1"]}))
+    sentinel = load_chat_sentinel(fake_redis)
+
+    # 旧的展开格式 {f"{app}_{id}": [rule, ...]}
+    legacy = {"1001_a1": ["R1"], "1001_a2": ["R1", "R2"], "1001_a3": ["R2"], "1002_7": ["R1"]}
+    assert len(sentinel.account_id) == len(legacy)
+    for key, rules in legacy.items():
+        assert _lookup(sentinel.account_id, key) in rules
+    assert sentinel.account_id.get(1002, 7) == "R1"
+    assert sentinel.account_id.get("1001", "a9") is None
+    assert sentinel.ip.get("1001", "1.1.1.1") == "IP1"
+    assert sentinel.stats()["account_id"] == {"rules": 2, "apps": 2, "ids": 4}
+
+
+def test_sentinel_incremental_sync(fake_redis):
+    fake_redis.hset("chat_sentinel_account_id", "R1", json.dumps({"1001": ["a1", "a2"]}))
+    fake_redis.hset("chat_sentinel_account_id", "R2", json.dumps({"1001": ["a2"]}))
+    sentinel = load_chat_sentinel(fake_redis)
+    index = sentinel.account_id
+
+    fake_redis.hset("chat_sentinel_account_id", "R1", json.dumps({"1001": ["a2", "a3"]}))
+    fake_redis.hdel("chat_sentinel_account_id", "R2")
+    assert load_chat_sentinel(fake_redis, sentinel) is sentinel
+    assert index.get("1001", "a1") is None
+    assert index.get("1001", "a2") == "R1"
+    assert index.get("1001", "a3") == "R1"
+    assert index.sync(fake_redis.hgetall("chat_sentinel_account_id")) == 0
+
+    ctx = SimpleNamespace(config={"REDIS_CLIENT": fake_redis, "CHAT_SENTINEL": sentinel})
+    fake_redis.hset("chat_sentinel_account_id", "R1", json.dumps({}))
+    reset_chat_sentinel_rule(ctx, "account_id", "R1")
+    assert not sentinel
+    assert index.apps == {}
+
+
+def test_check_chat_sentinel_uses_index(fake_redis):
+    fake_redis.hset("chat_sentinel_ip", "IP1", json.dumps({"1001": ["1.1.1.1"]}))
+    sentinel = load_chat_sentinel(fake_redis)
+    msg = ChatMsg()
+    msg.set_attrs({"app_id": "1001", "account_id": "a1", "ip": "1.1.1.1", "text": "hi"})
+    r = {"extra": {}}
+    hit, r = _check_chat_sentinel(sentinel, msg, {}, r)
+    assert hit
+    assert r["riskLevel"] == "REJECT"
+    assert r["detail"]["description"] == "策略模型: IP1"
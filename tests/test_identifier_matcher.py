@@ -0,0 +1,102 @@
+from app.models.chat_msg import ChatMsg
+from app.utils.actree_snapshot import dump_snapshot, load_actree
+from app.utils.identifier_matcher import IdentifierMatcher, build_identifier_matcher
+from app.utils.list_meta import attach_list_meta
+from app.utils.match_data_utils import _collect_blacklist_hits
+
+
+def _ip_list(name, words, **extra):
+    v = {
+        "name": name,
+        "match_rule": "3",
+        "match_type": "1",
+        "risk_type": "300",
+        "status": "1",
+        "language_scope": "ALL",
+        "language_codes": "[]",
+        "data": dump_snapshot(name, [(w, w) for w in words]),
+        "match_engine": "exact",
+    }
+    v.update(extra)
+    v["data"] = load_actree(v["data"], v["match_rule"], v.get("match_engine"))
+    return attach_list_meta(v)
+
+
+def test_identifier_matcher_exact_and_cidr():
+    words = ["1.1.1.1", "10.0.0.0/8", "10.1.0.0/16", "2001:db8::/32"]
+    matcher = build_identifier_matcher([(w, w) for w in words], 3)
+    assert len(matcher) == 4
+    assert [v for _, v in matcher.iter("1.1.1.1")] == [("1.1.1.1", "1.1.1.1")]
+    assert list(matcher.iter("11.1.1.10")) == []
+    assert [v[0] for _, v in matcher.iter("10.1.2.3")] == ["10.1.0.0/16", "10.0.0.0/8"]
+    assert [v[0] for _, v in matcher.iter("2001:db8::1")] == ["2001:db8::/32"]
+    assert list(matcher.iter("not-an-ip")) == []
+    assert list(matcher.iter(None)) == []
+
+    # 非 IP 名单中的 "/" 按普通标识处理
+    accounts = build_identifier_matcher([("a/1", "a/1"), ("acc1", "acc1")], 6)
+    assert [v for _, v in accounts.iter("a/1")] == [("a/1", "a/1")]
+    assert list(accounts.iter("acc10")) == []
+
+
+def test_load_actree_selects_engine_by_match_rule():
+    exact = _ip_list("IP1", ["1.1.1.1"])
+    assert isinstance(exact["data"], IdentifierMatcher)
+    legacy = _ip_list("IP2", ["1.1.1.1"], match_engine="substring")
+    assert not isinstance(legacy["data"], IdentifierMatcher)
+    assert [v for _, v in legacy["data"].iter("11.1.1.10")] == [("1.1.1.1", "1.1.1.1")]
+    text = load_actree(dump_snapshot("T1", [("spam", "spam")]), "1", "exact")
+    assert not isinstance(text, IdentifierMatcher)
+    # 未设置 match_engine 的已有名单保持子串匹配
+    default = _ip_list("IP3", ["10.0."], match_engine=None)
+    assert not isinstance(default["data"], IdentifierMatcher)
+    assert [v for _, v in default["data"].iter("10.0.3.4")] == [("10.0.", "10.0.")]
+
+
+def test_scope_index_matches_identifier_lists_exactly():
+    cache_data = {
+        "IP1": _ip_list("IP1", ["1.1.1.1", "10.0.0.0/8"]),
+        "IP2": _ip_list("IP2", ["1.1.1.1"], match_engine="substring"),
+    }
+    msg = ChatMsg()
+    msg.set_attrs({"text": "hi", "nickname": "n", "ip": "10.2.3.4", "app_id": "1001", "channel": "1001_c1"})
+    aggregate = _collect_blacklist_hits(["IP1", "IP2"], cache_data, msg, {"text": "zh", "nickname": "zh"})
+    assert aggregate["match_name_list"] == ["IP1"]
+    assert aggregate["match_words"] == ["10.0.0.0/8"]
+    assert aggregate["all_word_positions"] == list(range(len("10.2.3.4")))
+
+    msg.ip = "11.1.1.10"
+    aggregate = _collect_blacklist_hits(["IP1", "IP2"], cache_data, msg, {"text": "zh", "nickname": "zh"})
+    assert aggregate["match_name_list"] == ["IP2"]
+
+
+def test_name_list_api_sets_match_engine(client, fake_redis):
+    payload = {
+        "name": "IPList",
+        "type": 1,
+        "match_rule": 3,
+        "match_type": 1,
+        "suggest": 1,
+        "risk_type": 300,
+        "status": 1,
+        "language_scope": "ALL",
+        "language_codes": [],
+        "scope": "GLOBAL",
+        "username": "tester",
+    }
+    assert client.post("/name-lists", json=payload).json()["code"] == 0
+    item = next(i for i in client.get("/name-lists").json() if i["name"] == "IPList")
+    assert item["match_engine"] == "substring"
+    assert fake_redis.hget(item["no"], "match_engine") == "substring"
+
+    assert client.put(f"/name-lists/{item['id']}", json=dict(payload, match_engine="EXACT")).json()["code"] == 0
+    assert client.get("/name-lists/IPList").json()["match_engine"] == "exact"
+    assert fake_redis.hget(item["no"], "match_engine") == "exact"
+    # 未传 match_engine 时保持原值
+    assert client.put(f"/name-lists/{item['id']}", json=payload).json()["code"] == 0
+    assert fake_redis.hget(item["no"], "match_engine") == "exact"
+
+    resp = client.post("/name-lists", json=dict(payload, name="TextList", match_rule=1, match_engine="exact"))
+    assert resp.json()["code"] == 1902
+    resp = client.post("/name-lists", json=dict(payload, name="BadList", match_engine="regex"))
+    assert resp.json()["code"] == 1902
@@ -0,0 +1,104 @@
+import threading
+
+from app.core.logging import KafkaLog
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_kafka_log_flushes_on_close(tmp_path):
+    log = KafkaLog(str(tmp_path), flush_interval=60)
+    for i in range(3):
+        log.write_msg(f"m{i}")
+        log.write_json(f"j{i}")
+    log.write_query("q0")
+    log.close()
+
+    assert _read(log.msg_filename) == ["m0", "m1", "m2"]
+    assert _read(log.json_filename) == ["j0", "j1", "j2"]
+    assert _read(log.query_filename) == ["q0"]
+    assert _read(log.img_filename) == []
+    assert log.stats()["written"] == 7
+    # 关闭后写入直接丢弃
+    log.write_msg("late")
+    assert log.stats()["dropped"] == 1
+
+
+def test_kafka_log_flushes_on_batch_size(tmp_path):
+    log = KafkaLog(str(tmp_path), batch_size=4, flush_interval=60)
+    flushed = threading.Event()
+    write_batch = log._write_batch
+
+    def tracking_write_batch(batch):
+        write_batch(batch)
+        flushed.set()
+
+    log._write_batch = tracking_write_batch
+    for i in range(4):
+        log.write_msg(f"m{i}")
+    assert flushed.wait(5)
+    assert _read(log.msg_filename) == ["m0", "m1", "m2", "m3"]
+    log.close()
+
+
+def test_kafka_log_drops_when_queue_full(tmp_path):
+    log = KafkaLog(str(tmp_path), queue_size=2, batch_size=1)
+    entered, release = threading.Event(), threading.Event()
+    write_batch = log._write_batch
+
+    def blocking_write_batch(batch):
+        entered.set()
+        release.wait(5)
+        write_batch(batch)
+
+    log._write_batch = blocking_write_batch
+    log.write_msg("m0")
+    assert entered.wait(5)
+    for i in range(1, 6):
+        log.write_msg(f"m{i}")
+    assert log.stats()["dropped"] == 3
+    release.set()
+    log.close()
+    assert _read(log.msg_filename) == ["m0", "m1", "m2"]
+
+
+def test_kafka_log_close_does_not_hang_on_stuck_writer(tmp_path):
+    log = KafkaLog(str(tmp_path), queue_size=1, batch_size=1)
+    entered, release = threading.Event(), threading.Event()
+    write_batch = log._write_batch
+
+    def blocking_write_batch(batch):
+        entered.set()
+        release.wait(5)
+        write_batch(batch)
+
+    log._write_batch = blocking_write_batch
+    log.write_msg("m0")
+    assert entered.wait(5)
+    log.write_msg("m1")
+    # 队列已满且写线程卡住，结束标记放不进队列时按 timeout 返回
+    closer = threading.Thread(target=log.close, kwargs={"timeout": 0.2})
+    closer.start()
+    closer.join(2)
+    assert not closer.is_alive()
+    log.write_msg("late")
+    assert log.stats()["dropped"] == 1
+    release.set()
+
+
+def test_kafka_log_close_flushes_lines_queued_after_stop(tmp_path):
+    log = KafkaLog(str(tmp_path), flush_interval=60)
+    log.write_msg("m0")
+    put = log._queue.put
+
+    def put_then_race(item, *args, **kwargs):
+        put(item, *args, **kwargs)
+        if item is None:
+            # 模拟 write_msg 已通过 _closed 检查、在结束标记之后入队
+            log._queue.put_nowait(("msg", "m1\n"))
+
+    log._queue.put = put_then_race
+    log.close()
+    assert _read(log.msg_filename) == ["m0", "m1"]
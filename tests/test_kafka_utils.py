@@ -0,0 +1,84 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import kafka_utils
+from app.utils.kafka_utils import build_log_lines, submit_kafka, transfor_json, write_hdfs_log
+
+
+def _sample(i):
+    data_params = {
+        "bt_id": f"bt-{i}",
+        "timestamp": 1700000000 + i,
+        "token_id": "t|1",
+        "nickname": "ni'ck|名\n字",
+        "text": "he'llo|\r\nworld 你好 \"quoted\" \\ \t",
+        "app_id": 1001,
+        "server_id": None,
+        "account_id": "a1",
+        "role_id": "r1",
+        "vip_level": 3,
+        "level": 1.5,
+        "ip": "127.0.0.1",
+        "channel": "1001_c1",
+        "relationship": "",
+        "title": "ti|tle",
+        "nickocr": "o|cr\n",
+        "chat_history": ["x", {"y": 1}],
+        "deviceId": " dev",
+    }
+    if i % 2:
+        data_params.pop("nickname")
+    response = {
+        "status": 0,
+        "code": 1100,
+        "extra": {"language": {"predict": {"text": "zh"}, "msg": "成功"}, "client_ip": "1.2.3.4", "n": [1, 2.0, None]},
+        "riskLevel": "REJECT",
+        "detail": json.dumps({"matchedItem": "广|告", "a": "b"}, ensure_ascii=False),
+        "score": 0,
+        "requestId": f"req-{i}",
+        "message": "成|功",
+    }
+    if i % 3 == 0:
+        response.pop("extra")
+    return data_params, response
+
+
+@pytest.mark.parametrize("i", range(6))
+def test_build_log_lines_matches_legacy_bytes(i):
+    data_params, response = _sample(i)
+    one_row, query_line, json_line = build_log_lines(data_params, response)
+    assert one_row == write_hdfs_log(data_params, response)
+    qp_dict = {"request_data": data_params, "response_data": response, "app_id": str(data_params["app_id"])}
+    assert query_line == json.dumps(qp_dict, ensure_ascii=False)
+    assert json_line == json.dumps(transfor_json(data_params, response), ensure_ascii=False)
+
+
+def test_build_log_lines_orjson_encoder_is_equivalent_json():
+    if kafka_utils.orjson is None:
+        pytest.skip("orjson not installed")
+    data_params, response = _sample(1)
+    one_row, query_line, json_line = build_log_lines(data_params, response, encoder="orjson")
+    assert json.loads(query_line)["response_data"] == response
+    legacy = transfor_json(data_params, response)
+    flat = json.loads(json_line)
+    assert list(flat) == list(legacy)
+    assert json.loads(flat.pop("extra")) == json.loads(legacy.pop("extra"))
+    assert flat == legacy
+    assert one_row.split("|")[0] == "bt-1"
+
+
+def test_submit_kafka_writes_three_lines():
+    lines = {}
+    logger = SimpleNamespace(
+        write_msg=lambda m: lines.setdefault("msg", m),
+        write_query=lambda m: lines.setdefault("query", m),
+        write_json=lambda m: lines.setdefault("json", m),
+    )
+    ctx = SimpleNamespace(kafka_logger=logger, config={}, logger=None)
+    data_params, response = _sample(2)
+    submit_kafka(data_params, response, ctx)
+    assert lines["msg"] == "plat_1001_chatmsg\t" + write_hdfs_log(data_params, response)
+    assert json.loads(lines["json"])["app_id"] == "1001"
+    assert json.loads(lines["query"])["app_id"] == "1001"
@@ -0,0 +1,151 @@
+from types import SimpleNamespace
+
+from app.services import list_detail_service
+from app.services.cache import (
+    LIST_DELTA_PENDING_KEY,
+    append_list_delta,
+    apply_cache_events,
+    compact_list_delta,
+    compact_list_deltas,
+    load_cache_from_redis,
+    read_raw_lists,
+    reset_list_words,
+)
+from app.utils.actree_snapshot import load_words, matcher_words
+from app.utils.list_delta import add_op, delta_key
+from app.utils.tiered_matcher import TieredMatcher
+
+
+def _name_list(list_no="L1"):
+    return SimpleNamespace(
+        no=list_no,
+        name=list_no,
+        _type=1,
+        _match_rule=0,
+        _match_type=1,
+        _suggest=1,
+        _risk_type=300,
+        _status=1,
+        language="",
+    )
+
+
+def _words(redis_client, list_no="L1"):
+    v = read_raw_lists(redis_client, [list_no])[list_no]
+    return dict(load_words(v.get("data"), v.get("deltas")))
+
+
+def test_word_changes_append_deltas_without_rewriting_base(fake_redis, make_ctx):
+    ctx = make_ctx()
+    name_list = _name_list()
+    list_detail_service._add_batch_redis_data(ctx, name_list, ["a", "b", "c"])
+    base = fake_redis.hget("L1", "data")
+    list_detail_service._add_redis_data(ctx, name_list, "d")
+    list_detail_service._remove_redis_word(ctx, name_list, "a")
+    list_detail_service._update_redis_word(ctx, name_list, "b", "e")
+
+    assert fake_redis.hget("L1", "data") == base
+    assert fake_redis.zcard(delta_key("L1")) == 4
+    assert _words(fake_redis) == {"c": "c", "d": "d", "e": "e"}
+    assert fake_redis.smembers(LIST_DELTA_PENDING_KEY) == {"L1"}
+    # 每次变更对应一个版本号
+    assert int(fake_redis.hget("list_detail_version", "L1")) == int(fake_redis.get("list_detail_version_seq"))
+
+
+def test_workers_apply_deltas_incrementally(fake_redis, make_ctx, monkeypatch):
+    ctx = make_ctx()
+    name_list = _name_list()
+    list_detail_service._add_batch_redis_data(ctx, name_list, ["bad", "worse"])
+    ctx.config["CACHE_DATA"] = load_cache_from_redis(fake_redis)[2]
+    assert matcher_words(ctx.config["CACHE_DATA"]["L1"]["data"]) == {"bad": "bad", "worse": "worse"}
+
+    list_detail_service._remove_redis_word(ctx, name_list, "bad")
+    list_detail_service._add_redis_data(ctx, name_list, "awful")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("full reload")
+
+    monkeypatch.setattr(fake_redis, "hgetall", fail)
+    version = int(fake_redis.get("list_detail_version_seq"))
+    assert apply_cache_events(ctx, [{"type": "list", "list_no": "L1", "version": version}])
+    loaded = ctx.config["CACHE_DATA"]["L1"]
+    assert isinstance(loaded["data"], TieredMatcher)
+    assert matcher_words(loaded["data"]) == {"worse": "worse", "awful": "awful"}
+    assert loaded["base_version"] == str(version)
+    assert [v for _, v in loaded["data"].iter("so awful")] == [("awful", "awful")]
+
+
+def test_compaction_folds_deltas_into_base(fake_redis, make_ctx):
+    ctx = make_ctx(LIST_DELTA_COMPACT_SIZE=3)
+    name_list = _name_list()
+    list_detail_service._add_batch_redis_data(ctx, name_list, ["a"])
+    ctx.config["CACHE_DATA"] = load_cache_from_redis(fake_redis)[2]
+    list_detail_service._add_redis_data(ctx, name_list, "b")
+    # 第三条记录触发写入方压缩
+    list_detail_service._remove_redis_word(ctx, name_list, "a")
+    version = int(fake_redis.get("list_detail_version_seq"))
+    assert fake_redis.zcard(delta_key("L1")) == 0
+    assert int(fake_redis.hget("L1", "base_version")) == version
+    assert dict(load_words(fake_redis.hget("L1", "data"))) == {"b": "b"}
+
+    # 本地版本早于压缩后的基础快照时整体重新加载
+    assert apply_cache_events(ctx, [{"type": "list", "list_no": "L1", "version": version}])
+    assert matcher_words(ctx.config["CACHE_DATA"]["L1"]["data"]) == {"b": "b"}
+
+    list_detail_service._add_redis_data(ctx, name_list, "c")
+    assert compact_list_deltas(fake_redis) == 1
+    assert fake_redis.smembers(LIST_DELTA_PENDING_KEY) == set()
+    assert _words(fake_redis) == {"b": "b", "c": "c"}
+    # 锁未过期前其它进程不会重复压缩
+    list_detail_service._add_redis_data(ctx, name_list, "d")
+    assert compact_list_deltas(fake_redis) == 0
+    assert compact_list_delta(fake_redis, "L1")
+
+
+def test_reset_list_words_drops_deltas(fake_redis, make_ctx):
+    ctx = make_ctx()
+    name_list = _name_list()
+    list_detail_service._add_batch_redis_data(ctx, name_list, ["a", "b"])
+    reset_list_words(fake_redis, "L1")
+    assert fake_redis.hget("L1", "data") is None
+    assert fake_redis.zcard(delta_key("L1")) == 0
+    assert _words(fake_redis) == {}
+    list_detail_service._add_redis_data(ctx, name_list, "c")
+    assert _words(fake_redis) == {"c": "c"}
+
+
+def test_interleaved_appends_keep_every_word(fake_redis, make_ctx, monkeypatch):
+    ctx = make_ctx()
+    name_list = _name_list()
+    list_detail_service._add_batch_redis_data(ctx, name_list, ["a"])
+    ctx.config["CACHE_DATA"] = load_cache_from_redis(fake_redis)[2]
+    register_script = fake_redis.register_script
+    interleaved = []
+
+    def racing_register_script(script):
+        run = register_script(script)
+
+        def call(keys=None, args=None, client=None):
+            # 写入方 A 的脚本执行前，写入方 B 完成写入，worker 同步、压缩随后发生
+            if not interleaved:
+                interleaved.append(True)
+                list_detail_service._add_redis_data(ctx, name_list, "b")
+                version = int(fake_redis.get("list_detail_version_seq"))
+                apply_cache_events(ctx, [{"type": "list", "list_no": "L1", "version": version}])
+                compact_list_delta(fake_redis, "L1")
+            return run(keys=keys, args=args, client=client)
+
+        return call
+
+    monkeypatch.setattr(fake_redis, "register_script", racing_register_script)
+    version = append_list_delta(fake_redis, "L1", [add_op("c", "c")])
+    monkeypatch.undo()
+    assert version == int(fake_redis.get("list_detail_version_seq"))
+    # 版本号按生效顺序分配：A 的记录版本大于 B 与压缩后的基础版本
+    assert version > int(fake_redis.hget("L1", "base_version"))
+
+    assert _words(fake_redis) == {"a": "a", "b": "b", "c": "c"}
+    assert apply_cache_events(ctx, [{"type": "list", "list_no": "L1", "version": version}])
+    assert matcher_words(ctx.config["CACHE_DATA"]["L1"]["data"]) == {"a": "a", "b": "b", "c": "c"}
+    assert compact_list_delta(fake_redis, "L1")
+    assert dict(load_words(fake_redis.hget("L1", "data"))) == {"a": "a", "b": "b", "c": "c"}
@@ -0,0 +1,141 @@
+import json
+import logging
+from types import SimpleNamespace
+
+from app.core import log_pipeline as log_pipeline_module
+from app.core.log_pipeline import KafkaProducerSink, LogPipeline, create_log_pipeline
+from app.core.logging import KafkaLog
+from app.utils.kafka_utils import img_log_records, text_log_records
+
+
+class StubProducer:
+    """本地替身 Broker：记录发送到各 topic 的消息。"""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.topics = {}
+        self.flushes = 0
+        self.closed = False
+
+    def send(self, topic, value):
+        self.topics.setdefault(topic, []).append(value.decode("utf-8"))
+
+    def flush(self):
+        self.flushes += 1
+
+    def close(self, timeout=None):
+        self.closed = True
+
+
+def _record(i):
+    data_params = {"app_id": "1001", "bt_id": f"bt-{i}", "text": f"hello {i}"}
+    response = {"code": 1100, "extra": {}, "riskLevel": "PASS", "requestId": f"req-{i}", "message": "成功"}
+    return data_params, response
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_pipeline_writes_batches_to_kafka_log(tmp_path):
+    kafka_log = KafkaLog(str(tmp_path))
+    pipeline = LogPipeline(kafka_log, batch_size=2, flush_interval=60)
+    pipeline.start()
+    for i in range(3):
+        pipeline.submit("text", *_record(i))
+    pipeline.submit("img", *_record(9))
+    pipeline.close()
+    # 管道同步写文件，KafkaLog 自己的写线程与队列不参与
+    assert kafka_log._thread is None and kafka_log.stats()["queued"] == 0
+    kafka_log.close()
+
+    expected = [text_log_records(*_record(i)) for i in range(3)]
+    assert _read(kafka_log.msg_filename) == [lines[0][1] for lines in expected]
+    assert _read(kafka_log.json_filename) == [lines[2][1] for lines in expected]
+    img_lines = img_log_records(*_record(9))
+    assert _read(kafka_log.query_filename) == [lines[1][1] for lines in expected] + [img_lines[0][1]]
+    assert _read(kafka_log.img_filename) == [img_lines[1][1]]
+
+    stats = pipeline.stats()
+    assert stats["submitted"] == 4 and stats["written"] == 11
+    assert stats["batches"] == 2 and stats["queue_depth"] == 0 and stats["dropped"] == 0
+
+
+def test_pipeline_drops_when_queue_full():
+    producer = StubProducer()
+    pipeline = LogPipeline(KafkaProducerSink(producer, {"msg": "m", "query": "q", "json": "j"}), queue_size=2)
+    assert pipeline.submit("text", *_record(0))
+    assert pipeline.submit("text", *_record(1))
+    assert not pipeline.submit("text", *_record(2))
+    assert pipeline.stats()["queue_depth"] == 2 and pipeline.stats()["dropped"] == 1
+
+    pipeline.start()
+    pipeline.close()
+    assert len(producer.topics["m"]) == 2
+    assert not pipeline.submit("text", *_record(3))
+
+
+def test_pipeline_skips_unserializable_records():
+    producer = StubProducer()
+    pipeline = LogPipeline(KafkaProducerSink(producer, {"msg": "m", "query": "q", "json": "j"}))
+    pipeline.start()
+    pipeline.submit("text", {"text": "no app_id"}, {})
+    pipeline.submit("text", *_record(1))
+    pipeline.close()
+    assert pipeline.stats()["errors"] == 1
+    assert producer.topics["m"][0].startswith("plat_1001_chatmsg\t")
+
+
+def test_create_log_pipeline_uses_kafka_producer(monkeypatch):
+    monkeypatch.setattr(log_pipeline_module, "KafkaProducer", StubProducer)
+    ctx = SimpleNamespace(
+        config={"KAFKA_BROKERS": "b1:9092,b2:9092", "KAFKA_TOPIC": "t_msg", "KAFKA_TOPIC_JSON": "t_json"},
+        kafka_logger=None,
+        logger=logging.getLogger("test"),
+    )
+    pipeline = create_log_pipeline(ctx)
+    producer = pipeline.sink.producer
+    assert producer.kwargs["bootstrap_servers"] == ["b1:9092", "b2:9092"]
+    pipeline.start()
+    pipeline.submit("text", *_record(0))
+    pipeline.close()
+    pipeline.sink.close()
+    assert json.loads(producer.topics["t_json"][0])["request_id"] == "bt-0"
+    assert set(producer.topics) == {"t_msg", "plat_chatmsg_query", "t_json"}
+    assert producer.flushes == 1 and producer.closed
+
+
+def test_create_log_pipeline_falls_back_to_files(monkeypatch):
+    monkeypatch.setattr(log_pipeline_module, "KafkaProducer", None)
+    kafka_logger = object()
+    ctx = SimpleNamespace(config={"KAFKA_BROKERS": "b1:9092"}, kafka_logger=kafka_logger, logger=logging.getLogger("test"))
+    assert create_log_pipeline(ctx).sink is kafka_logger
+
+
+def test_text_endpoint_only_enqueues_log(client):
+    ctx = client.app.state.ctx
+    ctx.config["LOG_PIPELINE"].close()
+    ctx.config["LOG_PIPELINE"] = pipeline = LogPipeline(ctx.kafka_logger)
+    payload = {
+        "access_key": "test_key",
+        "ugc_source": "chat",
+        "data": {
+            "timestamp": 1,
+            "token_id": "t1",
+            "nickname": "nick",
+            "text": "hello",
+            "server_id": "s1",
+            "account_id": "a1",
+            "app_id": "1001",
+            "role_id": "r1",
+            "vip_level": "1",
+            "level": "1",
+            "ip": "127.0.0.1",
+            "channel": "c1",
+        },
+    }
+    resp = client.post("/moderation/text", json=payload)
+    assert resp.json()["riskLevel"] == "PASS"
+    # 管道未启动，日志仍在队列中
+    assert pipeline.stats()["queue_depth"] == 1
@@ -0,0 +1,154 @@
+import json
+
+from app.models.chat_msg import ChatMsg
+from app.utils.ahocorasick_utils import build_actree
+from app.utils.match_data_utils import _build_blacklist_detail, _collect_blacklist_hits, tokenize_text
+
+
+def _name_list(name, words, match_rule=0, match_type=1, risk_type=300, **extra):
+    data = [(tokenize_text(w, match_type), w) for w in words]
+    item = {
+        "name": name,
+        "match_rule": match_rule,
+        "match_type": match_type,
+        "risk_type": risk_type,
+        "status": 1,
+        "language_scope": "ALL",
+        "language_codes": "[]",
+        "data": build_actree(data),
+    }
+    item.update(extra)
+    return item
+
+
+def _cache_data():
+    return {
+        "L1": _name_list("List1", ["bad", "worse"]),
+        "L2": _name_list("List2", ["bad", "spam"], match_rule=1, risk_type=200),
+        "L3": _name_list("List3", ["hello world"], match_type=2),
+        "L4": _name_list("List4", ["nick"], match_rule=2, language_scope="SPECIFIC", language_codes='["ko"]'),
+        "L5": _name_list("List5", ["off"], status=0),
+    }
+
+
+def _msg(text, nickname="nick"):
+    msg = ChatMsg()
+    msg.set_attrs({"text": text, "nickname": nickname, "ip": "1.1.1.1", "app_id": "1001", "channel": "1001_c1"})
+    return msg
+
+
+def test_scope_index_hits_all_lists_in_one_scan():
+    cache_data = _cache_data()
+    language_pred = {"text": "zh", "nickname": "zh"}
+    msg = _msg("bad spam, Hello World! worse off")
+    aggregate = _collect_blacklist_hits(["L1", "L2", "L3", "L4", "L5"], cache_data, msg, language_pred)
+
+    assert aggregate["match_name_list"] == ["List1", "List2", "List3"]
+    assert aggregate["match_words"] == ["bad", "worse", "bad", "spam", "hello world"]
+    assert aggregate["risk_types"] == [300, 200, 300]
+
+    detail = {}
+    assert _build_blacklist_detail(aggregate, msg, detail)
+    matched = json.loads(detail["matchedDetail"])
+    assert [item["listId"] for item in matched] == ["L1", "L2", "L3"]
+    assert matched[0]["wordPositions"] == [
+        {"position": "0,1,2", "word": "bad"},
+        {"position": "23,24,25,26,27", "word": "worse"},
+    ]
+    assert detail["hitPosition"].split(",")[:5] == ["-1", "0", "1", "2", "3"]
+
+
+def test_scope_index_respects_language_scope():
+    cache_data = _cache_data()
+    msg = _msg("clean", nickname="nick")
+    aggregate = _collect_blacklist_hits(["L4"], cache_data, msg, {"text": "zh", "nickname": "zh"})
+    assert aggregate["match_words"] == []
+
+    aggregate = _collect_blacklist_hits(["L4"], cache_data, msg, {"text": "zh", "nickname": "ko"})
+    assert aggregate["match_words"] == ["nick"]
+
+
+def test_token_cache_shared_across_passes(monkeypatch):
+    from app.utils import match_data_utils
+
+    cache_data = {
+        "W1": _name_list("White", ["never"], match_type=2),
+        "I1": _name_list("Ignore", ["hello"], match_rule=1, match_type=2),
+        "B1": _name_list("Black", ["world"], match_type=2),
+        "B2": _name_list("Black2", ["planet"], match_type=2),
+    }
+    calls = []
+    original = match_data_utils.tokenizer.tokenize
+
+    def counting_tokenize(text, *args, **kwargs):
+        calls.append(text)
+        return original(text, *args, **kwargs)
+
+    monkeypatch.setattr(match_data_utils.tokenizer, "tokenize", counting_tokenize)
+    language_pred = {"text": "zh", "nickname": "zh"}
+    msg = _msg("hello world", nickname="nick")
+    flag, _ = match_data_utils.whitelist_filter(msg, cache_data, ["W1"], {"extra": {}}, {}, language_pred)
+    assert not flag
+    match_data_utils.ignorelist_filter(msg, cache_data, ["I1"], language_pred)
+    assert msg.text == " world"
+    aggregate = match_data_utils._collect_blacklist_hits(["B1", "B2"], cache_data, msg, language_pred)
+    assert aggregate["match_words"] == ["world"]
+    assert calls == ["hello world", "nick", " world", "nick"]
+
+
+def test_list_stats_count_scans_hits_and_cost(monkeypatch):
+    from app.utils import match_data_utils
+    from app.utils.list_stats import ListStats
+
+    stats = ListStats()
+    monkeypatch.setattr(match_data_utils, "list_stats", stats)
+    cache_data = _cache_data()
+    cache_data["W1"] = _name_list("White", ["never"])
+    language_pred = {"text": "zh", "nickname": "zh"}
+
+    for text in ["bad words", "clean"]:
+        msg = _msg(text)
+        match_data_utils.whitelist_filter(msg, cache_data, ["W1"], {"extra": {}}, {}, language_pred)
+        _collect_blacklist_hits(["L1", "L2", "L3", "L4", "L5"], cache_data, msg, language_pred)
+
+    snapshot = {item["list_no"]: item for item in stats.snapshot(cache_data)["lists"]}
+    assert (snapshot["L1"]["scans"], snapshot["L1"]["hits"]) == (2, 1)
+    assert (snapshot["L2"]["scans"], snapshot["L2"]["hits"]) == (2, 1)
+    assert (snapshot["L3"]["scans"], snapshot["L3"]["hits"]) == (2, 0)
+    assert (snapshot["W1"]["scans"], snapshot["W1"]["hits"]) == (2, 0)
+    # L4 只对韩语昵称生效，L5 已停用，都不会被扫描
+    assert snapshot["L4"]["scans"] == 0 and snapshot["L5"]["scans"] == 0
+    assert snapshot["L1"]["words"] == 2
+    assert snapshot["L1"]["scan_ms_total"] >= 0
+
+    stats.reset()
+    assert all(item["scans"] == 0 for item in stats.snapshot(cache_data)["lists"])
+
+
+def test_scope_index_partitions_lists_by_language(monkeypatch):
+    from app.utils import list_meta as list_meta_module
+    from app.utils.match_data_utils import build_scope_index
+
+    cache_data = {
+        "A": _name_list("All", ["hi"]),
+        "KO": _name_list("Ko", ["hi"], language_scope="SPECIFIC", language_codes='["ko"]'),
+        "JA": _name_list("Ja", ["hi"], match_rule=1, language_scope="SPECIFIC", language_codes="ja, JP"),
+        "LEGACY": _name_list("Legacy", ["hi"], language_scope="", language="ja"),
+        "IP": _name_list("Ip", ["1.1.1.1"], match_rule=3, language_scope="SPECIFIC", language_codes='["ko"]'),
+    }
+    index = build_scope_index(["A", "KO", "JA", "LEGACY", "IP"], cache_data)
+    list_nos = lambda text, nick: [index.lists[i][0] for i in index.candidates(text, nick)]  # noqa: E731
+    assert list_nos("ja", "ja") == ["A", "JA", "LEGACY", "IP"]
+    assert list_nos("ko", "ko") == ["A", "KO", "IP"]
+    assert list_nos("", "") == ["A", "IP"]
+    assert list_nos("en", "en") == ["A", "IP"]
+    assert list_nos("ja", "ko") == ["A", "KO", "JA", "LEGACY", "IP"]
+
+    # 语种配置在加载时已解析，匹配时不再解析
+    monkeypatch.setattr(list_meta_module, "parse_language_codes", lambda raw: 1 / 0)
+    msg = _msg("hi", nickname="hi")
+    language_pred = {"text": "JA", "nickname": "zh"}
+    aggregate = _collect_blacklist_hits(["A", "KO", "JA", "LEGACY", "IP"], cache_data, msg, language_pred, index)
+    # IP 规则不按语种过滤
+    assert aggregate["match_name_list"] == ["All", "All", "Ja", "Legacy", "Ip"]
+    assert aggregate["match_rule_list"] == ["hi", "hi", "hi", "hi", "1.1.1.1"]
@@ -0,0 +1,67 @@
+import json
+
+from app.core.metrics import StageMetrics, stage_timer
+
+
+def test_stage_metrics_render_prometheus_histogram():
+    metrics = StageMetrics(buckets=(0.001, 0.01))
+    metrics.observe_timings({"blacklist": 0.5, "total": 5})
+    metrics.observe("blacklist", 0.02)
+    text = metrics.render()
+    assert "# TYPE yuyan_moderation_stage_seconds histogram" in text
+    lines = text.splitlines()
+    assert 'yuyan_moderation_stage_seconds_bucket{stage="blacklist",le="0.001"} 1' in lines
+    assert 'yuyan_moderation_stage_seconds_bucket{stage="blacklist",le="0.01"} 1' in lines
+    assert 'yuyan_moderation_stage_seconds_bucket{stage="blacklist",le="+Inf"} 2' in lines
+    assert 'yuyan_moderation_stage_seconds_count{stage="blacklist"} 2' in lines
+    assert 'yuyan_moderation_stage_seconds_bucket{stage="total",le="0.01"} 1' in lines
+    # 按链路顺序输出
+    assert text.index('stage="blacklist"') < text.index('stage="total"')
+
+
+def test_stage_timer_accumulates():
+    timings = {}
+    with stage_timer(timings, "validate"):
+        pass
+    first = timings["validate"]
+    with stage_timer(timings, "validate"):
+        pass
+    assert timings["validate"] >= first
+    with stage_timer(None, "validate"):
+        pass
+
+
+def test_text_filter_records_stage_timings(client):
+    ctx = client.app.state.ctx
+    ctx.config["RESPONSE_STAGE_TIMINGS"] = True
+    payload = {
+        "access_key": "test_key",
+        "ugc_source": "chat",
+        "data": json.dumps(
+            {
+                "timestamp": 1,
+                "token_id": "t1",
+                "nickname": "nick",
+                "text": "hello",
+                "server_id": "s1",
+                "account_id": "a1",
+                "app_id": "1001",
+                "role_id": "r1",
+                "vip_level": "1",
+                "level": "1",
+                "ip": "127.0.0.1",
+                "channel": "c1",
+            }
+        ),
+    }
+    resp = client.post("/moderation/text", json=payload)
+    response_time = resp.json()["extra"]["response_time"]
+    assert isinstance(response_time["total"], int)
+    for stage in ("validate", "process_msg_data", "history", "whitelist", "ignorelist", "blacklist"):
+        assert response_time[stage] >= 0
+
+    text = client.get("/metrics").text
+    assert 'yuyan_moderation_stage_seconds_count{stage="blacklist"} 1' in text
+    assert 'yuyan_moderation_stage_seconds_count{stage="total"} 1' in text
+    assert 'yuyan_moderation_stage_seconds_count{stage="kafka_submit"} 1' in text
+    assert "yuyan_log_pipeline_submitted_total 1.0" in text
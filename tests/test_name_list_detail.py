@@ -75,3 +75,83 @@ def test_name_list_and_detail(client):
 
     resp = client.delete(f"/name-lists/{list_id}")
     assert resp.status_code == 200
+
+
+def test_batch_detail_bulk_insert(client, fake_redis, monkeypatch):
+    from app.models.list_detail import ListDetail
+    from app.services import list_detail_service
+    from app.utils.list_delta import delta_key
+
+    monkeypatch.setattr(list_detail_service, "BATCH_CHUNK_SIZE", 2)
+    create_payload = {
+        "name": "List4002",
+        "type": 1,
+        "match_rule": 1,
+        "match_type": 1,
+        "suggest": 1,
+        "risk_type": 300,
+        "status": 1,
+        "language_scope": "ALL",
+        "language_codes": [],
+        "scope": "GLOBAL",
+        "username": "tester",
+    }
+    assert client.post("/name-lists", json=create_payload).status_code == 200
+    list_no = next(item["no"] for item in client.get("/name-lists").json() if item["name"] == "List4002")
+    client.post("/list-details", json={"list_no": list_no, "text": "w1", "username": "tester", "memo": ""})
+    deltas = fake_redis.zcard(delta_key(list_no))
+
+    resp = client.post(
+        "/list-details/batch",
+        json={"list_no": list_no, "data": ["w1", "w2", "w3", "w2", "w4", "w5"], "username": "tester"},
+    )
+    assert resp.status_code == 200
+    assert resp.json()["data"] == {"inserted": 4, "skipped": 2}
+    # 整批只追加一条增量记录
+    assert fake_redis.zcard(delta_key(list_no)) == deltas + 1
+
+    db = client.app.state.SessionLocal()
+    texts = sorted(i.text for i in db.query(ListDetail).filter(ListDetail.list_no == list_no).all())
+    db.close()
+    assert texts == ["w1", "w2", "w3", "w4", "w5"]
+
+    # 批量删除：一条增量记录、一次版本递增
+    db = client.app.state.SessionLocal()
+    ids = [i.id for i in db.query(ListDetail).filter(ListDetail.list_no == list_no, ListDetail.text != "w5").all()]
+    db.close()
+    version = int(fake_redis.get("list_detail_version_seq"))
+    resp = client.request("DELETE", "/list-details/batch", json={"ids": ids, "username": "tester"})
+    assert resp.status_code == 200
+    assert resp.json()["data"] == {"deleted": 4}
+    assert int(fake_redis.get("list_detail_version_seq")) == version + 1
+    assert fake_redis.zcard(delta_key(list_no)) == deltas + 2
+
+    db = client.app.state.SessionLocal()
+    rows = db.query(ListDetail).filter(ListDetail.list_no == list_no).all()
+    db.close()
+    assert sorted(i.text for i in rows if i.delete_time is None) == ["w5"]
+    assert {i.delete_by for i in rows if i.delete_time is not None} == {"tester"}
+    resp = client.request("DELETE", "/list-details/batch", json={"ids": ids, "username": "tester"})
+    assert resp.json()["code"] == 1902
+
+
+def test_batch_detail_dedup_follows_column_collation():
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import Session
+
+    from app.services.list_detail_service import _new_texts
+
+    # 用 NOCASE 模拟 MySQL 上 text 列不区分大小写的排序规则：是否已存在由数据库判断
+    engine = create_engine("sqlite://")
+    with Session(engine) as db:
+        db.execute(
+            text(
+                "CREATE TABLE list_detail (id INTEGER PRIMARY KEY, list_no VARCHAR(100), "
+                "text VARCHAR(100) COLLATE NOCASE, delete_time DATETIME)"
+            )
+        )
+        db.execute(text("INSERT INTO list_detail (list_no, text) VALUES ('L1', 'ABC'), ('L2', 'xyz')"))
+        db.execute(text("INSERT INTO list_detail (list_no, text, delete_time) VALUES ('L1', 'gone', '2024-01-01')"))
+        assert _new_texts(db, "L1", ["xyz", "abc", "gone", "new", "xyz", "Abc"]) == ["xyz", "gone", "new"]
+        # 临时表用完即删，同一连接可以再次调用
+        assert _new_texts(db, "L1", ["abc"]) == []
@@ -0,0 +1,164 @@
+import gc
+
+import pytest
+
+from app.models.chat_msg import ChatMsg
+from app.services.cache import bump_list_detail_version, init_shared_cache, sync_shared_cache
+from app.services.shared_cache import MappedMatcher, SharedCacheStore
+from app.utils.actree_snapshot import dump_snapshot, load_actree
+from app.utils.match_data_utils import _collect_blacklist_hits, tokenize_text
+
+
+def _put_list(redis_client, list_no, name, words):
+    redis_client.hset(
+        list_no,
+        mapping={
+            "name": name,
+            "match_rule": 0,
+            "match_type": 1,
+            "risk_type": 300,
+            "status": 1,
+            "language_scope": "ALL",
+            "language_codes": "[]",
+            "data": dump_snapshot(list_no, [(tokenize_text(w, 1), w) for w in words]),
+        },
+    )
+    bump_list_detail_version(redis_client, list_no)
+
+
+def _msg(text):
+    msg = ChatMsg()
+    msg.set_attrs({"text": text, "nickname": "", "ip": "1.1.1.1", "app_id": "1001", "channel": "1001_c1"})
+    return msg
+
+
+def test_shared_cache_matches_local_cache(fake_redis, tmp_path, make_ctx):
+    _put_list(fake_redis, "L1", "List1", ["bad", "worse", "坏人"])
+    _put_list(fake_redis, "L2", "List2", ["spam"])
+    _put_list(fake_redis, "L3", "Empty", [])
+
+    leader = make_ctx(SHARED_CACHE_DIR=str(tmp_path))
+    worker = make_ctx(SHARED_CACHE_DIR=str(tmp_path))
+    assert init_shared_cache(leader, fake_redis)
+    assert init_shared_cache(worker, fake_redis, timeout=0)
+    assert leader.config["SHARED_CACHE"].is_leader
+    assert not worker.config["SHARED_CACHE"].is_leader
+    assert worker.config["LIST_DETAIL_VERSION"] == 3
+
+    cache_data = worker.config["CACHE_DATA"]
+    assert isinstance(cache_data["L1"]["data"], MappedMatcher)
+    assert cache_data["L3"]["data"] == ""
+    assert cache_data["L2"]["name"] == "List2"
+
+    local = {k: dict(fake_redis.hgetall(k), data=load_actree(fake_redis.hget(k, "data"))) for k in ("L1", "L2", "L3")}
+    language_pred = {"text": "zh", "nickname": "zh"}
+    msg = _msg("bad spam 坏人 worse")
+    expected = _collect_blacklist_hits(["L1", "L2", "L3"], local, msg, language_pred)
+    actual = _collect_blacklist_hits(["L1", "L2", "L3"], cache_data, _msg("bad spam 坏人 worse"), language_pred)
+    assert actual == expected
+    assert actual["match_words"] == ["bad", "坏人", "worse", "spam"]
+    leader.config["SHARED_CACHE"].release()
+
+
+def test_shared_cache_incremental_publish(fake_redis, tmp_path, make_ctx):
+    _put_list(fake_redis, "L1", "List1", ["bad"])
+    _put_list(fake_redis, "L2", "List2", ["spam"])
+    leader = make_ctx(SHARED_CACHE_DIR=str(tmp_path))
+    worker = make_ctx(SHARED_CACHE_DIR=str(tmp_path))
+    assert init_shared_cache(leader, fake_redis)
+    assert init_shared_cache(worker, fake_redis, timeout=0)
+    before = worker.config["CACHE_DATA"]
+    generation = worker.config["SHARED_CACHE"].generation
+
+    # worker 不是 leader，没有新 generation 时不替换
+    assert not sync_shared_cache(worker, worker.config["SHARED_CACHE"])
+
+    _put_list(fake_redis, "L2", "List2", ["spam", "scam"])
+    assert sync_shared_cache(leader, leader.config["SHARED_CACHE"])
+    assert sync_shared_cache(worker, worker.config["SHARED_CACHE"])
+    after = worker.config["CACHE_DATA"]
+    assert worker.config["SHARED_CACHE"].generation == generation + 1
+    assert worker.config["LIST_DETAIL_VERSION"] == 3
+    assert after is not before
+    # 未变化的名单沿用原对象，变化的名单重建
+    assert after["L1"] is before["L1"]
+    assert after["L2"] is not before["L2"]
+    assert after["L2"]["data"].automaton is not before["L2"]["data"].automaton
+    assert sorted(w for w, _ in after["L2"]["data"].items()) == ["scam", "spam"]
+    assert [v for _, v in after["L1"]["data"].iter(tokenize_text("so bad", 1))] == [("bad", "bad")]
+
+
+def test_shared_cache_leader_takeover(fake_redis, tmp_path):
+    _put_list(fake_redis, "L1", "List1", ["bad"])
+    first = SharedCacheStore(str(tmp_path))
+    second = SharedCacheStore(str(tmp_path))
+    assert first.try_become_leader()
+    assert not second.try_become_leader()
+    first.release()
+    assert second.try_become_leader()
+    second.release()
+
+
+def test_shared_cache_attach_retries_removed_generation(fake_redis, tmp_path, monkeypatch):
+    _put_list(fake_redis, "L1", "List1", ["bad"])
+    leader = SharedCacheStore(str(tmp_path))
+    assert leader.try_become_leader()
+    leader.publish({"L1": fake_redis.hgetall("L1")}, 1)
+    stale = leader.current()
+    leader.publish({"L1": fake_redis.hgetall("L1")}, 2)
+    (tmp_path / stale[1]).unlink()
+
+    worker = SharedCacheStore(str(tmp_path))
+    current = worker.current
+    answers = [stale]
+    monkeypatch.setattr(worker, "current", lambda: answers.pop() if answers else current())
+    cache_data = worker.attach()
+    assert worker.generation == stale[0] + 1
+    assert isinstance(cache_data["L1"]["data"], MappedMatcher)
+    leader.release()
+
+
+def _mapped_files(directory):
+    with open("/proc/self/maps", encoding="utf-8") as f:
+        return {line.split(str(directory) + "/", 1)[1].split()[0] for line in f if str(directory) + "/" in line}
+
+
+def test_shared_cache_unchanged_lists_follow_current_mapping(fake_redis, tmp_path, make_ctx):
+    for i in range(4):
+        _put_list(fake_redis, f"L{i}", f"List{i}", [f"bad{i}"])
+    leader = make_ctx(SHARED_CACHE_DIR=str(tmp_path))
+    worker = make_ctx(SHARED_CACHE_DIR=str(tmp_path))
+    assert init_shared_cache(leader, fake_redis)
+    assert init_shared_cache(worker, fake_redis, timeout=0)
+    first = worker.config["CACHE_DATA"]["L0"]
+
+    for round_no in range(6):
+        list_no = f"L{1 + round_no % 3}"
+        _put_list(fake_redis, list_no, list_no, [f"bad{round_no}", "worse"])
+        assert sync_shared_cache(leader, leader.config["SHARED_CACHE"])
+        assert sync_shared_cache(worker, worker.config["SHARED_CACHE"])
+
+    gc.collect()
+    # 未变化的名单仍是同一对象，但只引用当前 generation 的映射
+    assert worker.config["CACHE_DATA"]["L0"] is first
+    assert _mapped_files(tmp_path) == {worker.config["SHARED_CACHE"].current()[1]}
+    assert [v for _, v in first["data"].iter("so bad0")] == [("bad0", "bad0")]
+    leader.config["SHARED_CACHE"].release()
+
+
+def test_shared_cache_rejects_corrupted_header(fake_redis, tmp_path):
+    _put_list(fake_redis, "L1", "List1", ["bad"])
+    leader = SharedCacheStore(str(tmp_path))
+    assert leader.try_become_leader()
+    leader.publish({"L1": fake_redis.hgetall("L1")}, 1)
+    name = leader.current()[1]
+    with open(tmp_path / name, "r+b") as f:
+        f.write(b"XXXX")
+
+    worker = SharedCacheStore(str(tmp_path))
+    with pytest.raises(ValueError, match=name):
+        worker.attach()
+    gc.collect()
+    assert worker.generation == 0
+    assert not _mapped_files(tmp_path)
+    leader.release()
@@ -96,3 +96,150 @@ def test_image_filter_pass(client):
     data = resp.json()
     assert resp.status_code == 200
     assert data["riskLevel"] == "PASS"
+
+
+def test_text_filter_async_ai_and_language(client):
+    import httpx
+
+    ctx = client.app.state.ctx
+    calls = []
+
+    async def upstream(request):
+        calls.append(str(request.url))
+        if "lang" in str(request.url):
+            return httpx.Response(200, json={"language": {"text": "en", "nickname": "en"}})
+        return httpx.Response(200, json={"code": 0, "data": [{"label": "REJECT"}]})
+
+    ctx.config["HTTP_CLIENT"] = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    ctx.config["LANGUAGE_SWITCH"] = True
+    ctx.config["LANGUAGE_CLS_URL"] = "http://upstream/lang"
+    ctx.config["AD_DETECT_URL"] = "http://upstream/ad"
+    ctx.config["APP_CHANNEL"]["AC_1001_all"] = {"ai_switch": 1}
+
+    payload = {
+        "access_key": "test_key",
+        "ugc_source": "chat",
+        "data": json.dumps(
+            {
+                "timestamp": 1,
+                "token_id": "t1",
+                "nickname": "nick",
+                "text": "add me",
+                "server_id": "s1",
+                "account_id": "a1",
+                "app_id": "1001",
+                "role_id": "r1",
+                "vip_level": "1",
+                "level": "1",
+                "ip": "127.0.0.1",
+                "channel": "c1",
+            }
+        ),
+    }
+    resp = client.post("/moderation/text", json=payload)
+    data = resp.json()
+    assert resp.status_code == 200
+    assert calls == ["http://upstream/lang", "http://upstream/ad"]
+    assert data["extra"]["language"]["predict"] == {"text": "en", "nickname": "en"}
+    assert data["riskLevel"] == "REJECT"
+    assert json.loads(data["detail"])["riskType"] == 310
+
+
+def _batch_item(i, **kwargs):
+    item = {
+        "timestamp": 1,
+        "token_id": f"t{i}",
+        "nickname": "nick",
+        "text": f"hello {i}",
+        "server_id": "s1",
+        "account_id": f"a{i}",
+        "app_id": "1001",
+        "role_id": "r1",
+        "vip_level": "1",
+        "level": "1",
+        "ip": "127.0.0.1",
+        "channel": "c1",
+    }
+    item.update(kwargs)
+    return item
+
+
+def test_text_filter_batch_per_item_results(client, monkeypatch):
+    from app.utils import match_data_utils
+    from app.services import text_service
+
+    scope_calls = []
+    resolve_scope = match_data_utils.resolve_scope
+
+    def counting_resolve_scope(ctx, msg):
+        scope_calls.append(msg.channel)
+        if msg.channel == "1001_c3":
+            # 开关配置异常（如 ai_switch="x"）时解析作用域会抛出异常
+            raise ValueError("invalid literal for int() with base 10: 'x'")
+        return resolve_scope(ctx, msg)
+
+    monkeypatch.setattr(text_service, "resolve_scope", counting_resolve_scope)
+
+    missing = _batch_item(3)
+    missing.pop("text")
+    payload = {
+        "access_key": "test_key",
+        "ugc_source": "chat",
+        "data": [
+            _batch_item(0),
+            json.dumps(_batch_item(1)),
+            _batch_item(2, channel="c2"),
+            missing,
+            _batch_item(4, app_id="2002"),
+            _batch_item(5),
+            _batch_item(6, channel="c3"),
+            _batch_item(7, channel="c3"),
+        ],
+    }
+    resp = client.post("/moderation/text/batch", json=payload)
+    data = resp.json()
+    assert resp.status_code == 200
+    assert data["code"] == 1100
+    results = data["results"]
+    assert len(results) == 8
+    assert [r.get("riskLevel") for r in results] == ["PASS", "PASS", "PASS", None, None, "PASS", "PASS", "PASS"]
+    assert json.loads(results[1]["detail"])["contextText"] == "hello 1"
+    assert results[3]["code"] == 1902 and "text" in results[3]["message"]
+    assert results[4]["code"] == 1902 and "access_key" in results[4]["message"]
+    assert results[0]["extra"]["client_ip"] == "testclient"
+    # 同一 app/channel 只解析一次作用域
+    assert sorted(scope_calls) == ["1001_c1", "1001_c2", "1001_c3"]
+
+
+def test_text_filter_batch_bulk_language(client):
+    import httpx
+
+    ctx = client.app.state.ctx
+    calls = []
+
+    async def upstream(request):
+        calls.append(json.loads(request.content))
+        return httpx.Response(200, json=[{"language": {"text": "en", "nickname": "en"}}] * len(calls[-1]))
+
+    ctx.config["HTTP_CLIENT"] = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    ctx.config["LANGUAGE_SWITCH"] = True
+    ctx.config["LANGUAGE_CLS_BATCH_URL"] = "http://upstream/lang/batch"
+
+    payload = {
+        "access_key": "test_key",
+        "ugc_source": "chat",
+        "data": [_batch_item(0), _batch_item(1), _batch_item(2, text="hello 0")],
+    }
+    resp = client.post("/moderation/text/batch", json=payload)
+    results = resp.json()["results"]
+    # 一次请求，重复文本去重
+    assert calls == [[{"nickname": "nick", "text": "hello 0"}, {"nickname": "nick", "text": "hello 1"}]]
+    assert [r["extra"]["language"]["predict"] for r in results] == [{"text": "en", "nickname": "en"}] * 3
+
+
+def test_text_filter_batch_size_limit(client):
+    ctx = client.app.state.ctx
+    ctx.config["TEXT_BATCH_MAX_SIZE"] = 2
+    payload = {"access_key": "test_key", "ugc_source": "chat", "data": [_batch_item(i) for i in range(3)]}
+    resp = client.post("/moderation/text/batch", json=payload)
+    assert resp.json()["code"] == 1902
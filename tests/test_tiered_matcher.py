@@ -0,0 +1,124 @@
+import threading
+from types import SimpleNamespace
+
+from app.utils import ahocorasick_utils
+from app.utils.actree_snapshot import dump_snapshot, load_actree
+from app.utils.list_delta import add_op, remove_op
+from app.utils.list_meta import attach_list_meta
+from app.utils.match_data_utils import get_scope_index
+from app.utils import tiered_matcher
+from app.utils.tiered_matcher import TieredMatcher, tiered
+
+
+def _list(name, words, match_rule="1"):
+    v = {
+        "name": name,
+        "match_rule": match_rule,
+        "match_type": "1",
+        "risk_type": "300",
+        "status": "1",
+        "data": dump_snapshot(name, [(w, w) for w in words]),
+    }
+    v["data"] = load_actree(v["data"], v["match_rule"])
+    return attach_list_meta(v)
+
+
+def _hits(matcher, text):
+    return sorted(v for _, v in matcher.iter(text))
+
+
+def test_tiered_matcher_matches_rebuilt_automaton():
+    base = ahocorasick_utils.build_actree([("bad", "bad"), ("evil", "evil"), ("ugly", "ugly")])
+    matcher = tiered(base).apply(
+        [
+            (1, [remove_op("evil"), add_op("worse", "worse")]),
+            (2, [add_op("ugly", "UGLY"), add_op("tmp", "tmp")]),
+            (3, [remove_op("tmp"), remove_op("missing")]),
+        ]
+    )
+    expected = ahocorasick_utils.build_actree([("bad", "bad"), ("ugly", "UGLY"), ("worse", "worse")])
+    text = "bad evil ugly worse tmp"
+    assert _hits(matcher, text) == _hits(expected, text)
+    assert sorted(v for _, v in matcher.items()) == sorted(v for _, v in expected.items())
+    assert len(matcher) == 3
+    assert matcher.pending == 4
+    # 原匹配器不受影响
+    assert _hits(tiered(base), "evil") == [("evil", "evil")]
+
+    # 删除后重新加入
+    matcher = matcher.apply([(4, [add_op("evil", "evil")])])
+    assert _hits(matcher, "evil") == [("evil", "evil")] and len(matcher) == 4
+
+    assert matcher.merge()
+    assert matcher.pending == 0 and matcher.state.delta is None
+    assert _hits(matcher, text) == sorted(_hits(expected, text) + [("evil", "evil")])
+    assert not matcher.merge()
+
+
+def test_tiered_matcher_identifier_base_and_async_merge():
+    base = load_actree(dump_snapshot("IP", [("10.0.0.0/8", "10.0.0.0/8"), ("1.1.1.1", "1.1.1.1")]), "3", "exact")
+    matcher = tiered(base, "3", "exact").apply([(1, [remove_op("10.0.0.0/8"), add_op("2.2.2.0/24", "2.2.2.0/24")])])
+    assert _hits(matcher, "10.1.1.1") == []
+    assert _hits(matcher, "2.2.2.9") == [("2.2.2.0/24", "2.2.2.0/24")]
+    assert len(matcher) == 2
+
+    assert matcher.merge_async().result(timeout=5)
+    assert matcher.state.tombstones == frozenset()
+    assert _hits(matcher, "2.2.2.9") == [("2.2.2.0/24", "2.2.2.0/24")]
+    assert _hits(matcher, "1.1.1.1") == [("1.1.1.1", "1.1.1.1")]
+    assert not TieredMatcher().apply([(1, [add_op("x", "x"), remove_op("x")])])
+
+
+def test_merge_result_carries_forward_to_newer_matchers():
+    base = ahocorasick_utils.build_actree([("bad", "bad"), ("evil", "evil")])
+    gate = threading.Event()
+    tiered_matcher._merge_executor.submit(gate.wait, 5)
+
+    x = tiered(base).apply([(1, [add_op("a", "a")])])
+    future = x.merge_async()
+    # 合并排队期间已派生出新对象，同一派生链不再重复提交合并
+    y = x.apply([(2, [add_op("b", "b")])])
+    assert y.merge_async() is None
+    gate.set()
+    assert future.result(timeout=5)
+
+    z = y.apply([(3, [remove_op("bad")])])
+    assert z.state.base is not base
+    assert sorted(v for _, v in z.state.base.items()) == [("a", "a"), ("bad", "bad"), ("evil", "evil")]
+    assert z.pending == 2 and len(z) == 3
+    expected = ahocorasick_utils.build_actree([("a", "a"), ("b", "b"), ("evil", "evil")])
+    text = "a bad b evil"
+    assert _hits(z, text) == _hits(expected, text)
+
+    # 稳定的变更流：每次合并完成时对象都已被取代，合并结果仍持续生效，增量层不会无限增长
+    matcher = tiered(base)
+    for version in range(1, 21):
+        latest = matcher.apply([(version, [add_op(f"w{version}", f"w{version}")])])
+        matcher.merge()
+        matcher = latest
+        assert matcher.pending <= 2
+    assert len(matcher) == 22
+    assert _hits(matcher, "w20 bad") == [("bad", "bad"), ("w2", "w2"), ("w20", "w20")]
+
+
+def test_scope_index_reuses_merged_base_for_delta_changes():
+    cache_data = {"A": _list("A", ["bad", "evil"]), "B": _list("B", ["evil"])}
+    ctx = SimpleNamespace(config={"CACHE_DATA": cache_data})
+    index = get_scope_index(ctx, ["A", "B"], cache_data)
+    assert index.scan("so evil", 1) == {"A": [("evil", "evil")], "B": [("evil", "evil")]}
+
+    a = cache_data["A"]
+    cache_data["A"] = attach_list_meta(
+        dict(a, data=tiered(a["data"], "1").apply([(1, [remove_op("evil"), add_op("worst", "worst")])]))
+    )
+    updated = get_scope_index(ctx, ["A", "B"], cache_data)
+    assert updated is not index
+    assert updated.automatons is index.automatons
+    assert updated.scan("evil and worst", 1) == {"B": [("evil", "evil")], "A": [("worst", "worst")]}
+
+    # 基础层变化（合并后）才重建合并自动机
+    cache_data["A"]["data"].merge()
+    cache_data["A"] = attach_list_meta(dict(cache_data["A"]))
+    rebuilt = get_scope_index(ctx, ["A", "B"], cache_data)
+    assert rebuilt.automatons is not index.automatons
+    assert rebuilt.scan("evil and worst", 1) == {"B": [("evil", "evil")], "A": [("worst", "worst")]}
@@ -0,0 +1,19 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.utils.tokenizer import AllTokenizer
+
+GOLDEN = json.loads((Path(__file__).parent / "data" / "tokenizer_golden.json").read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("case", GOLDEN, ids=lambda c: f"{c['language']}-{c['drop_prun']}-{c['text'][:12]!r}")
+def test_tokenize_matches_golden_output(case):
+    tokenizer = AllTokenizer()
+    assert tokenizer.tokenize(case["text"], drop_prun=case["drop_prun"], language=case["language"]) == case["expected"]
+
+
+def test_tokenize_without_lower_case():
+    tokenizer = AllTokenizer(do_lower_case=False)
+    assert tokenizer.tokenize("Hello,你好 😀!", drop_prun=False) == "\001Hello\001,\001你\001好\001😀\001!\001"